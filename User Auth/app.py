@@ -1,21 +1,42 @@
-from flask import Flask, request, send_from_directory, jsonify, render_template, redirect, url_for, session, Response, make_response, send_file
+import time
+IMPORT_STARTED = time.perf_counter()  # For the startup timing report
+
+from flask import Flask, request, send_from_directory, jsonify, render_template, redirect, url_for, session, Response, make_response, send_file, stream_with_context, g, has_request_context
 import bcrypt
 import os
-import io
 import zipfile
 import requests
 import concurrent.futures
-import time
-from concurrent.futures import ThreadPoolExecutor
+import base64
+import hashlib
+import click
+import collections
+import gzip
+import hmac
+import itertools
+import json
+import mimetypes
+import random
+import re
+import shutil
+import sqlite3
+import threading
+import uuid
+import brotli
+import zstandard
+from concurrent.futures import Future, ThreadPoolExecutor
 from flask_compress import Compress
 from flask_talisman import Talisman
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.utils import secure_filename
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from functools import wraps
-from supabase import create_client, Client
-from b2sdk.v2 import B2Api, InMemoryAccountInfo
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from supabase import create_client
+from b2sdk.v2 import B2Api, InMemoryAccountInfo, SqliteAccountInfo
 from email.parser import BytesParser  # <-- Missing import added
 
 app = Flask(__name__)
@@ -42,16 +63,498 @@ limiter = Limiter(
     default_limits=["100 per minute"]  # Global limit
 )
 
+# -------- Metrics ---------------------------------------------------------- #
+# Latency histograms and counters per route and per backend operation, exported
+# in Prometheus text format at /metrics. With SERVER_TIMING=1 every response also
+# carries a Server-Timing header splitting its time between the backends.
+# Each process keeps its own numbers. With METRICS_DIR set (gunicorn.conf.py sets
+# it) every worker writes them to a file there every METRICS_FLUSH_SECONDS, and
+# /metrics answers with the sum over all workers, so whichever worker serves a
+# scrape reports the whole host and counters never jump backwards.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SERVER_TIMING = os.getenv('SERVER_TIMING') == '1'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # /metrics needs "Authorization: Bearer <token>"; unset keeps it closed
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_SECONDS = 5
+
+def metrics_token_required(f):
+    """Limit an operational endpoint to scrapers holding METRICS_TOKEN."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        expected = f"Bearer {METRICS_TOKEN}"
+        if not METRICS_TOKEN or not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return jsonify({"error": "Unauthorized"}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Metrics:
+    """Thread-safe counters and histograms keyed by metric name and label set."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = collections.defaultdict(float)
+        self.histograms = {}
+        self.help = {}
+
+    def inc(self, name, labels, amount=1, help=''):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, ('counter', help))
+            self.counters[key] += amount
+
+    def observe(self, name, labels, seconds, help=''):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, ('histogram', help))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(LATENCY_BUCKETS), 0, 0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+
+    def state(self):
+        """A JSON-serializable copy of every series, for load() in another process."""
+        with self.lock:
+            return {
+                'help': dict(self.help),
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, *histogram] for (name, labels), histogram in self.histograms.items()]
+            }
+
+    def load(self, state):
+        """Add the series of a state() into this instance."""
+        with self.lock:
+            for name, (kind, help) in state['help'].items():
+                self.help.setdefault(name, (kind, help))
+            for name, labels, value in state['counters']:
+                self.counters[(name, tuple(map(tuple, labels)))] += value
+            for name, labels, buckets, count, total in state['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self.histograms.setdefault(key, [[0] * len(LATENCY_BUCKETS), 0, 0.0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += count
+                histogram[2] += total
+
+    def render(self, samples=()):
+        """Prometheus text exposition; samples are extra (name, type, labels, value) read at scrape time."""
+        def label_text(labels, **extra):
+            pairs = list(labels) + list(extra.items())
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{key}="{label_value(value)}"' for key, value in pairs) + '}'
+
+        lines = []
+        with self.lock:
+            for name, (kind, help) in sorted(self.help.items()):
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == 'counter':
+                    for (metric, labels), value in sorted(self.counters.items()):
+                        if metric == name:
+                            lines.append(f"{name}{label_text(labels)} {value:g}")
+                    continue
+                for (metric, labels), (buckets, count, total) in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{label_text(labels, le=f'{bound:g}')} {bucket_count}")
+                    lines.append(f"{name}_bucket{label_text(labels, le='+Inf')} {count}")
+                    lines.append(f"{name}_sum{label_text(labels)} {total:.6f}")
+                    lines.append(f"{name}_count{label_text(labels)} {count}")
+        typed = set()
+        for name, kind, labels, value in samples:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{label_text(tuple(sorted(labels.items())))} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+def count_bytes(direction, size):
+    metrics.inc('tenacity_transfer_bytes_total', {'direction': direction}, size, help='Bytes moved between clients and B2 through the app.')
+
+def counted_chunks(chunks):
+    """Pass download chunks through, counting their bytes."""
+    for chunk in chunks:
+        count_bytes('download', len(chunk))
+        yield chunk
+
+def timed(backend, operation, fn, *args, **kwargs):
+    """Call fn, recording its latency and any error under backend/operation.
+
+    Inside a request the time is also added to the request's Server-Timing.
+    """
+    labels = {'backend': backend, 'operation': operation}
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        metrics.inc('tenacity_backend_errors_total', labels, help='Backend calls that raised.')
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe('tenacity_backend_call_seconds', labels, elapsed, help='Backend call latency.')
+        if has_request_context():
+            g.setdefault('backend_seconds', collections.Counter())[backend] += elapsed
+
+class InstrumentedClient:
+    """Proxy that times every method call made on a client as backend/<method>."""
+    def __init__(self, client, backend):
+        self._client = client
+        self._backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+        return lambda *args, **kwargs: timed(self._backend, name, attr, *args, **kwargs)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'  # Bounded label values
+    labels = {'route': route, 'method': request.method, 'status': str(response.status_code)}
+    metrics.observe('tenacity_request_seconds', labels, elapsed, help='Time to build each response.')
+    if SERVER_TIMING:
+        parts = [f"{backend};dur={seconds * 1000:.1f}" for backend, seconds in g.get('backend_seconds', {}).items()]
+        parts.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers['Server-Timing'] = ', '.join(parts)
+    return response
+
+# -------- I/O Scheduler ---------------------------------------------------------- #
+# All outbound calls go through one app-wide pool per backend. Each pool caps how
+# many calls run at once and how many callers may wait for a slot; past that,
+# requests are shed with a 503 instead of piling more load on a throttled backend.
+IO_QUEUE_TIMEOUT = float(os.getenv('IO_QUEUE_TIMEOUT', 10))  # Seconds a caller waits for a slot
+
+class ServiceBusy(Exception):
+    """Raised when a backend's pool is saturated; answered with 503."""
+    def __init__(self, backend):
+        super().__init__(f"{backend} is saturated")
+        self.backend = backend
+
+class IOPool:
+    """Concurrency limit with a bounded wait queue for one backend.
+
+    call() runs work in the calling thread once a slot is free; submit() runs it
+    on the pool's threads, blocking the caller while the pool is full, which
+    gives callers natural backpressure.
+    """
+    def __init__(self, name, limit, queue_size):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.condition = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.stats = collections.Counter()
+        self.max_wait = 0.0
+        self.executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"io-{name}")
+
+    def acquire(self):
+        started = time.monotonic()
+        with self.condition:
+            if self.running >= self.limit and self.waiting >= self.queue_size:
+                self.stats['rejected'] += 1
+                raise ServiceBusy(self.name)
+            self.waiting += 1
+            try:
+                if not self.condition.wait_for(lambda: self.running < self.limit, timeout=IO_QUEUE_TIMEOUT):
+                    self.stats['rejected'] += 1
+                    raise ServiceBusy(self.name)
+            finally:
+                self.waiting -= 1
+            self.running += 1
+            waited = time.monotonic() - started
+            self.stats['started'] += 1
+            self.stats['wait_seconds'] += waited
+            self.max_wait = max(self.max_wait, waited)
+        metrics.observe('tenacity_io_wait_seconds', {'pool': self.name}, waited, help='Time spent waiting for a pool slot.')
+        if waited >= 0.001 and has_request_context():
+            g.setdefault('backend_seconds', collections.Counter())[f"{self.name}_wait"] += waited
+
+    def release(self):
+        with self.condition:
+            self.running -= 1
+            self.stats['completed'] += 1
+            self.condition.notify()
+
+    def call(self, fn, *args, **kwargs):
+        self.acquire()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release()
+
+    def submit(self, fn, *args, **kwargs):
+        self.acquire()
+        try:
+            return self.executor.submit(self._run, fn, args, kwargs)
+        except Exception:
+            self.release()
+            raise
+
+    def _run(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release()
+
+    def map(self, fn, iterable):
+        futures = [self.submit(fn, item) for item in iterable]
+        return [future.result() for future in futures]
+
+    def snapshot(self):
+        with self.condition:
+            started = self.stats['started']
+            return {
+                "limit": self.limit,
+                "queue_size": self.queue_size,
+                "running": self.running,
+                "queue_depth": self.waiting,
+                "started": started,
+                "completed": self.stats['completed'],
+                "rejected": self.stats['rejected'],
+                "avg_wait_seconds": self.stats['wait_seconds'] / started if started else 0.0,
+                "max_wait_seconds": self.max_wait
+            }
+
+def io_pool(name, default_limit):
+    limit = int(os.getenv(f'IO_{name.upper()}_LIMIT', default_limit))
+    return IOPool(name, limit, int(os.getenv(f'IO_{name.upper()}_QUEUE', limit * 4)))
+
+io_pools = {
+    'b2_metadata': io_pool('b2_metadata', 10),  # File info lookups and other small B2 calls
+    'b2_data': io_pool('b2_data', 8),  # Uploads and opening downloads
+    'supabase': io_pool('supabase', 16)
+}
+
+QUERY_VERBS = ('select', 'insert', 'upsert', 'update', 'delete')
+
+class GatedQuery:
+    """Wraps a Supabase query builder so execute() takes a slot in a pool.
+
+    operation names the query for metrics, e.g. "files.select" or "rpc.search_files".
+    """
+    def __init__(self, builder, pool, operation):
+        self._builder = builder
+        self._pool = pool
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if name == 'execute':
+            return lambda *args, **kwargs: self._pool.call(timed, 'supabase', self._operation, attr, *args, **kwargs)
+        operation = f"{self._operation}.{name}" if name in QUERY_VERBS else self._operation
+        if not callable(attr):
+            return GatedQuery(attr, self._pool, operation) if hasattr(attr, 'execute') else attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return GatedQuery(result, self._pool, operation) if hasattr(result, 'execute') else result
+        return chained
+
+class GatedClient:
+    """Supabase client whose table() and rpc() queries run through a pool."""
+    def __init__(self, client, pool):
+        self._client = client
+        self._pool = pool
+
+    def table(self, name):
+        return GatedQuery(self._client.table(name), self._pool, name)
+
+    def rpc(self, fn, *args, **kwargs):
+        return GatedQuery(self._client.rpc(fn, *args, **kwargs), self._pool, f"rpc.{fn}")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+@app.errorhandler(ServiceBusy)
+def handle_service_busy(e):
+    app.logger.error(f"Shedding load: {str(e)}")
+    return jsonify({"error": "Server busy, please retry", "backend": e.backend}), 503, {'Retry-After': '1'}
+
+# -------- Backend Clients ---------------------------------------------------- #
+# Supabase and B2 clients are built on first use instead of at import, so a slow
+# backend can't stall worker boot. B2 authorization lives in a SQLite file shared
+# by every worker on the host, so a restarted worker reuses the token another one
+# already holds, and a background thread renews it well before the 24h expiry.
+B2_ACCOUNT_INFO_PATH = os.getenv('B2_ACCOUNT_INFO_PATH', '/tmp/tenacity-b2-account.sqlite3')
+B2_AUTH_REFRESH = int(os.getenv('B2_AUTH_REFRESH', 12 * 60 * 60))  # Seconds between re-authorizations
+startup_timings = {}  # Seconds spent importing and initializing each client
+
+class LazyClient:
+    """Proxy that builds a client on first attribute access, once per process."""
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    self._client = self._factory()
+                    startup_timings[f"{self._name}_init"] = time.perf_counter() - started
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
 # Initialize Supabase client
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_KEY')
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase = GatedClient(
+    LazyClient('supabase', lambda: create_client(supabase_url, supabase_key)),
+    io_pools['supabase']
+)
+
+# Streaming upload tuning: each upload holds at most UPLOAD_PART_CONCURRENCY + 1
+# buffers of UPLOAD_PART_SIZE bytes, however large the file is.
+UPLOAD_PART_SIZE = int(os.getenv('UPLOAD_PART_SIZE', 16 * 1024 * 1024))  # B2 minimum is 5MB
+UPLOAD_PART_CONCURRENCY = int(os.getenv('UPLOAD_PART_CONCURRENCY', 4))
+UPLOAD_FILE_WORKERS = int(os.getenv('UPLOAD_FILE_WORKERS', 4))  # Files uploaded in parallel per request
 
 # Initialize Backblaze B2 client
-info = InMemoryAccountInfo()
-b2_api = B2Api(info)
-b2_api.authorize_account("production", os.getenv('B2_KEY_ID'), os.getenv('B2_APPLICATION_KEY'))
-bucket = b2_api.get_bucket_by_name(os.getenv('B2_BUCKET_NAME'))
+def b2_authorized_at():
+    """When any worker on this host last authorized with B2 (0 if never)."""
+    try:
+        return os.path.getmtime(B2_ACCOUNT_INFO_PATH + '.authorized')
+    except OSError:
+        return 0
+
+def authorize_b2(api):
+    api.authorize_account("production", os.getenv('B2_KEY_ID'), os.getenv('B2_APPLICATION_KEY'))
+    with open(B2_ACCOUNT_INFO_PATH + '.authorized', 'w') as marker:
+        marker.write(datetime.now().isoformat())
+
+def refresh_b2_auth(api):
+    """Re-authorize before the token expires, unless another worker just did."""
+    while True:
+        # Jitter so the workers on a host don't all renew at once
+        time.sleep(max(60, b2_authorized_at() + B2_AUTH_REFRESH - time.time()) + random.uniform(0, 300))
+        if time.time() - b2_authorized_at() < B2_AUTH_REFRESH:
+            continue
+        try:
+            authorize_b2(api)
+        except Exception as e:
+            app.logger.error(f"B2 token refresh failed: {str(e)}")  # Requests still re-authorize on expiry
+
+def connect_b2():
+    info = SqliteAccountInfo(file_name=B2_ACCOUNT_INFO_PATH)
+    api = B2Api(info, max_upload_workers=UPLOAD_FILE_WORKERS * UPLOAD_PART_CONCURRENCY)
+    try:
+        cached = info.get_application_key_id() == os.getenv('B2_KEY_ID')
+    except Exception:
+        cached = False  # Nothing stored yet
+    if not cached or time.time() - b2_authorized_at() >= B2_AUTH_REFRESH:
+        authorize_b2(api)
+    threading.Thread(target=refresh_b2_auth, args=(api,), name="b2-auth-refresh", daemon=True).start()
+    return api
+
+b2_api = LazyClient('b2_api', connect_b2)
+# The bucket id is cached in the account info too, so this is rarely a B2 call
+bucket = InstrumentedClient(
+    LazyClient('b2_bucket', lambda: b2_api.get_bucket_by_name(os.getenv('B2_BUCKET_NAME'))),
+    'b2'
+)
+
+# -------- Static Assets ----------------------------------------------------- #
+# `flask --app app build-static` (run once per deploy, before the workers start)
+# copies static/css and static/javascript into static/dist under content-hashed
+# names, next to .br, .zst and .gz variants, and records the mapping in
+# static/dist/manifest.json. url_for('static', ...) then points at the hashed
+# copy, which is served precompressed with a year-long immutable Cache-Control.
+# Without a manifest the plain files are served as before.
+STATIC_BUILD_DIRS = ('css', 'javascript')
+STATIC_DIST = os.path.join(app.static_folder, 'dist')
+STATIC_MANIFEST_PATH = os.path.join(STATIC_DIST, 'manifest.json')
+STATIC_ENCODINGS = {'br': '.br', 'zstd': '.zst', 'gzip': '.gz'}  # Content-Encoding -> suffix
+STATIC_IMMUTABLE = 'public, max-age=31536000, immutable'
+
+def compressed_variants(data):
+    return {
+        '.br': brotli.compress(data, quality=11),
+        '.zst': zstandard.ZstdCompressor(level=19).compress(data),
+        '.gz': gzip.compress(data, compresslevel=9, mtime=0)
+    }
+
+def load_static_manifest():
+    try:
+        with open(STATIC_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+static_manifest = load_static_manifest()
+
+@app.cli.command('build-static')
+def build_static():
+    """Fingerprint and precompress static/css and static/javascript."""
+    staging = STATIC_DIST + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = {}
+    saved = 0
+    for directory in STATIC_BUILD_DIRS:
+        for root, _, names in os.walk(os.path.join(app.static_folder, directory)):
+            for name in sorted(names):
+                source = os.path.join(root, name)
+                relative = os.path.relpath(source, app.static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+
+                stem, ext = os.path.splitext(relative)
+                hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+                target = os.path.join(staging, hashed)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(data)
+                for suffix, compressed in compressed_variants(data).items():
+                    with open(target + suffix, 'wb') as f:
+                        f.write(compressed)
+                    if suffix == '.br':
+                        saved += len(data) - len(compressed)
+                manifest[relative] = f"dist/{hashed}"
+
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    shutil.rmtree(STATIC_DIST, ignore_errors=True)
+    os.replace(staging, STATIC_DIST)
+    click.echo(f"Built {len(manifest)} assets into {STATIC_DIST} ({saved / 1024:.0f}KB saved with brotli)")
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint == 'static' and values.get('filename') in static_manifest:
+        values['filename'] = static_manifest[values['filename']]
+
+@app.route('/static/dist/<path:filename>')
+@limiter.exempt
+def static_dist(filename):
+    """Serve a fingerprinted asset, using the best precompressed variant."""
+    encoding = request.accept_encodings.best_match(list(STATIC_ENCODINGS) + ['identity'], default='identity')
+    suffix = STATIC_ENCODINGS.get(encoding, '')
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(STATIC_DIST, filename + suffix, mimetype=mimetype, conditional=True)
+    if suffix:
+        response.headers['Content-Encoding'] = encoding  # Also tells Compress to leave it alone
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = STATIC_IMMUTABLE
+    return response
 
 # -------- Allow CORS policy--------------------------------------- #
 @app.after_request
@@ -191,49 +694,220 @@ def home():
 def dashboard():
     return render_template('dashboard.html')
 
-# -------- Data Calculation ---------------------------------------------------------- #
-def calculate_storage_for_user(user_id):
-    total_storage = 100 * 1024 * 1024 * 1024  #100GB in bytes
-    used_storage = 0
-    file_counts = {
-        "files": 0,
-        "documents": 0,
-        "images": 0,
-        "others": 0
+# -------- File Metadata ---------------------------------------------------------- #
+# Size, MIME type and upload time are copied from the B2 upload response into the
+# `files` row, so listings can be served from Supabase without one B2 call per file.
+FILE_COLUMNS = 'filename, filepath, file_id, blob_id, content_length, content_type, upload_timestamp, codec, stored_length'
+
+def file_metadata(file_version):
+    """Return the `files` columns describing a B2 file version."""
+    return {
+        'content_length': file_version.size,
+        'stored_length': file_version.size,
+        'content_type': file_version.content_type,
+        'upload_timestamp': file_version.upload_timestamp
     }
 
-    # Fetch files for the specific user from Supabase
-    files_data = supabase.table('files').select('filepath').eq('user_id', user_id).execute()
-    user_files = files_data.data if files_data.data else []
+def fill_missing_metadata(rows):
+    """Fetch B2 metadata for rows saved before the metadata columns existed.
+
+    Rows that already carry a size are returned untouched; rows whose object
+    can't be found in B2 are dropped, as the listings did before.
+    """
+    missing = [row for row in rows if row.get('content_length') is None]
+    if not missing:
+        return rows
+
+    infos = io_pools['b2_metadata'].map(lambda f: get_file_info_cached(bucket, f['filepath']), missing)
+
+    for row, metadata in zip(missing, infos):
+        if metadata:
+            row.update(metadata)
+
+    return [row for row in rows if row.get('content_length') is not None]
+
+def file_category(filename):
+    """Bucket a file into the dashboard's documents / images / others groups."""
+    name = filename.lower()
+    if name.endswith((".doc", ".docx", ".pdf", ".txt")):
+        return "documents"
+    if name.endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp")):
+        return "images"
+    return "others"
+
+@app.cli.command('backfill-metadata')
+@click.option('--batch-size', default=500, show_default=True, help='Rows fetched per Supabase query.')
+def backfill_metadata(batch_size):
+    """Copy size, content type and upload time from B2 into rows that lack them."""
+    last_id = 0
+    updated = failed = 0
+    while True:
+        rows = supabase.table('files').select('id, filepath') \
+            .is_('content_length', 'null') \
+            .gt('id', last_id) \
+            .order('id') \
+            .limit(batch_size) \
+            .execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            try:
+                info = bucket.get_file_info_by_name(row['filepath'])
+                supabase.table('files').update(file_metadata(info)).eq('id', row['id']).execute()
+                updated += 1
+            except Exception as e:
+                app.logger.error(f"Backfill failed for {row['filepath']}: {str(e)}")
+                failed += 1
+        last_id = rows[-1]['id']
+
+    click.echo(f"Backfilled {updated} rows, {failed} failed")
 
-    for file in user_files:
-        try:
-            # Get file metadata from Backblaze B2
-            file_info = bucket.get_file_info_by_name(file['filepath'])
-            file_size = file_info.content_length
-
-            # Convert file size to MB
-            file_size_mb = file_size / (1024 * 1024)
-
-            # Classify by file type and accumulate sizes in MB
-            if file['filepath'].lower().endswith((".doc", ".docx", ".pdf", ".txt")):
-                file_counts["documents"] += file_size_mb
-            elif file['filepath'].lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp")):
-                file_counts["images"] += file_size_mb
-            else:
-                file_counts["others"] += file_size_mb
-
-            # Update total file count and used storage
-            file_counts["files"] += 1
-            used_storage += file_size_mb  # Sum up the used storage in MB
-        except Exception as e:
-            continue  # Skip files that can't be accessed
+# -------- Data Calculation ---------------------------------------------------------- #
+# Usage is kept as running per-user counters in `user_storage`, adjusted by every
+# upload, delete and rename through the atomic `adjust_user_storage` RPC, so
+# /api/storage and the upload quota check are a single row read.
+# `flask reconcile-storage` recomputes them from the `files` rows to repair drift.
+# Every write to `files` (and every counter change) bumps the user's row in
+# `user_versions` in the same transaction; the listing and storage endpoints
+# use it as their ETag.
+STORAGE_QUOTA = 100 * 1024 * 1024 * 1024  # 100GB in bytes
+USAGE_COLUMNS = ('files', 'used_bytes', 'documents_bytes', 'images_bytes', 'others_bytes', 'stored_bytes')
+
+def usage_delta(rows, sign=1):
+    """Return the counter changes for adding (sign=1) or removing (sign=-1) rows."""
+    delta = dict.fromkeys(USAGE_COLUMNS, 0)
+    for row in rows:
+        size = row.get('content_length') or 0
+        delta['files'] += sign
+        delta['used_bytes'] += sign * size
+        delta['stored_bytes'] += sign * (row.get('stored_length') or size)  # Smaller when compressed at rest
+        delta[f"{file_category(row['filename'])}_bytes"] += sign * size
+    return delta
+
+def adjust_usage(user_id, delta):
+    """Apply a usage delta; failures are logged and left for reconcile-storage."""
+    if not any(delta.values()):
+        return
+    try:
+        counted = supabase.rpc('adjust_user_storage', {
+            'p_user_id': user_id,
+            **{f'p_{column}': delta[column] for column in USAGE_COLUMNS}
+        }).execute().data
+        if not counted:
+            # No counters yet: seed them with a scan, which already includes this change
+            get_usage(user_id)
+    except Exception as e:
+        app.logger.error(f"Usage counter update failed for user {user_id}: {str(e)}")
+
+def iter_user_files(user_id, columns=FILE_COLUMNS, batch_size=1000):
+    """Yield every `files` row of a user, paging by id past Supabase's row cap."""
+    last_id = 0
+    while True:
+        rows = supabase.table('files').select(f'id, {columns}') \
+            .eq('user_id', user_id) \
+            .gt('id', last_id) \
+            .order('id') \
+            .limit(batch_size) \
+            .execute().data
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1]['id']
+
+def scan_usage(user_id):
+    """Recompute a user's usage counters from scratch (slow path)."""
+    usage = dict.fromkeys(USAGE_COLUMNS, 0)
+    rows = list(iter_user_files(user_id))
+    for column, value in usage_delta(fill_missing_metadata(rows)).items():
+        usage[column] += value
+    return usage
+
+def get_usage(user_id):
+    """Read a user's usage counters, seeding them with a full scan the first time."""
+    query = supabase.table('user_storage').select(', '.join(USAGE_COLUMNS)).eq('user_id', user_id)
+    data = query.execute().data
+    if data:
+        return data[0]
+
+    usage = scan_usage(user_id)
+    # Insert only: if a change landed during the scan, adjust_user_storage has
+    # already seeded the row (and counted the change), so keep its values
+    supabase.table('user_storage').upsert(
+        {'user_id': user_id, **usage}, on_conflict='user_id', ignore_duplicates=True
+    ).execute()
+    return query.execute().data[0]
+
+@app.cli.command('reconcile-storage')
+@click.option('--user-id', type=int, help='Only reconcile this user.')
+@click.option('--dry-run', is_flag=True, help='Report drift without repairing it.')
+def reconcile_storage(user_id, dry_run):
+    """Compare usage counters with the `files` rows and repair any drift."""
+    if user_id:
+        user_ids = [user_id]
+    else:
+        user_ids = [row['id'] for row in supabase.table('users').select('id').execute().data]
+
+    drifted = 0
+    for uid in user_ids:
+        actual = scan_usage(uid)
+        stored = supabase.table('user_storage').select(', '.join(USAGE_COLUMNS)).eq('user_id', uid).execute().data
+        stored = stored[0] if stored else dict.fromkeys(USAGE_COLUMNS, 0)
+        if all(stored[column] == actual[column] for column in USAGE_COLUMNS):
+            continue
+
+        drifted += 1
+        click.echo(f"User {uid}: stored {stored}, actual {actual}")
+        if not dry_run:
+            # Applied as a delta so the version moves and cached responses go stale
+            adjust_usage(uid, {column: actual[column] - stored[column] for column in USAGE_COLUMNS})
+
+    click.echo(f"{drifted} of {len(user_ids)} users drifted" + (" (not repaired)" if dry_run else ""))
+
+def calculate_storage_for_user(user_id, usage=None):
+    total_storage = STORAGE_QUOTA
+    usage = usage or get_usage(user_id)
+
+    # Sizes per category in MB
+    file_counts = {
+        "files": usage['files'],
+        "documents": usage['documents_bytes'] / (1024 * 1024),
+        "images": usage['images_bytes'] / (1024 * 1024),
+        "others": usage['others_bytes'] / (1024 * 1024)
+    }
 
     # Convert total storage and used storage to GB
     total_storage_gb = total_storage / (1024 * 1024 * 1024)  # Convert to GB
-    used_storage_gb = used_storage / 1024  # Convert MB to GB
+    used_storage_gb = usage['used_bytes'] / (1024 * 1024 * 1024)  # Convert to GB
+    stored_storage_gb = usage['stored_bytes'] / (1024 * 1024 * 1024)  # What B2 holds after compression
+
+    return total_storage_gb, used_storage_gb, stored_storage_gb, file_counts
 
-    return total_storage_gb, used_storage_gb, file_counts  # Return both total and used in GB
+def quota_exceeded(user_id, incoming_bytes):
+    """True when adding incoming_bytes would take the user past STORAGE_QUOTA."""
+    return get_usage(user_id)['used_bytes'] + (incoming_bytes or 0) > STORAGE_QUOTA
+
+def user_version(user_id):
+    """The user's change version; 0 until their first upload, delete or rename."""
+    data = supabase.table('user_versions').select('version').eq('user_id', user_id).execute().data
+    return (data[0].get('version') or 0) if data else 0
+
+def version_etag(user_id, version):
+    # The user id keeps one browser's cached responses apart across accounts
+    return f"u{user_id}-v{version}"
+
+def revalidate(etag):
+    """A 304 response if the client already holds etag, else None."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return tag_response(app.response_class(status=304), etag)
+
+def tag_response(response, etag):
+    # Weak: Flask-Compress appends the codec to strong ETags (`"u1-v2:br"`),
+    # which would then never match the version on the next request
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @app.route('/api/storage', methods=['GET'])
@@ -243,16 +917,22 @@ def get_storage_data():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    total_storage, used_storage, file_counts = calculate_storage_for_user(user_id)
+    etag = version_etag(user_id, user_version(user_id))
+    cached = revalidate(etag)
+    if cached:
+        return cached
 
-    return jsonify({
+    total_storage, used_storage, stored_storage, file_counts = calculate_storage_for_user(user_id)
+
+    return tag_response(jsonify({
         "totalStorage": total_storage * 1024,  # Convert to MB
         "usedStorage": used_storage,  # Convert to MB
+        "storedStorage": stored_storage,  # Physical size in B2, same unit as usedStorage
         "files": file_counts["files"],
         "documents": file_counts["documents"],
         "images": file_counts["images"],
         "others": file_counts["others"]
-    })
+    }), etag)
 
 # -------- My Files ---------------------------------------------------------- #
 @app.route('/files')
@@ -267,7 +947,306 @@ def files():
 
     return render_template('files.html', files=files)
 
+# -------- Deduplication ----------------------------------------------------- #
+# Uploads are hashed with SHA-256, and a file whose content is already stored gets
+# a `files` row pointing at the existing B2 object (a blob, see migrations/005)
+# instead of another copy. Hashes the server computed itself are shared within
+# DEDUP_SCOPE: 'user', or 'global' to share identical content between all users.
+# Hashes a browser declares for a direct upload can't be checked, so those only
+# ever match that user's own uploads.
+DEDUP_SCOPE = os.getenv('DEDUP_SCOPE', 'user')
+
+def blob_scope(user_id, verified=True):
+    if verified and DEDUP_SCOPE == 'global':
+        return 'global'
+    return f"user:{user_id}"
+
+def valid_sha256(value):
+    return isinstance(value, str) and re.fullmatch(r'[0-9a-f]{64}', value) is not None
+
+class HashingReader:
+    """Read-only stream wrapper that SHA-256 hashes the bytes read through it."""
+    def __init__(self, stream):
+        self.stream = stream
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.sha256.update(data)
+        return data
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+def hash_stream(stream):
+    """SHA-256 of a seekable stream, rewound afterwards so it can still be uploaded."""
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        sha256.update(chunk)
+    stream.seek(0)
+    return sha256.hexdigest()
+
+def claim_blob(scope, sha256):
+    """Take a reference to a stored blob with this hash, or return None."""
+    try:
+        rows = supabase.rpc('claim_blob', {'p_scope': scope, 'p_sha256': sha256}).execute().data
+    except ServiceBusy:
+        raise
+    except Exception as e:
+        app.logger.error(f"Blob lookup failed: {str(e)}")  # Just upload another copy
+        return None
+    return rows[0] if rows else None
+
+def blob_record(blob):
+    """The `files` columns for a new row referencing blob."""
+    return {
+        'filepath': blob['filepath'],
+        'file_id': blob['file_id'],
+        'blob_id': blob['id'],
+        'content_length': blob['content_length'],
+        'content_type': blob['content_type'],
+        'codec': blob.get('codec'),
+        'stored_length': blob.get('stored_length'),
+        'upload_timestamp': int(time.time() * 1000)
+    }
+
+def share_blob(scope, sha256, record):
+    """Register a freshly uploaded record's object as a blob.
+
+    If identical content was stored meanwhile, the new object is deleted and the
+    record points at the existing blob instead.
+    """
+    try:
+        blob = supabase.rpc('register_blob', {
+            'p_scope': scope,
+            'p_sha256': sha256,
+            'p_filepath': record['filepath'],
+            'p_file_id': record['file_id'],
+            'p_content_length': record['content_length'],
+            'p_content_type': record['content_type'],
+            'p_codec': record.get('codec'),
+            'p_stored_length': record.get('stored_length')
+        }).execute().data[0]
+    except Exception as e:
+        app.logger.error(f"Blob registration failed for {record['filepath']}: {str(e)}")
+        return record  # The row keeps sole ownership of its object
+
+    if blob['file_id'] == record['file_id']:
+        return {**record, 'blob_id': blob['id']}
+    try:
+        io_pools['b2_metadata'].call(bucket.delete_file_version, record['file_id'], record['filepath'])
+    except Exception as e:
+        app.logger.error(f"Failed to delete duplicate {record['filepath']}: {str(e)}")
+    return {**record, **blob_record(blob)}
+
+def delete_stored_object(row):
+    """Drop a row's hold on its B2 object, deleting the object once nothing uses it.
+
+    Does B2 work directly; callers run it on the b2_metadata pool.
+    """
+    if row.get('blob_id'):
+        rows = supabase.rpc('release_blob', {'p_blob_id': row['blob_id']}).execute().data
+        if not rows:
+            return  # Other files still reference the blob
+        file_id, filepath = rows[0]['file_id'], rows[0]['filepath']
+    else:
+        file_id, filepath = row['file_id'], row['filepath']
+    bucket.delete_file_version(file_id, filepath)
+    metadata_cache.invalidate(filepath)
+    if download_cache:
+        download_cache.invalidate(file_id)
+
+def discard_records(records):
+    """Undo stored objects and blob references for records that won't be saved."""
+    for record in records:
+        try:
+            io_pools['b2_metadata'].call(delete_stored_object, record)
+        except Exception as e:
+            app.logger.error(f"Cleanup failed for {record['filepath']}: {str(e)}")
+
+# -------- Compression at Rest ---------------------------------------------- #
+# With COMPRESS_AT_REST=1, uploads whose first bytes compress well are zstd
+# compressed on their way to B2 and their row gets codec 'zstd'. content_length
+# keeps the real size and stored_length the size in B2; downloads decompress on
+# the fly. Already-compressed formats (images, archives, Office files, which are
+# deflated ZIPs) are stored as uploaded, as are direct browser uploads.
+COMPRESS_AT_REST = os.getenv('COMPRESS_AT_REST') == '1'
+AT_REST_LEVEL = int(os.getenv('AT_REST_LEVEL', 3))
+AT_REST_SAMPLE = 64 * 1024  # Bytes test-compressed to decide
+AT_REST_MIN_SIZE = 4 * 1024  # Smaller files aren't worth a codec
+AT_REST_MAX_RATIO = 0.8  # The sample has to shrink at least this much
+
+class CountingReader:
+    """Read-only stream wrapper that counts the bytes read through it."""
+    def __init__(self, stream):
+        self.stream = stream
+        self.length = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.length += len(data)
+        return data
+
+class PrefixedReader:
+    """Stream that returns bytes already read from stream before the rest of it."""
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        if not self.prefix:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.prefix = self.prefix + self.stream.read(), b''
+        elif size <= len(self.prefix):
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+        else:
+            data, self.prefix = self.prefix + self.stream.read(size - len(self.prefix)), b''
+        return data
+
+def at_rest_codec(filename, sample):
+    """'zstd' if a file starting with sample should be compressed at rest, else None."""
+    if not COMPRESS_AT_REST or len(sample) < AT_REST_MIN_SIZE:
+        return None
+    if filename.lower().endswith(PRECOMPRESSED_EXTENSIONS):
+        return None
+    compressed = zstandard.ZstdCompressor(level=1).compress(sample)
+    return 'zstd' if len(compressed) <= len(sample) * AT_REST_MAX_RATIO else None
+
+def decompressed_chunks(chunks, codec):
+    """Undo a row's at-rest codec on a stream of B2 chunks."""
+    if not codec:
+        yield from chunks
+        return
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+
 # -------- Upload ---------------------------------------------------------- #
+# A user's filenames are unique (migrations/012): downloads, renames and deletes
+# address files by name. Names are checked before any bytes are stored, and an
+# upload that loses a race to the same name is undone when its insert fails.
+NAME_TAKEN = "A file with that name already exists"
+
+def filename_conflicts(user_id, filenames):
+    """Return the names in filenames the user already has, or that appear twice."""
+    counts = collections.Counter(filenames)
+    conflicts = {name for name, count in counts.items() if count > 1}
+    if counts:
+        rows = supabase.table('files').select('filename') \
+            .eq('user_id', user_id) \
+            .in_('filename', list(counts)) \
+            .execute().data
+        conflicts.update(row['filename'] for row in rows)
+    return sorted(conflicts)
+
+def is_unique_violation(error):
+    """True for Postgres' unique_violation, e.g. a name taken by a concurrent upload."""
+    return getattr(error, 'code', None) == '23505'
+
+def object_key(user_id):
+    """Return a new B2 key for one of the user's files.
+
+    Keys are never reused or changed; the display name lives only in the
+    `files` table, so renaming a file doesn't touch B2.
+    """
+    return f"user_{user_id}/{uuid.uuid4().hex}"
+
+def is_object_key(filepath):
+    """True if filepath is an object_key(), not an older user_{id}/{filename} key."""
+    name = filepath.rsplit('/', 1)[-1]
+    try:
+        return uuid.UUID(name).hex == name
+    except ValueError:
+        return False
+
+@app.cli.command('migrate-object-keys')
+@click.option('--batch-size', default=500, show_default=True, help='Rows fetched per Supabase query.')
+@click.option('--dry-run', is_flag=True, help='List the objects that would move without copying them.')
+def migrate_object_keys(batch_size, dry_run):
+    """Move objects stored under user_{id}/{filename} to immutable object keys.
+
+    Each object is copied server-side in B2, the row is pointed at the copy and
+    only then is the old version deleted, so a failure at any step leaves the
+    file downloadable. Safe to re-run.
+    """
+    last_id = 0
+    moved = failed = 0
+    while True:
+        rows = supabase.table('files').select('id, user_id, filepath, file_id') \
+            .gt('id', last_id) \
+            .order('id') \
+            .limit(batch_size) \
+            .execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            if is_object_key(row['filepath']):
+                continue
+            if dry_run:
+                click.echo(f"Would move {row['filepath']}")
+                moved += 1
+                continue
+            try:
+                new_version = bucket.copy(row['file_id'], object_key(row['user_id']))
+                supabase.table('files').update({
+                    'filepath': new_version.file_name,
+                    'file_id': new_version.id_
+                }).eq('id', row['id']).execute()
+                bucket.delete_file_version(row['file_id'], row['filepath'])
+                metadata_cache.invalidate(row['filepath'])
+                moved += 1
+            except Exception as e:
+                app.logger.error(f"Key migration failed for {row['filepath']}: {str(e)}")
+                failed += 1
+        last_id = rows[-1]['id']
+
+    click.echo(f"{'Found' if dry_run else 'Moved'} {moved} objects, {failed} failed")
+
+def stream_to_b2(stream, s3_key, content_type=None):
+    """Upload a file-like object to B2 without reading it all into memory.
+
+    Data is pulled in UPLOAD_PART_SIZE buffers; anything bigger than one buffer
+    becomes a B2 large file whose parts are sent in parallel.
+    """
+    uploaded_file = bucket.upload_unbound_stream(
+        stream,
+        s3_key,
+        content_type=content_type,
+        recommended_upload_part_size=UPLOAD_PART_SIZE,
+        buffers_count=UPLOAD_PART_CONCURRENCY + 1,
+        read_size=1024 * 1024
+    )
+    count_bytes('upload', uploaded_file.size)
+    return uploaded_file
+
+def store_upload(stream, s3_key, filename, content_type=None):
+    """Stream an upload to B2, compressing it at rest if it looks compressible.
+
+    Returns the `files` columns describing the stored object.
+    """
+    sample = stream.read(AT_REST_SAMPLE)
+    source = PrefixedReader(sample, stream)
+    codec = at_rest_codec(filename, sample)
+    if not codec:
+        uploaded_file = stream_to_b2(source, s3_key, content_type)
+        return {'filepath': s3_key, 'file_id': uploaded_file.id_, **file_metadata(uploaded_file)}
+
+    counter = CountingReader(source)
+    compressed = zstandard.ZstdCompressor(level=AT_REST_LEVEL).stream_reader(counter)
+    uploaded_file = stream_to_b2(compressed, s3_key, 'application/zstd')
+    return {
+        'filepath': s3_key,
+        'file_id': uploaded_file.id_,
+        **file_metadata(uploaded_file),
+        'content_length': counter.length,
+        'content_type': content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        'codec': codec
+    }
+
 @app.route('/upload', methods=['GET', 'POST'])
 @limiter.limit("10 per minute")
 @login_required
@@ -284,40 +1263,67 @@ def upload():
         errors = []
         user_id = session['user_id']
 
+        conflicts = filename_conflicts(user_id, [secure_filename(file.filename) for file in files if file.filename])
+        if conflicts:
+            return jsonify({"error": NAME_TAKEN, "files": conflicts}), 409
+
+        # The request size is a slight overestimate of the files' total size
+        if quota_exceeded(user_id, request.content_length):
+            return jsonify({"error": "Storage quota exceeded"}), 413
+        scope = blob_scope(user_id)
+
         # Function to process each file
         def process_file(file):
             if file.filename == '':
                 return None  # Skip empty files
             filename = secure_filename(file.filename)
-            s3_key = f"user_{user_id}/{filename}"
+            s3_key = object_key(user_id)
             try:
-                # Read file contents in full (consider streaming for very large files)
-                file_contents = file.read()
-                # Upload to Backblaze B2
-                uploaded_file = bucket.upload_bytes(file_contents, s3_key)
-                file_id = uploaded_file.id_
-                return {
+                # Identical content already stored needs no transfer at all
+                sha256 = hash_stream(file.stream)
+                blob = claim_blob(scope, sha256)
+                if blob:
+                    return {'filename': filename, 'user_id': user_id, **blob_record(blob)}
+
+                # Stream the spooled upload to Backblaze B2 in fixed-size parts
+                return share_blob(scope, sha256, {
                     'filename': filename,
-                    'filepath': s3_key,
-                    'file_id': file_id,
-                    'user_id': user_id
-                }
+                    'user_id': user_id,
+                    **store_upload(file.stream, s3_key, filename, file.mimetype or None)
+                })
             except Exception as e:
                 return e
 
-        # Process all files concurrently
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {executor.submit(process_file, file): file for file in files}
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if isinstance(result, Exception):
-                    errors.append(str(result))
-                elif result is not None:
-                    upload_results.append(result)
+        # Process files concurrently on the shared B2 data pool
+        futures = {}
+        try:
+            for file in files:
+                futures[io_pools['b2_data'].submit(process_file, file)] = file
+        except ServiceBusy:
+            # Files already handed to the pool still upload and claim blobs; undo them
+            done, _ = concurrent.futures.wait(futures)
+            results = [future.result() for future in done]
+            discard_records([r for r in results if r is not None and not isinstance(r, Exception)])
+            raise
+        busy = None
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            if isinstance(result, ServiceBusy):
+                busy = result
+            elif isinstance(result, Exception):
+                errors.append(str(result))
+            elif result is not None:
+                upload_results.append(result)
+
+        # A saturated backend pool sheds the whole request with a 503, not a 500
+        if busy:
+            discard_records(upload_results)
+            raise busy
 
         # If any error occurred, log it and return an error response
         if errors:
             app.logger.error("Upload errors: " + "; ".join(errors))
+            discard_records(upload_results)
             return jsonify({"error": "One or more files failed to upload", "details": errors}), 500
 
         # Bulk insert file metadata into Supabase
@@ -325,7 +1331,12 @@ def upload():
             supabase.table('files').insert(upload_results).execute()
         except Exception as e:
             app.logger.error(f"Supabase insert error: {str(e)}")
+            discard_records(upload_results)
+            if is_unique_violation(e):
+                return jsonify({"error": NAME_TAKEN}), 409
             return jsonify({"error": "Failed to save file metadata", "details": str(e)}), 500
+        adjust_usage(user_id, usage_delta(upload_results))
+        publish_events(user_id, upload_events(upload_results))
 
         # Return the list of uploaded filenames
         uploaded_filenames = [record['filename'] for record in upload_results]
@@ -333,66 +1344,629 @@ def upload():
 
     return render_template('upload.html')
 
-# -------- File listing ----------------------------------------------------- #
-# In-memory cache for file info: key is filepath, value is a dictionary with info and timestamp.
-FILE_INFO_CACHE = {}
+@app.route('/upload/stream', methods=['PUT'])
+@limiter.limit("60 per minute")
+@login_required
+def upload_stream():
+    """Upload one file sent as the raw request body, piping it straight to B2.
+
+    Unlike the multipart form on /upload nothing is spooled to disk first, so
+    memory per upload stays at the part buffers regardless of file size.
+    """
+    filename = secure_filename(request.args.get('filename', ''))
+    if not filename:
+        return jsonify({"error": "No filename provided"}), 400
+
+    user_id = session['user_id']
+    if filename_conflicts(user_id, [filename]):
+        return jsonify({"error": NAME_TAKEN, "files": [filename]}), 409
+    if quota_exceeded(user_id, request.content_length):
+        return jsonify({"error": "Storage quota exceeded"}), 413
+
+    s3_key = object_key(user_id)
+    reader = HashingReader(request.stream)
+    try:
+        stored = io_pools['b2_data'].call(store_upload, reader, s3_key, filename, request.mimetype or None)
+    except ServiceBusy:
+        raise
+    except Exception as e:
+        app.logger.error(f"Upload errors: {str(e)}")
+        return jsonify({"error": "File failed to upload", "details": str(e)}), 500
+
+    # The body can't be hashed before it is sent, so duplicates are only
+    # caught afterwards: the copy just uploaded is dropped for the stored one
+    record = share_blob(blob_scope(user_id), reader.hexdigest(), {
+        'filename': filename,
+        'user_id': user_id,
+        **stored
+    })
+    try:
+        supabase.table('files').insert(record).execute()
+    except Exception as e:
+        app.logger.error(f"Supabase insert error: {str(e)}")
+        discard_records([record])
+        if is_unique_violation(e):
+            return jsonify({"error": NAME_TAKEN}), 409
+        return jsonify({"error": "Failed to save file metadata", "details": str(e)}), 500
+    adjust_usage(user_id, usage_delta([record]))
+    publish_events(user_id, upload_events([record]))
+
+    return jsonify({"message": "Files uploaded successfully", "files": [filename]}), 200
+
+# -------- Metadata Cache ----------------------------------------------------- #
+# B2 metadata for rows that predate the metadata columns is cached by filepath.
+# The default backend is a per-process LRU; METADATA_CACHE_BACKEND=sqlite shares
+# one SQLite file between every gunicorn worker on the host instead.
+METADATA_CACHE_BACKEND = os.getenv('METADATA_CACHE_BACKEND', 'memory')
+METADATA_CACHE_PATH = os.getenv('METADATA_CACHE_PATH', '/tmp/tenacity-metadata-cache.sqlite3')
+METADATA_CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', 10000))  # Max entries
 CACHE_TTL = 90  # Cache time-to-live in seconds
 
+class MemoryCacheBackend:
+    """Per-process LRU dict with a TTL on every entry."""
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store value and return how many entries were evicted to make room."""
+        with self.lock:
+            self.entries[key] = (value, time.time() + self.ttl)
+            self.entries.move_to_end(key)
+            evicted = 0
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+class SqliteCacheBackend:
+    """LRU with TTL kept in one SQLite file, so all workers on a host share it."""
+    def __init__(self, path, max_entries, ttl):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+
+    def connect(self):
+        # sqlite3 connections can't be shared between threads
+        if not hasattr(self.local, 'db'):
+            self.local.db = sqlite3.connect(self.path, timeout=5)
+        return self.local.db
+
+    def get(self, key):
+        now = time.time()
+        with self.connect() as db:
+            row = db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            db.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now)
+            )
+            overflow = db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if overflow <= 0:
+                return 0
+            db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            return overflow
+
+    def delete(self, key):
+        with self.connect() as db:
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+class MetadataCache:
+    """Read-through cache in front of a backend, counting hits, misses and evictions."""
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats = collections.Counter()
+        self.stats_lock = threading.Lock()
+
+    def count(self, stat, n=1):
+        with self.stats_lock:
+            self.stats[stat] += n
+
+    def get_or_load(self, key, loader):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            app.logger.error(f"Metadata cache read failed: {str(e)}")
+            value = None
+        if value is not None:
+            self.count('hits')
+            metrics.inc('tenacity_cache_requests_total', {'cache': 'metadata', 'result': 'hit'}, help='Cache lookups by result.')
+            return value
+
+        self.count('misses')
+        metrics.inc('tenacity_cache_requests_total', {'cache': 'metadata', 'result': 'miss'}, help='Cache lookups by result.')
+        value = loader(key)
+        if value is not None:
+            try:
+                self.count('evictions', self.backend.set(key, value))
+            except Exception as e:
+                app.logger.error(f"Metadata cache write failed: {str(e)}")
+        return value
+
+    def invalidate(self, *keys):
+        for key in keys:
+            try:
+                self.backend.delete(key)
+                self.count('invalidations')
+            except Exception as e:
+                app.logger.error(f"Metadata cache invalidation failed: {str(e)}")
+
+    def snapshot(self):
+        with self.stats_lock:
+            stats = {stat: self.stats[stat] for stat in ('hits', 'misses', 'evictions', 'invalidations')}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['backend'] = METADATA_CACHE_BACKEND
+        return stats
+
+if METADATA_CACHE_BACKEND == 'sqlite':
+    metadata_cache = MetadataCache(SqliteCacheBackend(METADATA_CACHE_PATH, METADATA_CACHE_SIZE, CACHE_TTL))
+else:
+    metadata_cache = MetadataCache(MemoryCacheBackend(METADATA_CACHE_SIZE, CACHE_TTL))
+
 def get_file_info_cached(bucket, filepath):
-    now = time.time()
-    # Check if cached and valid
-    if filepath in FILE_INFO_CACHE:
-        cached = FILE_INFO_CACHE[filepath]
-        if now - cached['timestamp'] < CACHE_TTL:
-            return cached['info']
+    """Return the `files` metadata columns for filepath, or None if B2 can't find it."""
+    def load(key):
+        try:
+            return file_metadata(bucket.get_file_info_by_name(key))
+        except Exception as e:
+            # Optionally log error here if needed.
+            return None
+    return metadata_cache.get_or_load(filepath, load)
+
+@app.route('/api/cache/stats', methods=['GET'])
+@limiter.exempt
+@metrics_token_required
+def cache_stats():
+    return jsonify(metadata_cache.snapshot())
+
+# -------- Direct Uploads ---------------------------------------------------- #
+# Browsers upload straight to B2 and Flask only hands out upload URLs and records
+# the result. Upload URLs come from a short-lived application key restricted to
+# the user's `user_{id}/` prefix, so a token can't write another user's files.
+# The master key needs the writeKeys capability, and the bucket needs a CORS rule
+# allowing b2_upload_file and b2_upload_part from the site's origin.
+DIRECT_UPLOAD_KEY_TTL = 24 * 60 * 60  # Seconds a scoped B2 key lives
+DIRECT_LARGE_FILE_THRESHOLD = 100 * 1024 * 1024  # Larger files are sent as parts
+B2_MAX_PARTS = 10000
+
+# Scoped keys are reused until an hour before they expire, so tokens handed out
+# always outlive the upload they're for
+scoped_upload_apis = MemoryCacheBackend(max_entries=1000, ttl=DIRECT_UPLOAD_KEY_TTL - 60 * 60)
+
+def scoped_upload_api(user_id):
+    """Return a B2Api authorized with a write-only key for the user's prefix."""
+    scoped_api = scoped_upload_apis.get(user_id)
+    if scoped_api is None:
+        key = b2_api.create_key(
+            capabilities=['writeFiles'],
+            key_name=f"tenacity-upload-user-{user_id}",
+            valid_duration_seconds=DIRECT_UPLOAD_KEY_TTL,
+            bucket_id=bucket.id_,
+            name_prefix=f"user_{user_id}/"
+        )
+        scoped_api = B2Api(InMemoryAccountInfo())
+        scoped_api.authorize_account("production", key.id_, key.application_key)
+        scoped_upload_apis.set(user_id, scoped_api)
+    return scoped_api
+
+@app.route('/upload/authorize', methods=['POST'])
+@limiter.limit("20 per minute")
+@login_required
+def authorize_uploads():
+    """Hand out B2 upload targets for {"files": [{"name", "size", "content_type", "sha256"?}]}.
+
+    Each target carries the index of the file it was requested for. Files whose
+    sha256 matches one of the user's stored blobs get type "existing" and need
+    no upload. Files up to DIRECT_LARGE_FILE_THRESHOLD get an upload URL and token.
+    Bigger files get a started B2 large file and UPLOAD_PART_CONCURRENCY part
+    URLs to upload parts through in parallel.
+    """
+    requested = (request.get_json(silent=True) or {}).get('files') or []
+    if not requested:
+        return jsonify({"error": "No files provided"}), 400
+
+    user_id = session['user_id']
+    try:
+        sizes = [int(f.get('size') or 0) for f in requested]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid file size"}), 400
+    if quota_exceeded(user_id, sum(sizes)):
+        return jsonify({"error": "Storage quota exceeded"}), 413
+
     try:
-        info = bucket.get_file_info_by_name(filepath)
-        FILE_INFO_CACHE[filepath] = {'info': info, 'timestamp': now}
-        return info
+        conflicts = filename_conflicts(user_id, [secure_filename(f.get('name') or '') for f in requested if f.get('name')])
+        if conflicts:
+            return jsonify({"error": NAME_TAKEN, "files": conflicts}), 409
+
+        hashes = [f.get('sha256') for f in requested if valid_sha256(f.get('sha256'))]
+        stored = {row['sha256'] for row in supabase.table('blobs').select('sha256')
+                  .eq('scope', blob_scope(user_id, verified=False))
+                  .in_('sha256', hashes)
+                  .execute().data} if hashes else set()
+
+        scoped_api = io_pools['b2_metadata'].call(scoped_upload_api, user_id)
+        uploads = []
+        for index, (f, size) in enumerate(zip(requested, sizes)):
+            filename = secure_filename(f.get('name') or '')
+            if not filename:
+                continue
+            if f.get('sha256') in stored:
+                uploads.append({'index': index, 'name': filename, 'type': 'existing'})
+                continue
+            s3_key = object_key(user_id)
+            content_type = f.get('content_type') or 'b2/x-auto'
+
+            if size <= DIRECT_LARGE_FILE_THRESHOLD:
+                target = io_pools['b2_metadata'].call(scoped_api.session.get_upload_url, bucket.id_)
+                uploads.append({
+                    'index': index,
+                    'name': filename,
+                    'key': s3_key,
+                    'type': 'simple',
+                    'upload_url': target['uploadUrl'],
+                    'authorization_token': target['authorizationToken'],
+                    'content_type': content_type
+                })
+                continue
+
+            large_file = io_pools['b2_metadata'].call(
+                scoped_api.session.start_large_file, bucket.id_, s3_key, content_type, {}
+            )
+            part_urls = []
+            for _ in range(UPLOAD_PART_CONCURRENCY):
+                target = io_pools['b2_metadata'].call(scoped_api.session.get_upload_part_url, large_file['fileId'])
+                part_urls.append({
+                    'upload_url': target['uploadUrl'],
+                    'authorization_token': target['authorizationToken']
+                })
+            uploads.append({
+                'index': index,
+                'name': filename,
+                'key': s3_key,
+                'type': 'large',
+                'file_id': large_file['fileId'],
+                'part_size': max(UPLOAD_PART_SIZE, -(-size // B2_MAX_PARTS)),
+                'part_urls': part_urls
+            })
+    except ServiceBusy:
+        raise
     except Exception as e:
-        # Optionally log error here if needed.
-        return None
+        app.logger.error(f"Upload authorization failed: {str(e)}")
+        return jsonify({"error": "Failed to authorize upload", "details": str(e)}), 500
+
+    return jsonify({"uploads": uploads}), 200
+
+@app.route('/upload/finalize', methods=['POST'])
+@limiter.limit("20 per minute")
+@login_required
+def finalize_uploads():
+    """Record files uploaded directly to B2.
+
+    Takes {"files": [{"name", "file_id", "part_sha1s"?, "sha256"?}]}. Large
+    files are finished with the part checksums first. Each object is then
+    checked with B2 and must sit under the user's prefix, and must not be
+    referenced by another user's row or a stored blob; objects sent with a
+    sha256 are registered as blobs for later uploads to share. Entries with
+    only a name and sha256 (type "existing" from /upload/authorize) reference
+    the stored blob instead. Verified files are inserted with one bulk insert,
+    and the response reports each file's outcome.
+    """
+    uploaded = (request.get_json(silent=True) or {}).get('files') or []
+    if not uploaded:
+        return jsonify({"error": "No files provided"}), 400
+
+    user_id = session['user_id']
+    scope = blob_scope(user_id, verified=False)
+    results = {}
+
+    # Finalizing twice must not create duplicate rows. Any other reference to
+    # the object (another user's row, or a blob that rows share) rules it out:
+    # a new row wouldn't hold a blob reference, so deleting it would remove an
+    # object that others still point at.
+    file_ids = [f.get('file_id') for f in uploaded if f.get('file_id')]
+    rows = supabase.table('files').select('file_id, user_id') \
+        .in_('file_id', file_ids) \
+        .execute().data if file_ids else []
+    blobs = supabase.table('blobs').select('file_id') \
+        .in_('file_id', file_ids) \
+        .execute().data if file_ids else []
+    already_recorded = {row['file_id'] for row in rows if row['user_id'] == user_id}
+    in_use = {row['file_id'] for row in rows + blobs} - already_recorded
+    conflicts = set(filename_conflicts(user_id, [
+        secure_filename(f.get('name') or '') for f in uploaded
+        if f.get('name') and f.get('file_id') not in already_recorded
+    ]))
+
+    def verify(f):
+        filename = secure_filename(f.get('name') or '')
+        file_id = f.get('file_id')
+        if not filename or not file_id:
+            raise ValueError("Missing name or file_id")
+        if file_id in in_use:
+            raise ValueError("Uploaded object is already stored")
+        if f.get('part_sha1s'):
+            # The scoped key's name prefix makes B2 refuse other users' large files
+            scoped_upload_api(user_id).session.finish_large_file(file_id, f['part_sha1s'])
+        file_version = bucket.get_file_info_by_id(file_id)
+        if not file_version.file_name.startswith(f"user_{user_id}/"):
+            raise ValueError("Uploaded object isn't in the user's folder")
+        if filename in conflicts:
+            bucket.delete_file_version(file_id, file_version.file_name)  # Nothing else references it
+            raise ValueError(NAME_TAKEN)
+        return {
+            'filename': filename,
+            'filepath': file_version.file_name,
+            'file_id': file_id,
+            'user_id': user_id,
+            **file_metadata(file_version)
+        }
+
+    records = []
+    new_uploads = [f for f in uploaded if f.get('file_id') or not valid_sha256(f.get('sha256'))]
+    for f in uploaded:
+        if f in new_uploads:
+            continue
+        name = str(f.get('name'))
+        filename = secure_filename(f.get('name') or '')
+        if filename in conflicts:
+            results[name] = {"status": "error", "error": NAME_TAKEN}
+            continue
+        blob = claim_blob(scope, f['sha256']) if filename else None
+        if blob:
+            records.append({'filename': filename, 'user_id': user_id, **blob_record(blob)})
+            results[name] = {"status": "ok"}
+        else:
+            results[name] = {"status": "error", "error": "File is no longer stored, upload it again"}
+
+    futures = {io_pools['b2_metadata'].submit(verify, f): f for f in new_uploads if f.get('file_id') not in already_recorded}
+    for future in concurrent.futures.as_completed(futures):
+        name = str(futures[future].get('name'))
+        try:
+            records.append(future.result())
+            results[name] = {"status": "ok"}
+        except Exception as e:
+            app.logger.error(f"Finalize failed for {name}: {str(e)}")
+            results[name] = {"status": "error", "error": str(e)}
+    for f in uploaded:
+        if f.get('file_id') in already_recorded:
+            results[str(f.get('name'))] = {"status": "ok"}
+
+    # Sizes sent to /upload/authorize are only the client's word
+    if records and quota_exceeded(user_id, sum(record['content_length'] for record in records)):
+        discard_records(records)
+        return jsonify({"error": "Storage quota exceeded"}), 413
+
+    # Keep each new object shareable by the user's later uploads of the same file
+    declared = {f.get('file_id'): f.get('sha256') for f in new_uploads if valid_sha256(f.get('sha256'))}
+    records = [
+        share_blob(scope, declared[record['file_id']], record)
+        if record['file_id'] in declared and not record.get('blob_id') else record
+        for record in records
+    ]
+
+    if records:
+        try:
+            supabase.table('files').insert(records).execute()
+        except Exception as e:
+            app.logger.error(f"Supabase insert error: {str(e)}")
+            discard_records(records)
+            if is_unique_violation(e):
+                return jsonify({"error": NAME_TAKEN}), 409
+            return jsonify({"error": "Failed to save file metadata", "details": str(e)}), 500
+        metadata_cache.invalidate(*[record['filepath'] for record in records])
+        adjust_usage(user_id, usage_delta(records))
+        publish_events(user_id, upload_events(records))
+
+    failed = any(result['status'] != 'ok' for result in results.values())
+    return jsonify({"results": results}), 207 if failed else 200
+
+# -------- File listing ----------------------------------------------------- #
+# Listing is paged with a keyset cursor on (sort column, id), so every page is
+# one indexed Supabase query no matter how many files the user has.
+LIST_SORT_COLUMNS = {
+    'name': 'filename_lower',  # Case-insensitive, see migrations/011
+    'size': 'content_length',
+    'date': 'upload_timestamp',
+    'type': 'extension'
+}
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 500
+# Size and date are null on rows awaiting backfill-metadata; those sort last
+LIST_NULLABLE_COLUMNS = ('content_length', 'upload_timestamp')
+
+def encode_cursor(row, column):
+    return base64.urlsafe_b64encode(json.dumps([row[column], row['id']]).encode()).decode()
+
+def decode_cursor(cursor, sort):
+    """Return the (sort value, id) of a cursor, checking the value fits the sort."""
+    value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    column = LIST_SORT_COLUMNS[sort]
+    if column in LIST_NULLABLE_COLUMNS:
+        valid = value is None or (isinstance(value, int) and not isinstance(value, bool))
+    else:
+        valid = isinstance(value, str)
+    if not valid or isinstance(last_id, bool) or not isinstance(last_id, int):
+        raise ValueError(f"Invalid cursor for sort {sort}")
+    return value, last_id
+
+def postgrest_value(value):
+    """Quote a value for use inside a PostgREST or=(...) filter."""
+    if isinstance(value, str):
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return str(value)
+
+def like_pattern(text):
+    """Escape LIKE wildcards so user text matches literally."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def query_files_page(user_id, sort='name', order='asc', q=None, limit=LIST_DEFAULT_LIMIT, after=None):
+    """Return one page of a user's files and the cursor for the next page (or None).
+
+    after is a decoded cursor: the (sort value, id) of the last row already seen.
+    """
+    column = LIST_SORT_COLUMNS[sort]
+    desc = order == 'desc'
+    op = 'lt' if desc else 'gt'
+
+    query = supabase.table('files').select(f'id, extension, filename_lower, {FILE_COLUMNS}').eq('user_id', user_id)
+    if q:
+        query = query.ilike('filename', f"%{like_pattern(q)}%")
+    if after:
+        value, last_id = after
+        if value is None:
+            # Already among the trailing null rows
+            query = query.is_(column, 'null')
+            query = query.lt('id', last_id) if desc else query.gt('id', last_id)
+        else:
+            value = postgrest_value(value)
+            keyset = f"{column}.{op}.{value},and({column}.eq.{value},id.{op}.{last_id})"
+            if column in LIST_NULLABLE_COLUMNS:
+                keyset += f",{column}.is.null"  # Null rows follow every value
+            query = query.or_(keyset)
+
+    rows = query.order(column, desc=desc, nullsfirst=False).order('id', desc=desc).limit(limit + 1).execute().data
+    next_cursor = encode_cursor(rows[limit - 1], column) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def format_file(file):
+    return {
+        "name": file['filename'],
+        "size": file['content_length'],
+        "type": file['filename'].split('.')[-1],
+        "last_modified": datetime.fromtimestamp(file['upload_timestamp'] / 1000)\
+            .strftime('%Y-%m-%d %H:%M:%S')
+    }
 
 @app.route('/files/list', methods=['GET'])
 @login_required
 def list_files():
+    """List the user's files one page at a time.
+
+    Query parameters: sort (name|size|date|type), order (asc|desc), q (filename
+    substring), limit (1-500) and cursor (the next_cursor of the previous page).
+    Responses carry the user's change version as their ETag; a matching
+    If-None-Match gets a 304 without running the listing query.
+    """
     if 'user_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
+    sort = request.args.get('sort', 'name')
+    order = request.args.get('order', 'asc')
+    if sort not in LIST_SORT_COLUMNS or order not in ('asc', 'desc'):
+        return jsonify({"error": "Invalid sort or order"}), 400
     try:
-        # 2. Fetch files from Supabase
-        supabase_files = supabase.table('files').select('filename, filepath')\
-            .eq('user_id', session['user_id']).execute().data
-
-        if not supabase_files:
-            return jsonify({"files": []})
-
-        # 3. Get file info concurrently, using caching to reduce repeated API calls
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            file_infos = list(executor.map(
-                lambda f: get_file_info_cached(bucket, f['filepath']),
-                supabase_files
-            ))
-
-        # 4. Format response using the cached or freshly retrieved file information
-        file_list = []
-        for file, info in zip(supabase_files, file_infos):
-            if not info:
-                continue
-            file_list.append({
-                "name": file['filename'],
-                "size": info.content_length,
-                "type": file['filename'].split('.')[-1],
-                "last_modified": datetime.fromtimestamp(info.upload_timestamp / 1000)\
-                    .strftime('%Y-%m-%d %H:%M:%S')
-            })
+        limit = min(max(int(request.args.get('limit', LIST_DEFAULT_LIMIT)), 1), LIST_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
 
-        return jsonify({"files": file_list})
+    try:
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor, sort) if cursor else None
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid cursor"}), 400
 
+    try:
+        # 0. Nothing changed since the client's copy: skip the query and B2
+        etag = version_etag(session['user_id'], user_version(session['user_id']))
+        cached = revalidate(etag)
+        if cached:
+            return cached
+
+        # 1. Fetch one page of files and their saved metadata from Supabase
+        supabase_files, next_cursor = query_files_page(
+            session['user_id'], sort, order,
+            q=request.args.get('q', '').strip(),
+            limit=limit,
+            after=after
+        )
+
+        # 2. Only rows saved before metadata was stored need a B2 lookup
+        supabase_files = fill_missing_metadata(supabase_files)
+
+        # 3. Format response
+        return tag_response(jsonify({
+            "files": [format_file(file) for file in supabase_files],
+            "next_cursor": next_cursor
+        }), etag)
+
+    except ServiceBusy:
+        raise
     except Exception as e:
         app.logger.error(f"Error in /files/list: {str(e)}")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+# -------- Search ---------------------------------------------------------- #
+# Ranking happens in the `search_files` RPC over a trigram index on filenames,
+# which Postgres keeps current as rows are inserted, renamed and deleted.
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+@app.route('/files/search', methods=['GET'])
+@login_required
+def search_files():
+    """Return the user's best filename matches for ?q=, best first."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"files": []})
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    try:
+        matches = supabase.rpc('search_files', {
+            'p_user_id': session['user_id'],
+            'p_query': query,
+            'p_limit': limit
+        }).execute().data or []
+        matches = fill_missing_metadata(matches)
+        return jsonify({"files": [format_file(file) for file in matches]})
+    except ServiceBusy:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error in /files/search: {str(e)}")
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
 # -------- Delete ---------------------------------------------------------- #
 @app.route('/files/delete/<filename>', methods=['DELETE'])
 @login_required
@@ -400,7 +1974,7 @@ def delete_file(filename):
     try:
         # 1. Get file metadata from Supabase
         file_data = supabase.table('files') \
-            .select('filepath, file_id') \
+            .select(f'id, {FILE_COLUMNS}') \
             .eq('filename', secure_filename(filename)) \
             .eq('user_id', session['user_id']) \
             .execute()
@@ -408,25 +1982,108 @@ def delete_file(filename):
         if not file_data.data:
             return jsonify({"error": "File not found"}), 404
 
-        s3_key = file_data.data[0]['filepath']
-        file_id = file_data.data[0]['file_id']
+        removed = file_data.data
+        fill_missing_metadata(removed)  # Sizes for the usage counters
 
-        # 2. Delete from Backblaze B2 using file ID
-        bucket.delete_file_version(file_id, s3_key)
+        # 2. Delete from Backblaze B2 using file ID, unless other files share it
+        for row in removed:
+            io_pools['b2_metadata'].call(delete_stored_object, row)
 
-        # 3. Delete from Supabase
+        # 3. Delete exactly the rows whose objects were released
         supabase.table('files') \
             .delete() \
-            .eq('filename', filename) \
+            .in_('id', [row['id'] for row in removed]) \
             .eq('user_id', session['user_id']) \
             .execute()
+        adjust_usage(session['user_id'], usage_delta(removed, sign=-1))
+        publish_events(session['user_id'], [('delete', row['filename'], None) for row in removed])
 
         return jsonify({"message": "File deleted successfully"}), 200
 
+    except ServiceBusy:
+        raise
     except Exception as e:
         app.logger.error(f"Delete error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+MAX_BULK_DELETE = 1000  # Filenames accepted per bulk delete request
+
+@app.route('/files/delete', methods=['POST'])
+@login_required
+def delete_files():
+    """Delete many files at once.
+
+    Takes {"filenames": [...]}, resolves them with one query, deletes the B2
+    versions in parallel on the metadata pool and removes the rows in one
+    statement. Only files whose B2 delete succeeded lose their row. Returns a
+    result per filename, with 207 if any of them failed.
+    """
+    filenames = (request.get_json(silent=True) or {}).get('filenames', [])
+    safe_filenames = list(dict.fromkeys(secure_filename(name) for name in filenames if name))
+    if not safe_filenames:
+        return jsonify({"error": "No files provided"}), 400
+    if len(safe_filenames) > MAX_BULK_DELETE:
+        return jsonify({"error": f"At most {MAX_BULK_DELETE} files per delete"}), 400
+
+    user_id = session['user_id']
+    try:
+        file_data = supabase.table('files') \
+            .select(f'id, {FILE_COLUMNS}') \
+            .in_('filename', safe_filenames) \
+            .eq('user_id', user_id) \
+            .execute()
+    except ServiceBusy:
+        raise
+    except Exception as e:
+        app.logger.error(f"Delete error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    rows = file_data.data
+    found = {row['filename'] for row in rows}
+    results = {name: {"status": "error", "error": "File not found"} for name in safe_filenames if name not in found}
+
+    fill_missing_metadata(rows)  # Sizes for the usage counters
+    removed = []
+    errors = {}  # Row id -> error
+    futures = {}
+    for row in rows:
+        try:
+            futures[io_pools['b2_metadata'].submit(delete_stored_object, row)] = row
+        except ServiceBusy as e:
+            errors[row['id']] = str(e)
+    for future in concurrent.futures.as_completed(futures):
+        row = futures[future]
+        try:
+            future.result()
+            removed.append(row)
+        except Exception as e:
+            app.logger.error(f"Delete failed for {row['filename']}: {str(e)}")
+            errors[row['id']] = str(e)
+
+    if removed:
+        try:
+            supabase.table('files') \
+                .delete() \
+                .in_('id', [row['id'] for row in removed]) \
+                .eq('user_id', user_id) \
+                .execute()
+        except Exception as e:
+            # B2 objects are already gone; report so the caller can retry the rows
+            app.logger.error(f"Supabase delete error: {str(e)}")
+            return jsonify({"error": "Failed to remove file records", "details": str(e)}), 500
+        adjust_usage(user_id, usage_delta(removed, sign=-1))
+        publish_events(user_id, [('delete', row['filename'], None) for row in removed])
+
+    # A name counts as deleted once every row carrying it is
+    for row in rows:
+        if row['id'] in errors:
+            results[row['filename']] = {"status": "error", "error": errors[row['id']]}
+        else:
+            results.setdefault(row['filename'], {"status": "ok"})
+
+    failed = any(result['status'] != 'ok' for result in results.values())
+    return jsonify({"results": results}), 207 if failed else 200
+
 # -------- Rename ---------------------------------------------------------- #
 @app.route('/files/edit/<filename>', methods=['POST'])
 @login_required
@@ -439,69 +2096,296 @@ def edit_file(filename):
 
             # Get the file data from Supabase
             file_data = supabase.table('files') \
-                .select('filepath, file_id') \
+                .select(FILE_COLUMNS) \
                 .eq('filename', safe_filename) \
                 .eq('user_id', session['user_id']) \
                 .execute()
             
             if not file_data.data:
                 return jsonify({"error": "File not found"}), 404
+            if new_filename != safe_filename and filename_conflicts(session['user_id'], [new_filename]):
+                return jsonify({"error": NAME_TAKEN}), 409
 
-            old_s3_key = file_data.data[0]['filepath']
-            file_id = file_data.data[0]['file_id']
-            new_s3_key = f"user_{session['user_id']}/{new_filename}"
-
-            # Rename the file in Backblaze B2 (copy + delete)
-            bucket.copy_file(old_s3_key, new_s3_key)
-            bucket.delete_file_version(file_id, old_s3_key)
-
-            # Update the file metadata in Supabase
+            # The B2 object key doesn't depend on the name, so only the row changes
             supabase.table('files').update({
-                'filename': new_filename,
-                'filepath': new_s3_key
+                'filename': new_filename
             }).eq('filename', safe_filename).eq('user_id', session['user_id']).execute()
 
+            # A new extension can move the file to another usage category
+            old_rows = fill_missing_metadata(file_data.data)
+            new_rows = [dict(row, filename=new_filename) for row in old_rows]
+            removed, added = usage_delta(old_rows, sign=-1), usage_delta(new_rows)
+            adjust_usage(session['user_id'], {column: removed[column] + added[column] for column in USAGE_COLUMNS})
+            publish_events(session['user_id'], [('rename', safe_filename, {'new_name': new_filename})])
+
             return jsonify({"message": "File renamed successfully"}), 200
         else:
             return jsonify({"error": "No new filename provided"}), 400
+    except ServiceBusy:
+        raise
     except Exception as e:
+        if is_unique_violation(e):
+            return jsonify({"error": NAME_TAKEN}), 409  # Taken since the check
         return jsonify({"error": str(e)}), 500
 
 # -------- Sort Files ----------------------------------------------------- #
 @app.route('/files/sort', methods=['GET'])
 @login_required
 def sort_files():
-    sort_by = request.args.get('by', 'name')  # Default sorting by name
-    sort_order = request.args.get('order', 'asc')  # Default sorting order: ascending
+    """Older name for /files/list that takes the sort column as ?by=."""
+    args = request.args.to_dict()
+    args['sort'] = args.pop('by', 'name')  # Default sorting by name
+    return redirect(url_for('list_files', **args))
+
+# -------- Change Feed ------------------------------------------------------- #
+# Uploads, deletes and renames are appended to `file_events` (migrations/008)
+# and numbered per user by seq (migrations/013). A user's events commit in seq
+# order, so a reader never sees one before an earlier one. /files/events streams
+# a user's events as Server-Sent Events: at once for changes made through this
+# worker, within EVENTS_POLL seconds for changes made through another one.
+# Streams end after EVENTS_STREAM_SECONDS so they don't pin a worker thread, and
+# browsers reconnect with Last-Event-ID to resume where they stopped.
+# Each open stream holds one request thread, so this needs the threaded workers
+# from gunicorn.conf.py; EVENTS_MAX_STREAMS must stay below its thread count,
+# and EVENTS_MAX_USER_STREAMS stops one user's tabs from taking them all.
+EVENTS_POLL = float(os.getenv('EVENTS_POLL', 5))  # Seconds between checks for other workers' events
+EVENTS_STREAM_SECONDS = int(os.getenv('EVENTS_STREAM_SECONDS', 300))
+EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', 20))  # Open streams per worker process
+EVENTS_MAX_USER_STREAMS = int(os.getenv('EVENTS_MAX_USER_STREAMS', 3))  # Per user, per worker process
+EVENTS_BATCH = 500  # A client further behind than this reloads its listing instead
+EVENTS_RETRY_MS = 3000  # Browser reconnect delay
+
+event_streams = threading.BoundedSemaphore(EVENTS_MAX_STREAMS)
+user_event_streams = collections.Counter()  # user_id -> streams open in this process
+user_event_streams_lock = threading.Lock()
+event_condition = threading.Condition()
+local_event_heads = {}  # user_id -> newest event seq published by this process
+
+def open_stream_slot(user_id):
+    """Take a stream slot for user_id; False when the user already has too many.
+
+    Raises ServiceBusy when the process is out of stream slots.
+    """
+    with user_event_streams_lock:
+        if user_event_streams[user_id] >= EVENTS_MAX_USER_STREAMS:
+            return False
+        if not event_streams.acquire(blocking=False):
+            raise ServiceBusy('events')
+        user_event_streams[user_id] += 1
+    return True
+
+def close_stream_slot(user_id):
+    with user_event_streams_lock:
+        user_event_streams[user_id] -= 1
+        if not user_event_streams[user_id]:
+            del user_event_streams[user_id]
+        event_streams.release()
+
+def publish_events(user_id, events):
+    """Append (kind, filename, data) events to a user's change feed.
+
+    Called after the change itself succeeded, so failures are only logged;
+    clients catch up when their listing is next revalidated.
+    """
+    if not events:
+        return
+    try:
+        rows = supabase.table('file_events').insert([
+            {'user_id': user_id, 'kind': kind, 'filename': filename, 'data': data}
+            for kind, filename, data in events
+        ]).execute().data
+    except Exception as e:
+        app.logger.error(f"Change feed update failed for user {user_id}: {str(e)}")
+        return
+    with event_condition:
+        local_event_heads[user_id] = max(row['seq'] for row in rows)
+        event_condition.notify_all()
+
+def upload_events(records):
+    return [('upload', record['filename'], {'file': format_file(record)}) for record in records]
+
+def latest_event_seq(user_id):
+    rows = supabase.table('file_events').select('seq').eq('user_id', user_id) \
+        .order('seq', desc=True).limit(1).execute().data
+    return rows[0]['seq'] if rows else 0
+
+def event_exists(user_id, seq):
+    return bool(supabase.table('file_events').select('seq').eq('user_id', user_id).eq('seq', seq).execute().data)
+
+def events_after(user_id, seq, limit):
+    return supabase.table('file_events').select('seq, kind, filename, data') \
+        .eq('user_id', user_id) \
+        .gt('seq', seq) \
+        .order('seq') \
+        .limit(limit) \
+        .execute().data
+
+def sse(event, data, event_id=None):
+    """Format one Server-Sent Event."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def event_stream(user_id, since):
+    """Yield a user's events after since (None: only new ones) until the stream expires.
+
+    `ready` and `resync` carry the current head; after `resync` the client
+    reloads its listing because events it missed are gone or too many.
+    """
+    deadline = time.monotonic() + EVENTS_STREAM_SECONDS
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        head = latest_event_seq(user_id)
+        if since is None:
+            yield sse('ready', {'seq': head}, head)
+            since = head
+        elif since > head or (since and not event_exists(user_id, since)):
+            yield sse('resync', {'seq': head}, head)
+            since = head
+
+        while time.monotonic() < deadline:
+            rows = events_after(user_id, since, EVENTS_BATCH + 1)
+            if len(rows) > EVENTS_BATCH:
+                since = latest_event_seq(user_id)
+                yield sse('resync', {'seq': since}, since)
+                continue
+            for row in rows:
+                yield sse('change', {'seq': row['seq'], 'type': row['kind'], 'name': row['filename'], **(row['data'] or {})}, row['seq'])
+                since = row['seq']
+
+            with event_condition:
+                if local_event_heads.get(user_id, 0) <= since:
+                    event_condition.wait(min(EVENTS_POLL, max(0, deadline - time.monotonic())))
+            yield ": keep-alive\n\n"  # Also how a closed connection is noticed
+    finally:
+        close_stream_slot(user_id)
+
+@app.route('/files/events', methods=['GET'])
+@login_required
+def file_events():
+    """Stream the user's upload, delete and rename events as Server-Sent Events.
 
-    # Fetch files for the logged-in user from Supabase
-    files_data = supabase.table('files').select('filename, filepath').eq('user_id', session['user_id']).execute()
-    files = files_data.data if files_data.data else []
+    Resumes after the Last-Event-ID header or ?since=, the seq of the last
+    event the client applied. A user past EVENTS_MAX_USER_STREAMS open
+    streams gets a 429.
+    """
+    try:
+        since = request.headers.get('Last-Event-ID') or request.args.get('since')
+        since = int(since) if since else None
+    except ValueError:
+        return jsonify({"error": "Invalid event id"}), 400
+
+    user_id = session['user_id']
+    if not open_stream_slot(user_id):
+        return jsonify({"error": "Too many open event streams"}), 429
+    try:
+        stream = event_stream(user_id, since)
+        first = next(stream)  # Nothing is queried yet; this starts the generator so it owns the slot
+    except Exception:
+        close_stream_slot(user_id)
+        raise
+
+    response = Response(itertools.chain([first], stream), mimetype='text/event-stream')
+    response.call_on_close(stream.close)  # Frees the slot when the client goes away
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy hold events back
+    return response
 
-    file_list = []
-    for file in files:
+@app.cli.command('prune-file-events')
+@click.option('--days', default=7, show_default=True, help='Keep events newer than this.')
+def prune_file_events(days):
+    """Delete change feed events older than --days."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    deleted = supabase.table('file_events').delete().lt('created_at', cutoff).execute().data
+    click.echo(f"Deleted {len(deleted)} events")
+
+@app.route('/api/io/stats', methods=['GET'])
+@limiter.exempt
+@metrics_token_required
+def io_stats():
+    """Queue depth, running calls and slot wait times for each backend pool."""
+    return jsonify({name: pool.snapshot() for name, pool in io_pools.items()})
+
+def pool_samples():
+    snapshots = {name: pool.snapshot() for name, pool in io_pools.items()}
+    pool_stats = (
+        ('tenacity_io_running', 'gauge', 'running'),
+        ('tenacity_io_queue_depth', 'gauge', 'queue_depth'),
+        ('tenacity_io_rejected_total', 'counter', 'rejected')
+    )
+    return [
+        (metric, kind, {'pool': name}, snapshot[stat])
+        for metric, kind, stat in pool_stats
+        for name, snapshot in snapshots.items()
+    ]
+
+# This process's file in METRICS_DIR; the suffix keeps a reused pid from
+# overwriting an exited worker's totals
+METRICS_FILE = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+
+def flush_metrics():
+    """Write this process's series to its file in METRICS_DIR."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, METRICS_FILE)
+    temp = f"{path}.tmp"
+    with open(temp, 'w') as f:
+        json.dump({'pid': os.getpid(), **metrics.state(), 'samples': pool_samples()}, f)
+    os.replace(temp, path)
+
+def flush_metrics_forever():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
         try:
-            # Get file metadata from Backblaze B2
-            file_info = bucket.get_file_info_by_name(file['filepath'])
-            file_list.append({
-                "name": file['filename'],
-                "size": file_info.content_length,
-                "type": file['filename'].split('.')[-1],
-                "last_modified": file_info.upload_timestamp
-            })
+            flush_metrics()
         except Exception as e:
-            continue  # Skip files that can't be accessed
-
-    # Sort the files based on the 'by' and 'order' parameters
-    if sort_by == 'size':
-        sorted_files = sorted(file_list, key=lambda x: x['size'], reverse=(sort_order == 'desc'))
-    elif sort_by == 'date':
-        sorted_files = sorted(file_list, key=lambda x: x['last_modified'], reverse=(sort_order == 'desc'))
-    else:
-        # Default to sorting by name
-        sorted_files = sorted(file_list, key=lambda x: x['name'].lower(), reverse=(sort_order == 'desc'))
+            app.logger.error(f"Metrics flush failed: {str(e)}")
 
-    return jsonify({'files': sorted_files})
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def host_metrics():
+    """Every worker's series summed, and their pool samples.
+
+    Counters of workers that have exited stay in the sum so totals never drop;
+    their gauges are left out.
+    """
+    if not METRICS_DIR:
+        return metrics, pool_samples()
+    flush_metrics()
+    merged = Metrics()
+    totals = {}
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue  # Being replaced or removed
+        merged.load(state)
+        alive = process_alive(state['pid'])
+        for name, kind, labels, value in state['samples']:
+            if kind == 'gauge' and not alive:
+                continue
+            key = (name, kind, tuple(sorted(labels.items())))
+            totals[key] = totals.get(key, 0) + value
+    return merged, [(name, kind, dict(labels), value) for (name, kind, labels), value in sorted(totals.items())]
+
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+@metrics_token_required
+def metrics_endpoint():
+    """Prometheus scrape target."""
+    merged, samples = host_metrics()
+    return Response(merged.render(samples), mimetype='text/plain; version=0.0.4')
 
 # -------- Redirect Routes ---------------------------------------------------------- #
 @app.route('/redirect_to_log-in')
@@ -517,15 +2401,447 @@ def redirect_to_dashboard():
     return redirect(url_for('dashboard'))
 
 # -------- Download Files ------------------------------------ #
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_PREFETCH = int(os.getenv('DOWNLOAD_PREFETCH', 4))  # B2 responses opened ahead in bulk downloads
+MAX_BULK_DOWNLOAD = 1000  # Files per archive
+REDIRECT_URL_TTL = 60  # Seconds a redirect download link stays valid
+
+# Formats that are already compressed; deflating them again only burns CPU.
+PRECOMPRESSED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".pdf",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst", ".br",
+    ".mp3", ".aac", ".ogg", ".flac", ".mp4", ".mov", ".mkv", ".webm", ".avi",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub", ".jar", ".apk"
+)
+
+# All server-side reads from B2 share one pooled keep-alive session. Transient
+# 5xx and 429 answers are retried with backoff, and with DOWNLOAD_HEDGE_AFTER set a
+# read that hasn't started answering by then is raced against a second request.
+DOWNLOAD_POOL_SIZE = int(os.getenv('DOWNLOAD_POOL_SIZE', 32))  # Keep-alive connections to B2
+DOWNLOAD_TIMEOUT = (5, 60)  # Seconds to connect, and between bytes
+DOWNLOAD_AUTH_TTL = 60 * 60  # Seconds a cached download token is issued for
+DOWNLOAD_HEDGE_AFTER = float(os.getenv('DOWNLOAD_HEDGE_AFTER', 0))  # Seconds; 0 disables hedging
+
+download_session = requests.Session()
+download_session.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=DOWNLOAD_POOL_SIZE,
+    max_retries=Retry(
+        total=3,
+        connect=3,
+        read=2,
+        backoff_factor=0.25,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET',),
+        raise_on_status=False
+    )
+))
+
+# Tokens are cached per user prefix and dropped five minutes before they expire
+download_tokens = MemoryCacheBackend(max_entries=10000, ttl=DOWNLOAD_AUTH_TTL - 5 * 60)
+hedge_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_POOL_SIZE, thread_name_prefix="b2-hedge")
+
+def b2_download_url(filepath):
+    """URL of filepath on the download host the B2 account was authorized for."""
+    return f"{b2_api.account_info.get_download_url()}/file/{bucket.name}/{quote(filepath)}"
+
+def download_token(prefix):
+    token = download_tokens.get(prefix)
+    result = 'hit' if token else 'miss'
+    metrics.inc('tenacity_cache_requests_total', {'cache': 'download_tokens', 'result': result}, help='Cache lookups by result.')
+    if token is None:
+        token = bucket.get_download_authorization(prefix, DOWNLOAD_AUTH_TTL)
+        download_tokens.set(prefix, token)
+    return token
+
+def b2_file_url(filepath, valid_seconds=600, filename=None):
+    """Return a B2 download URL for filepath carrying a short-lived auth token.
+
+    These URLs are handed to browsers, so the token is made for this one file
+    rather than taken from the prefix cache. Object keys aren't the file's
+    name, so filename asks B2 to name the download through Content-Disposition.
+    """
+    auth_token = bucket.get_download_authorization(filepath, valid_seconds)
+    url = f"{b2_download_url(filepath)}?Authorization={auth_token}"
+    if filename:
+        url += "&b2ContentDisposition=" + quote(f'attachment; filename="{filename}"')
+    return url
+
+def fetch_b2(filepath, file_id, headers=None):
+    """GET filepath from B2 on the pooled session; the body is streamed on demand.
+
+    Downloads by name serve the newest version under filepath. A blob shared
+    between users (DEDUP_SCOPE=global) sits under its first uploader's prefix,
+    whose scoped upload key can add a newer version there, so the response has
+    to be the version the row points at.
+    """
+    prefix = filepath.rsplit('/', 1)[0] + '/'
+    for attempt in range(2):
+        response = timed(
+            'b2_download', 'get', download_session.get,
+            b2_download_url(filepath),
+            headers={**(headers or {}), 'Authorization': download_token(prefix)},
+            stream=True,
+            timeout=DOWNLOAD_TIMEOUT
+        )
+        if response.status_code != 401 or attempt:
+            break
+        # The cached token was revoked or outlived the account token; get a new one
+        response.close()
+        download_tokens.delete(prefix)
+
+    if response.status_code in (200, 206) and response.headers.get('x-bz-file-id') != file_id:
+        response.close()
+        raise Exception(f"B2 served another version of {filepath} than {file_id}")
+    return response
+
+def hedged(fn, *args):
+    """Run fn, racing a second call if the first hasn't returned in DOWNLOAD_HEDGE_AFTER."""
+    if not DOWNLOAD_HEDGE_AFTER:
+        return fn(*args)
+    first = hedge_executor.submit(fn, *args)
+    try:
+        return first.result(timeout=DOWNLOAD_HEDGE_AFTER)
+    except concurrent.futures.TimeoutError:
+        pass
+
+    pending = {first, hedge_executor.submit(fn, *args)}
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # Close whichever response loses the race once it arrives
+                for loser in pending:
+                    loser.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                return future.result()
+    return first.result()  # Both failed: raise the first error
+
+def open_b2_stream(filepath, file_id):
+    """Start a streaming GET for filepath; only headers are read until iterated."""
+    upstream = hedged(fetch_b2, filepath, file_id)
+    if upstream.status_code != 200:
+        upstream.close()
+        raise Exception(f"B2 returned {upstream.status_code} for {filepath}")
+    return upstream
+
+# Optional read-through disk cache for single-file downloads. Entries are keyed
+# by B2 file id, which never changes for a stored object (renames only touch the
+# row), and hold the file's decompressed bytes. Hits are served with send_file,
+# so gunicorn hands them to sendfile and Range / If-Range work as for B2. A miss
+# is copied into the cache by a background thread while the client is sent each
+# byte as soon as it is on disk. Recency is the entry's mtime and the size bound
+# is checked against the directory itself, so every worker on a host shares one
+# LRU of at most DOWNLOAD_CACHE_BYTES.
+DOWNLOAD_CACHE_DIR = os.getenv('DOWNLOAD_CACHE_DIR')  # Unset disables the cache
+DOWNLOAD_CACHE_BYTES = int(os.getenv('DOWNLOAD_CACHE_BYTES', 10 * 1024 ** 3))
+DOWNLOAD_CACHE_MAX_OBJECT = int(os.getenv('DOWNLOAD_CACHE_MAX_OBJECT', 256 * 1024 ** 2))  # Bigger files bypass it
+DOWNLOAD_CACHE_STALE_FILL = 60 * 60  # Seconds before an abandoned partial fill is removed
+
+class CacheFill:
+    """A cache entry being written: its temporary file and how much of it is there."""
+    def __init__(self, temp):
+        self.temp = temp
+        self.written = 0
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def advance(self, size):
+        with self.condition:
+            self.written += size
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done, self.error = True, error
+            self.condition.notify_all()
+
+    def follow(self, file):
+        """Yield the fill's bytes from file, an open reader of temp, as they are written.
+
+        The reader keeps working after temp is moved into place.
+        """
+        with file:
+            sent = 0
+            while True:
+                with self.condition:
+                    while self.written == sent and not self.done:
+                        self.condition.wait()
+                    written, done, error = self.written, self.done, self.error
+                if error is not None:
+                    raise error
+                while sent < written:
+                    chunk = file.read(min(DOWNLOAD_CHUNK_SIZE, written - sent))
+                    sent += len(chunk)
+                    yield chunk
+                if done:
+                    return
+
+class DiskCache:
+    """Size-bounded LRU of files in one directory, with atomic, single-flight fills."""
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.filling = {}  # key -> CacheFill in progress in this process
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def count(self, result):
+        metrics.inc('tenacity_cache_requests_total', {'cache': 'downloads', 'result': result}, help='Cache lookups by result.')
+
+    def get(self, key):
+        """Return the path of key's cached file, or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        self.count('hit')
+        return path
+
+    def fill(self, key, start):
+        """Return an iterator over key's bytes that are being written to the cache.
+
+        start() is called in the calling thread for an iterator over the content,
+        which a background thread then copies into the cache. Concurrent misses
+        for key in this process follow that one fill instead of starting another.
+        """
+        path = self.path(key)
+        with self.lock:
+            fill = self.filling.get(key)
+            if fill is not None:
+                self.count('shared')
+                return fill.follow(open(fill.temp, 'rb'))
+            if os.path.exists(path):  # Filled since get() missed
+                self.count('hit')
+                return read_chunks(path)
+            fill = CacheFill(os.path.join(self.directory, f".fill-{uuid.uuid4().hex}"))
+            file = open(fill.temp, 'wb')
+            reader = open(fill.temp, 'rb')
+            self.filling[key] = fill
+
+        self.count('miss')
+        try:
+            chunks = start()
+        except BaseException as e:
+            file.close()
+            reader.close()
+            self.abandon(key, fill, e)
+            raise
+        threading.Thread(target=self.write, args=(key, path, fill, file, chunks),
+                         name='download-cache-fill', daemon=True).start()
+        return fill.follow(reader)
+
+    def write(self, key, path, fill, file, chunks):
+        """Copy chunks into the fill's file, then move it into place so later lookups hit."""
+        try:
+            with file:
+                for chunk in chunks:
+                    file.write(chunk)
+                    file.flush()  # Followers read from their own file object
+                    fill.advance(len(chunk))
+            with self.lock:
+                os.replace(fill.temp, path)
+                del self.filling[key]
+        except Exception as e:
+            app.logger.error(f"Download cache fill failed for {key}: {str(e)}")
+            self.abandon(key, fill, e)
+            return
+        fill.finish()
+        try:
+            self.trim()
+        except OSError as e:
+            app.logger.error(f"Download cache trim failed: {str(e)}")
+
+    def abandon(self, key, fill, error):
+        with self.lock:
+            self.filling.pop(key, None)
+            try:
+                os.remove(fill.temp)
+            except OSError:
+                pass
+        fill.finish(error)
+
+    def scan(self):
+        """List (path, size, mtime) of every entry, clearing out abandoned fills."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+                if entry.name.startswith('.fill-'):
+                    if time.time() - stat.st_mtime > DOWNLOAD_CACHE_STALE_FILL:
+                        os.remove(entry.path)
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+            except OSError:
+                continue  # Evicted by another worker meanwhile
+        return entries
+
+    def trim(self):
+        """Measure the directory and, if it is over max_bytes, delete least recently
+        used entries until it is under 90% of it."""
+        entries = self.scan()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)  # Responses already sending it keep their open file
+                total -= size
+                metrics.inc('tenacity_cache_evictions_total', {'cache': 'downloads'}, help='Cache entries evicted to make room.')
+            except OSError:
+                pass
+
+    def invalidate(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+def read_chunks(path):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b'')
+
+download_cache = DiskCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_BYTES) if DOWNLOAD_CACHE_DIR else None
+
+def open_download(filepath, file_id, codec):
+    """Open filepath on B2 and return an iterator over its decompressed bytes.
+
+    Only the response headers are read here; the body is read as the iterator is.
+    """
+    upstream = open_b2_stream(filepath, file_id)
+
+    def chunks():
+        try:
+            yield from decompressed_chunks(counted_chunks(upstream.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)), codec)
+        finally:
+            upstream.close()
+    return chunks()
+
+def cacheable(row):
+    return download_cache is not None and row.get('content_length') is not None \
+        and row['content_length'] <= DOWNLOAD_CACHE_MAX_OBJECT
+
+def prefetched_entries(rows):
+    """Yield (filename, chunk iterator) pairs for stream_zip in row order.
+
+    Up to DOWNLOAD_PREFETCH B2 requests are opened ahead of the one being
+    written, on the shared B2 data pool, which hides per-object latency while
+    only the current object's bytes are ever read. Files that can't be fetched are listed in an extra
+    download-errors.txt entry at the end of the archive.
+    """
+    failed = []
+    pending = collections.deque()
+    rows = iter(rows)
+
+    def fetch(row):
+        try:
+            return io_pools['b2_data'].submit(open_b2_stream, row['filepath'], row['file_id'])
+        except ServiceBusy as e:
+            # Pool saturated: record this one as failed rather than break the archive
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    try:
+        for row in itertools.islice(rows, DOWNLOAD_PREFETCH):
+            pending.append((row, fetch(row)))
+
+        while pending:
+            row, future = pending.popleft()
+            next_row = next(rows, None)
+            if next_row is not None:
+                pending.append((next_row, fetch(next_row)))
+
+            try:
+                upstream = future.result()
+            except Exception as e:
+                app.logger.error(f"Bulk download skipped {row['filename']}: {str(e)}")
+                failed.append(row['filename'])
+                continue
+
+            try:
+                chunks = counted_chunks(upstream.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE))
+                yield row['filename'], decompressed_chunks(chunks, row.get('codec'))
+            finally:
+                upstream.close()
+    finally:
+        # Client went away mid-archive: release connections opened ahead
+        for _, future in pending:
+            future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+
+    if failed:
+        yield "download-errors.txt", [("Could not download:\n" + "\n".join(failed) + "\n").encode()]
+
+def zip_compression(filename):
+    return zipfile.ZIP_STORED if filename.lower().endswith(PRECOMPRESSED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+
+class ZipSink:
+    """Write-only file object that collects ZIP output until it is drained.
+
+    ZipFile falls back to data descriptors when its target can't seek, so an
+    archive can be produced front to back and sent while it is being built.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def stream_zip(entries):
+    """Yield a ZIP archive built from (arcname, chunk iterator) pairs.
+
+    Only one chunk of input plus ZipFile's own buffers is held at a time.
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for arcname, chunks in entries:
+            entry = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            entry.compress_type = zip_compression(arcname)
+            with archive.open(entry, "w", force_zip64=True) as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
 @app.route('/files/download/<filename>', methods=['GET'])
 @limiter.limit("5 per minute") 
 @login_required
 def download_file(filename):
+    """Download a file.
+
+    ?mode=stream (default) passes B2 bytes through chunk by chunk and honours
+    Range / If-Range, so interrupted downloads can resume. ?mode=redirect sends
+    the browser to a short-lived authorized B2 URL instead, for objects under
+    the user's own prefix (others are streamed). ?mode=zip wraps the file in a
+    streamed ZIP archive. Files compressed at rest are decompressed here, so
+    they are always streamed whole, without ranges or redirects.
+    """
+    mode = request.args.get('mode', 'stream')
+    if mode not in ('stream', 'redirect', 'zip'):
+        return jsonify({"error": "Unknown download mode"}), 400
+
     try:
         # 1. Verify file exists in database
+        safe_filename = secure_filename(filename)
         file_data = supabase.table('files') \
-            .select('filepath, file_id') \
-            .eq('filename', secure_filename(filename)) \
+            .select('filepath, file_id, codec, content_length') \
+            .eq('filename', safe_filename) \
             .eq('user_id', session['user_id']) \
             .execute()
         
@@ -533,36 +2849,158 @@ def download_file(filename):
             return jsonify({"error": "File not found"}), 404
 
         filepath = file_data.data[0]['filepath']
-
-        # 2. Fetch the actual file from Backblaze B2
-        auth_token = bucket.get_download_authorization(filepath, 600)
-        file_url = (
-            f"https://f005.backblazeb2.com/file/tenacity-files/"
-            f"{filepath}?Authorization={auth_token}"
-        )
-
-        response = requests.get(file_url)
-        if response.status_code != 200:
+        codec = file_data.data[0].get('codec')
+        etag = f'"{file_data.data[0]["file_id"]}"'  # B2 file versions are immutable
+
+        # Only objects under the user's own prefix are redirected to: a URL by
+        # name can't be pinned to one version, and a shared blob's prefix is
+        # writable by whoever uploaded it first. Others are streamed and checked.
+        if mode == 'redirect' and not codec and filepath.startswith(f"user_{session['user_id']}/"):
+            return redirect(io_pools['b2_metadata'].call(b2_file_url, filepath, REDIRECT_URL_TTL, safe_filename))
+
+        # 2a. Serve hot files from the local disk cache. A miss is sent on while
+        # it is written to the cache; ranges of uncached files go to B2 as below.
+        row = file_data.data[0]
+        range_header = request.headers.get('Range')
+        if mode == 'stream' and cacheable(row):
+            try:
+                path = download_cache.get(row['file_id'])
+                if path:
+                    return send_file(
+                        path,
+                        mimetype="application/octet-stream",
+                        as_attachment=True,
+                        download_name=safe_filename,
+                        conditional=True,  # Range / If-Range
+                        etag=row['file_id']
+                    )
+                if not range_header:
+                    # The data pool slot is held only until B2 answers
+                    chunks = download_cache.fill(
+                        row['file_id'],
+                        lambda: io_pools['b2_data'].call(open_download, filepath, row['file_id'], codec)
+                    )
+                    response = Response(chunks, mimetype="application/octet-stream")
+                    response.headers['Content-Disposition'] = f'attachment; filename="{safe_filename}"'
+                    response.headers['Content-Length'] = str(row['content_length'])
+                    response.headers['ETag'] = etag
+                    response.headers['Accept-Ranges'] = 'bytes'  # Once cached
+                    return response
+            except ServiceBusy:
+                raise
+            except Exception as e:
+                app.logger.error(f"Download cache failed for {filepath}: {str(e)}")  # Stream from B2 instead
+
+        # 2b. Open a streaming request to Backblaze B2, forwarding any byte range
+        headers = {}
+        if_range = request.headers.get('If-Range')
+        if mode == 'stream' and not codec and range_header and (not if_range or if_range == etag):
+            headers['Range'] = range_header
+
+        upstream = io_pools['b2_data'].call(hedged, fetch_b2, filepath, file_data.data[0]['file_id'], headers)
+        if upstream.status_code == 416:
+            upstream.close()
+            return Response(status=416, headers={'Content-Range': upstream.headers.get('Content-Range', '')})
+        if upstream.status_code not in (200, 206):
+            upstream.close()
             return jsonify({"error": "Failed to fetch file"}), 500
 
-        # 3. Create an in-memory ZIP file
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            zip_file.writestr(filename, response.content)
-        
-        zip_buffer.seek(0)
-        
-        return send_file(
-            zip_buffer,
-            as_attachment=True,
-            download_name=f"{filename}.zip",
-            mimetype="application/zip"
-        )
+        chunks = decompressed_chunks(counted_chunks(upstream.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)), codec)
+
+        # 3a. Optionally wrap the file in an archive built on the fly
+        if mode == 'zip':
+            response = Response(stream_with_context(stream_zip([(safe_filename, chunks)])), mimetype="application/zip")
+            response.headers['Content-Disposition'] = f'attachment; filename="{safe_filename}.zip"'
+            response.call_on_close(upstream.close)
+            return response
+
+        # 3b. Otherwise pass the bytes straight through
+        response = Response(stream_with_context(chunks), status=upstream.status_code, mimetype="application/octet-stream")
+        response.headers['Content-Disposition'] = f'attachment; filename="{safe_filename}"'
+        response.headers['ETag'] = etag
+        if codec:
+            # B2's length is the compressed one; offsets into it mean nothing here
+            response.headers['Accept-Ranges'] = 'none'
+            response.headers['Content-Length'] = str(file_data.data[0]['content_length'])
+        else:
+            response.headers['Accept-Ranges'] = 'bytes'
+            for header in ('Content-Length', 'Content-Range'):
+                if header in upstream.headers:
+                    response.headers[header] = upstream.headers[header]
+        response.call_on_close(upstream.close)
+        return response
     
+    except ServiceBusy:
+        raise
     except Exception as e:
         app.logger.error(f"Download failed: {str(e)}")
         return jsonify({"error": "Download failed", "details": str(e)}), 500
 
+@app.route('/files/download', methods=['POST'])
+@limiter.limit("5 per minute")
+@login_required
+def download_files():
+    """Download several files as one ZIP archive streamed while it is built.
+
+    Accepts a JSON body {"filenames": [...]} or repeated `filenames` form
+    fields, so a plain form submit can hand the stream to the browser.
+    Memory stays fixed however many or however large the files are, and
+    entries are written as zip64 so archives can pass 4 GB.
+    """
+    if request.is_json:
+        filenames = (request.get_json(silent=True) or {}).get('filenames', [])
+    else:
+        filenames = request.form.getlist('filenames')
+
+    safe_filenames = list(dict.fromkeys(secure_filename(name) for name in filenames if name))
+    if not safe_filenames:
+        return jsonify({"error": "No files provided"}), 400
+    if len(safe_filenames) > MAX_BULK_DOWNLOAD:
+        return jsonify({"error": f"At most {MAX_BULK_DOWNLOAD} files per download"}), 400
+
+    try:
+        file_data = supabase.table('files') \
+            .select('filename, filepath, file_id, codec') \
+            .in_('filename', safe_filenames) \
+            .eq('user_id', session['user_id']) \
+            .execute()
+    except ServiceBusy:
+        raise
+    except Exception as e:
+        app.logger.error(f"Download failed: {str(e)}")
+        return jsonify({"error": "Download failed", "details": str(e)}), 500
+
+    if not file_data.data:
+        return jsonify({"error": "File not found"}), 404
+
+    # Keep the order the client asked for
+    order = {name: i for i, name in enumerate(safe_filenames)}
+    rows = sorted(file_data.data, key=lambda row: order[row['filename']])
+
+    response = Response(stream_with_context(stream_zip(prefetched_entries(rows))), mimetype="application/zip")
+    response.headers['Content-Disposition'] = f'attachment; filename="tenacity-files-{datetime.now():%Y%m%d-%H%M%S}.zip"'
+    return response
+
+# -------- Startup ---------------------------------------------------------- #
+@app.route('/healthz', methods=['GET'])
+@limiter.exempt
+def healthz():
+    """Liveness check that never waits on Supabase or B2."""
+    return jsonify({"status": "ok"}), 200
+
+@app.cli.command('startup-report')
+def startup_report():
+    """Show how long importing the app and initializing each client takes."""
+    for client in (supabase._client, b2_api, bucket._client):
+        client.resolve()
+    for name, seconds in startup_timings.items():
+        click.echo(f"{name:<16} {seconds * 1000:8.1f} ms")
+
+if METRICS_DIR:
+    threading.Thread(target=flush_metrics_forever, name='metrics-flush', daemon=True).start()
+
+startup_timings['import'] = time.perf_counter() - IMPORT_STARTED
+app.logger.info(f"App imported in {startup_timings['import'] * 1000:.0f} ms")
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,540 @@
+"""In-process stand-ins for Supabase and Backblaze B2 used by the benchmarks.
+
+They implement just the parts of the supabase-py query builder, b2sdk Bucket /
+B2Api and requests Session that app.py calls, keep everything in memory, and
+sleep for a configurable latency on every backend round trip so results look
+like a deployment rather than a loop over dicts.
+"""
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from urllib.parse import unquote, urlparse
+
+
+class Latency:
+    """Injected round-trip delay in seconds: base plus up to jitter, per backend."""
+    def __init__(self, supabase=0.0, b2=0.0, jitter=0.0):
+        self.delays = {'supabase': supabase, 'b2': b2}
+        self.jitter = jitter
+
+    def wait(self, backend):
+        delay = self.delays[backend]
+        if delay or self.jitter:
+            time.sleep(delay + random.uniform(0, self.jitter))
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+# -------- Supabase ---------------------------------------------------------- #
+class Query:
+    """Chainable stand-in for a postgrest-py request builder."""
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = 'select'
+        self.columns = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []
+        self.user_id = None  # Lets execute() scan one user's rows only
+        self.orders = []
+        self.row_limit = None
+
+    # Actions
+    def select(self, columns='*', count=None):
+        self.action = 'select'
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False):
+        self.action, self.payload, self.on_conflict = 'upsert', payload, on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    # Filters
+    def eq(self, column, value):
+        if column == 'user_id':
+            self.user_id = value
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: (row.get(column) is None) == (value == 'null'))
+        return self
+
+    @property
+    def not_(self):
+        query = self
+
+        class Negated:
+            def is_(self, column, value):
+                query.filters.append(lambda row: (row.get(column) is None) != (value == 'null'))
+                return query
+        return Negated()
+
+    def ilike(self, column, pattern):
+        regex = re.compile(like_regex(pattern), re.IGNORECASE | re.DOTALL)
+        self.filters.append(lambda row: regex.fullmatch(row.get(column) or '') is not None)
+        return self
+
+    def or_(self, expression):
+        # Only the keyset form built by query_files_page:
+        # col.op.value,and(col.eq.value,id.op.last_id)[,col.is.null]
+        match = re.fullmatch(r'(\w+)\.(gt|lt)\.(.+),and\(\1\.eq\.\3,id\.\2\.(\d+)\)(,\1\.is\.null)?', expression)
+        if match is None:
+            raise NotImplementedError(f"or_ filter not supported by the fake: {expression}")
+        column, op, raw, last_id, nulls = match.groups()
+        value = json.loads(raw)  # postgrest_value quotes strings JSON-style
+        last_id = int(last_id)
+
+        def after(row):
+            if row.get(column) is None:
+                return nulls is not None
+            if op == 'gt':
+                return (row[column], row['id']) > (value, last_id)
+            return (row[column], row['id']) < (value, last_id)
+        self.filters.append(after)
+        return self
+
+    # Modifiers
+    def order(self, column, desc=False, nullsfirst=None):
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        self.db.latency.wait('supabase')
+        with self.db.lock:
+            return Result(getattr(self, f"_{self.action}")())
+
+    def _rows(self):
+        return self.db.rows(self.table, self.user_id)
+
+    def _matching(self):
+        return [row for row in self._rows() if all(f(row) for f in self.filters)]
+
+    def _select(self):
+        rows = self._matching()
+        for column, desc, nullsfirst in reversed(self.orders):
+            if nullsfirst is None:
+                nullsfirst = desc  # Postgres puts nulls last ascending and first descending
+            nulls = [row for row in rows if row.get(column) is None]
+            rows = sorted((row for row in rows if row.get(column) is not None),
+                          key=lambda row: row[column], reverse=desc)
+            rows = nulls + rows if nullsfirst else rows + nulls
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        if self.columns:
+            return [{column: row.get(column) for column in self.columns} for row in rows]
+        return [dict(row) for row in rows]
+
+    def _insert(self):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        self.db.check_unique(self.table, payload)
+        rows = [dict(self.db.add(self.table, dict(row))) for row in payload]
+        self.db.changed(self.table, rows)
+        return rows
+
+    def _upsert(self):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        keys = [key.strip() for key in (self.on_conflict or 'id').split(',')]
+        out = []
+        for row in payload:
+            existing = next((r for r in self.db.rows(self.table, row.get('user_id'))
+                             if all(r.get(k) == row.get(k) for k in keys)), None)
+            if existing is not None:
+                if not self.ignore_duplicates:
+                    existing.update(row)
+                    out.append(dict(existing))
+            else:
+                out.append(dict(self.db.add(self.table, dict(row))))
+        return out
+
+    def _update(self):
+        rows = self._matching()
+        self.db.check_unique(self.table, [dict(row, **self.payload) for row in rows], replacing=rows)
+        for row in rows:
+            self.db.update(self.table, row, self.payload)
+        self.db.changed(self.table, rows)
+        return [dict(row) for row in rows]
+
+    def _delete(self):
+        rows = self._matching()
+        for row in rows:
+            self.db.remove(self.table, row)
+        self.db.changed(self.table, rows)
+        return [dict(row) for row in rows]
+
+
+def like_regex(pattern):
+    """Translate a LIKE pattern with backslash escapes into a regex."""
+    out, escaped = [], False
+    for char in pattern:
+        if escaped:
+            out.append(re.escape(char))
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '%':
+            out.append('.*')
+        elif char == '_':
+            out.append('.')
+        else:
+            out.append(re.escape(char))
+    return ''.join(out)
+
+
+class UniqueViolation(Exception):
+    """What postgrest raises for Postgres' unique_violation."""
+    code = '23505'
+
+
+class Rpc:
+    def __init__(self, db, fn, params):
+        self.db, self.fn, self.params = db, fn, params or {}
+
+    def execute(self):
+        self.db.latency.wait('supabase')
+        with self.db.lock:
+            return Result(self.fn(self.db, **self.params))
+
+
+class FakeSupabase:
+    """Tables of dict rows, partitioned by user_id where the table has one."""
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.tables = {}
+        self.ids = itertools.count(1)
+        self.functions = {
+            'adjust_user_storage': adjust_user_storage,
+            'search_files': search_files,
+            'claim_blob': claim_blob,
+            'register_blob': register_blob,
+            'release_blob': release_blob
+        }
+
+    def table(self, name):
+        return Query(self, name)
+
+    def rpc(self, fn, params=None):
+        return Rpc(self, self.functions[fn], params)
+
+    def partitions(self, table):
+        return self.tables.setdefault(table, {})
+
+    def rows(self, table, user_id=None):
+        partitions = self.partitions(table)
+        if user_id is not None:
+            return list(partitions.get(user_id, ()))
+        return [row for rows in partitions.values() for row in rows]
+
+    def add(self, table, row):
+        row.setdefault('id', next(self.ids))
+        if table == 'files':
+            row.setdefault('blob_id', None)
+            self.generate(row)
+        if table == 'file_events':
+            row['seq'] = next_event_seq(self, row['user_id'])  # The assign_event_seq trigger
+        self.partitions(table).setdefault(row.get('user_id'), []).append(row)
+        return row
+
+    def update(self, table, row, changes):
+        row.update(changes)
+        if table == 'files':
+            self.generate(row)
+
+    def check_unique(self, table, rows, replacing=()):
+        """files_user_filename_key: one name per user, checked before any row is written."""
+        if table != 'files':
+            return
+        replaced = {id(row) for row in replacing}
+        taken = {(row['user_id'], row['filename'])
+                 for user_id in {row.get('user_id') for row in rows}
+                 for row in self.rows('files', user_id) if id(row) not in replaced}
+        for row in rows:
+            key = (row.get('user_id'), row.get('filename'))
+            if key in taken:
+                raise UniqueViolation(f"duplicate key value violates unique constraint \"files_user_filename_key\": {key}")
+            taken.add(key)
+
+    @staticmethod
+    def generate(row):
+        """The generated columns of `files`."""
+        row['extension'] = extension(row.get('filename'))
+        row['filename_lower'] = (row.get('filename') or '').lower()
+
+    def remove(self, table, row):
+        self.partitions(table)[row.get('user_id')].remove(row)
+
+    def changed(self, table, rows):
+        """The statement triggers on `files`: one version bump per user touched."""
+        if table == 'files':
+            for user_id in {row.get('user_id') for row in rows}:
+                bump_version(self, user_id)
+
+
+def extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+def adjust_user_storage(db, p_user_id, **deltas):
+    rows = db.rows('user_storage', p_user_id)
+    for row in rows:
+        for key, value in deltas.items():
+            column = key[len('p_'):]
+            if column in row:
+                row[column] += value
+    bump_version(db, p_user_id)
+    return bool(rows)
+
+
+def bump_version(db, user_id):
+    rows = db.rows('user_versions', user_id)
+    row = rows[0] if rows else db.add('user_versions', {'user_id': user_id, 'version': 0})
+    row['version'] += 1
+
+
+def next_event_seq(db, user_id):
+    rows = db.rows('user_versions', user_id)
+    row = rows[0] if rows else db.add('user_versions', {'user_id': user_id, 'version': 0})
+    row['event_seq'] = row.get('event_seq', 0) + 1
+    return row['event_seq']
+
+
+def search_files(db, p_user_id, p_query, p_limit=20):
+    term = p_query.lower()
+    hits = [row for row in db.rows('files', p_user_id)
+            if term in row['filename'].lower() or row['extension'] == term.lstrip('.')]
+    hits.sort(key=lambda row: (row['filename'].lower() != term,
+                               not row['filename'].lower().startswith(term),
+                               row['filename']))
+    return [dict(row) for row in hits[:p_limit]]
+
+
+def claim_blob(db, p_scope, p_sha256):
+    for blob in db.rows('blobs'):
+        if blob['scope'] == p_scope and blob['sha256'] == p_sha256:
+            blob['refcount'] += 1
+            return [dict(blob)]
+    return []
+
+
+def register_blob(db, p_scope, p_sha256, p_filepath, p_file_id, p_content_length, p_content_type,
+                  p_codec=None, p_stored_length=None):
+    claimed = claim_blob(db, p_scope, p_sha256)
+    if claimed:
+        return claimed
+    blob = db.add('blobs', {
+        'scope': p_scope, 'sha256': p_sha256, 'filepath': p_filepath, 'file_id': p_file_id,
+        'content_length': p_content_length, 'content_type': p_content_type,
+        'codec': p_codec, 'stored_length': p_stored_length, 'refcount': 1
+    })
+    return [dict(blob)]
+
+
+def release_blob(db, p_blob_id):
+    for blob in db.rows('blobs'):
+        if blob['id'] == p_blob_id:
+            blob['refcount'] -= 1
+            if blob['refcount'] > 0:
+                return []
+            db.remove('blobs', blob)
+            for row in db.rows('files'):
+                if row.get('blob_id') == p_blob_id:
+                    row['blob_id'] = None
+            return [dict(blob)]
+    return []
+
+
+# -------- B2 ---------------------------------------------------------- #
+class FileVersion:
+    def __init__(self, file_id, file_name, data, content_type):
+        self.id_ = file_id
+        self.file_name = file_name
+        self.size = len(data)
+        self.content_type = content_type or 'application/octet-stream'
+        self.content_sha1 = hashlib.sha1(data).hexdigest()
+        self.upload_timestamp = int(time.time() * 1000)
+        self.file_info = {}
+
+
+class FakeBucket:
+    """Object store keyed by file name with the Bucket methods app.py uses."""
+    name = 'tenacity-files'
+    id_ = 'bench-bucket'
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.objects = {}  # file name -> (bytes, FileVersion)
+
+    def store(self, file_name, data, content_type=None):
+        version = FileVersion(uuid.uuid4().hex, file_name, data, content_type)
+        with self.lock:
+            self.objects[file_name] = (data, version)
+        return version
+
+    def upload_bytes(self, data, file_name, content_type=None, **kwargs):
+        self.latency.wait('b2')
+        return self.store(file_name, data, content_type)
+
+    def upload_unbound_stream(self, stream, file_name, content_type=None, read_size=8192, **kwargs):
+        self.latency.wait('b2')
+        chunks = []
+        for chunk in iter(lambda: stream.read(read_size), b''):
+            chunks.append(chunk)
+        return self.store(file_name, b''.join(chunks), content_type)
+
+    def get_file_info_by_name(self, file_name):
+        self.latency.wait('b2')
+        with self.lock:
+            if file_name not in self.objects:
+                raise FileNotFoundError(file_name)
+            return self.objects[file_name][1]
+
+    def get_file_info_by_id(self, file_id):
+        self.latency.wait('b2')
+        with self.lock:
+            for _, version in self.objects.values():
+                if version.id_ == file_id:
+                    return version
+        raise FileNotFoundError(file_id)
+
+    def delete_file_version(self, file_id, file_name):
+        self.latency.wait('b2')
+        with self.lock:
+            self.objects.pop(file_name, None)
+
+    def copy(self, file_id, new_file_name, **kwargs):
+        self.latency.wait('b2')
+        with self.lock:
+            source = next((data, version) for data, version in self.objects.values() if version.id_ == file_id)
+        return self.store(new_file_name, source[0], source[1].content_type)
+
+    def get_download_authorization(self, file_name_prefix, valid_duration_in_seconds):
+        self.latency.wait('b2')
+        return f"bench-token-{file_name_prefix}"
+
+
+class FakeAccountInfo:
+    def get_download_url(self):
+        return 'https://bench.invalid'
+
+    def get_application_key_id(self):
+        return None
+
+
+class FakeSession:
+    def finish_large_file(self, file_id, part_sha1s):
+        return None
+
+
+class FakeB2Api:
+    """Replaces b2sdk's B2Api; every instance serves the same bucket."""
+    bucket = None
+
+    def __init__(self, account_info=None, **kwargs):
+        self.account_info = FakeAccountInfo()
+        self.session = FakeSession()
+
+    def authorize_account(self, realm, key_id, application_key):
+        FakeB2Api.bucket.latency.wait('b2')
+
+    def get_bucket_by_name(self, name):
+        return FakeB2Api.bucket
+
+
+# -------- Downloads ---------------------------------------------------------- #
+class FakeResponse:
+    def __init__(self, data, status_code, headers):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    @property
+    def content(self):
+        return self.data
+
+    def close(self):
+        pass
+
+
+class FakeDownloadSession:
+    """Serves GET /file/<bucket>/<key> from a FakeBucket, honouring Range."""
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def get(self, url, headers=None, **kwargs):
+        self.bucket.latency.wait('b2')
+        file_name = unquote(urlparse(url).path).split('/', 3)[3]
+        with self.bucket.lock:
+            stored = self.bucket.objects.get(file_name)
+        if stored is None:
+            return FakeResponse(b'', 404, {})
+        data, version = stored
+        range_header = (headers or {}).get('Range')
+        if not range_header:
+            return FakeResponse(data, 200, {'Content-Length': str(len(data)), 'x-bz-file-id': version.id_})
+        start, end = range_header.split('=', 1)[1].split('-')
+        start, end = int(start), int(end) if end else len(data) - 1
+        part = data[start:end + 1]
+        return FakeResponse(part, 206, {
+            'Content-Length': str(len(part)),
+            'Content-Range': f"bytes {start}-{end}/{len(data)}",
+            'x-bz-file-id': version.id_
+        })
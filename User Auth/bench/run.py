@@ -0,0 +1,195 @@
+"""Offline benchmark and load test for app.py.
+
+Runs the Flask app in-process against the stand-ins in fakes.py, so nothing
+touches Supabase or B2. Every user is seeded with --files files, then --users
+threads each act as one logged-in user and hit the chosen scenarios for
+--requests requests apiece.
+
+    cd "User Auth"
+    python -m bench.run --users 20 --files 2000 --supabase-ms 15 --b2-ms 40
+    python -m bench.run --scenario list --scenario download --json > before.json
+
+Reports p50 / p95 / p99 latency and throughput per scenario, plus the peak RSS
+of the process.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import b2sdk.v2
+import supabase as supabase_module
+
+from bench import fakes
+
+SCENARIOS = {
+    'list': lambda client, user: client.get('/files/list?limit=100'),
+    'sort': lambda client, user: client.get(f"/files/sort?by={random.choice(['name', 'size', 'date'])}",
+                                            follow_redirects=True),
+    'search': lambda client, user: client.get(f"/files/search?q=file_{random.randrange(100)}"),
+    'storage': lambda client, user: client.get('/api/storage'),
+    'upload': lambda client, user: upload(client, user),
+    'download': lambda client, user: client.get(f"/files/download/{random.choice(user['files'])}"),
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=10, help='Concurrent users (threads).')
+    parser.add_argument('--files', type=int, default=1000, help='Files seeded per user.')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per user per scenario.')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Scenario to run; repeat for several. Default: all.')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='Bytes per seeded / uploaded file.')
+    parser.add_argument('--supabase-ms', type=float, default=0.0, help='Injected Supabase round trip.')
+    parser.add_argument('--b2-ms', type=float, default=0.0, help='Injected B2 round trip.')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Extra random delay up to this much.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+    return parser.parse_args(argv)
+
+
+def load_app(latency):
+    """Import app.py with the fakes patched in where it looks up its clients."""
+    db = fakes.FakeSupabase(latency)
+    fakes.FakeB2Api.bucket = fakes.FakeBucket(latency)
+    supabase_module.create_client = lambda url, key: db
+    b2sdk.v2.B2Api = fakes.FakeB2Api
+
+    state = tempfile.mkdtemp(prefix='tenacity-bench-')
+    os.environ.setdefault('FLASK_SECRET_KEY', 'bench')
+    os.environ.setdefault('B2_BUCKET_NAME', fakes.FakeBucket.name)
+    os.environ['B2_ACCOUNT_INFO_PATH'] = os.path.join(state, 'b2-account.sqlite3')
+    os.environ['METADATA_CACHE_PATH'] = os.path.join(state, 'metadata-cache.sqlite3')
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as app_module
+    app_module.app.config['RATELIMIT_ENABLED'] = False
+    app_module.limiter.enabled = False
+    app_module.download_session = fakes.FakeDownloadSession(fakes.FakeB2Api.bucket)
+    return app_module, db
+
+
+def seed(app_module, db, users, files, file_size):
+    """Give each user `files` stored files, bypassing the app for speed."""
+    bucket = fakes.FakeB2Api.bucket
+    payload = os.urandom(file_size)
+    extensions = ['pdf', 'jpg', 'png', 'txt', 'docx', 'zip']
+    seeded = []
+    for user_id in range(1, users + 1):
+        names = []
+        for i in range(files):
+            filename = f"file_{i}.{extensions[i % len(extensions)]}"
+            version = bucket.store(app_module.object_key(user_id), payload)
+            db.add('files', {
+                'filename': filename,
+                'filepath': version.file_name,
+                'file_id': version.id_,
+                'user_id': user_id,
+                **app_module.file_metadata(version)
+            })
+            names.append(filename)
+        app_module.adjust_usage(user_id, app_module.usage_delta(db.rows('files', user_id)))
+        seeded.append({'id': user_id, 'files': names, 'file_size': file_size})
+    return seeded
+
+
+def upload(client, user):
+    from io import BytesIO
+    data = os.urandom(user['file_size'])  # Random so deduplication never kicks in
+    name = f"upload_{threading.get_ident()}_{time.perf_counter_ns()}.bin"
+    return client.post('/upload', data={'files': (BytesIO(data), name)}, content_type='multipart/form-data')
+
+
+def run_scenario(app_module, users, name, requests_per_user):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def act(user):
+        client = app_module.app.test_client()
+        client.environ_base['HTTP_X_FORWARDED_PROTO'] = 'https'  # Talisman redirects plain http
+        with client.session_transaction(base_url='https://localhost') as session:
+            session['user_id'] = user['id']
+        mine = []
+        for _ in range(requests_per_user):
+            started = time.perf_counter()
+            response = SCENARIOS[name](client, user)
+            if name == 'download':
+                response.get_data()  # Include streaming the body
+            mine.append(time.perf_counter() - started)
+            if response.status_code >= 300:  # Redirects here mean the request never ran
+                with lock:
+                    errors.append(response.status_code)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=act, args=(user,)) for user in users]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0
+    }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    latency = fakes.Latency(args.supabase_ms / 1000, args.b2_ms / 1000, args.jitter_ms / 1000)
+    app_module, db = load_app(latency)
+
+    # Seed without injected delays; they only matter for the measured requests
+    delays, latency.delays = latency.delays, {'supabase': 0.0, 'b2': 0.0}
+    users = seed(app_module, db, args.users, args.files, args.file_size)
+    latency.delays = delays
+
+    results = [run_scenario(app_module, users, name, args.requests)
+               for name in (args.scenario or list(SCENARIOS))]
+    summary = {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{'scenario':<10} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for r in results:
+        print(f"{r['scenario']:<10} {r['requests']:>8} {r['errors']:>6} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['throughput_rps']:>8.1f}")
+    print(f"peak RSS: {summary['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
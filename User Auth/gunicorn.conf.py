@@ -0,0 +1,28 @@
+"""Gunicorn settings; read automatically when gunicorn starts in this directory.
+
+    gunicorn app:app
+
+Requests spend most of their time waiting on Supabase and B2, and every open
+/files/events stream holds a request thread for up to EVENTS_STREAM_SECONDS,
+so workers serve requests from a pool of threads instead of gunicorn's default
+single-threaded sync worker. Keep EVENTS_MAX_STREAMS below GUNICORN_THREADS so
+streams can't take every thread.
+
+Workers share their metrics through METRICS_DIR, which is emptied when the
+server starts so totals begin at zero with each deploy. The app is imported in
+each worker (no preload_app), which is where its metrics flush thread starts.
+"""
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+
+metrics_dir = os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'tenacity-metrics'))
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
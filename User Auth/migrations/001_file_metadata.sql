@@ -0,0 +1,6 @@
+-- Store B2 object metadata on each `files` row so listings don't call B2 per file.
+-- Existing rows are filled in with `flask --app app backfill-metadata`.
+alter table files
+    add column if not exists content_length bigint,
+    add column if not exists content_type text,
+    add column if not exists upload_timestamp bigint;
@@ -0,0 +1,35 @@
+-- Running per-user usage counters so /api/storage and the upload quota check
+-- don't have to scan every file. Run `flask --app app reconcile-storage` after
+-- applying this to seed counters for existing users (they are otherwise seeded
+-- lazily on first read).
+create table if not exists user_storage (
+    user_id bigint primary key references users (id) on delete cascade,
+    files integer not null default 0,
+    used_bytes bigint not null default 0,
+    documents_bytes bigint not null default 0,
+    images_bytes bigint not null default 0,
+    others_bytes bigint not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+-- Atomically add a delta to a user's counters, creating the row if needed.
+create or replace function adjust_user_storage(
+    p_user_id bigint,
+    p_files integer,
+    p_used_bytes bigint,
+    p_documents_bytes bigint,
+    p_images_bytes bigint,
+    p_others_bytes bigint
+) returns void
+language sql
+as $$
+    insert into user_storage as s (user_id, files, used_bytes, documents_bytes, images_bytes, others_bytes)
+    values (p_user_id, p_files, p_used_bytes, p_documents_bytes, p_images_bytes, p_others_bytes)
+    on conflict (user_id) do update set
+        files = s.files + excluded.files,
+        used_bytes = s.used_bytes + excluded.used_bytes,
+        documents_bytes = s.documents_bytes + excluded.documents_bytes,
+        images_bytes = s.images_bytes + excluded.images_bytes,
+        others_bytes = s.others_bytes + excluded.others_bytes,
+        updated_at = now();
+$$;
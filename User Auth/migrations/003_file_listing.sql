@@ -0,0 +1,10 @@
+-- Keyset pagination for /files/list: one index per sort column, each ending
+-- in id so (sort value, id) cursors are unique and seekable.
+alter table files
+    add column if not exists extension text
+        generated always as (lower(coalesce(substring(filename from '\.([^.]+)$'), ''))) stored;
+
+create index if not exists files_user_filename_idx on files (user_id, filename, id);
+create index if not exists files_user_size_idx on files (user_id, content_length, id);
+create index if not exists files_user_date_idx on files (user_id, upload_timestamp, id);
+create index if not exists files_user_extension_idx on files (user_id, extension, id);
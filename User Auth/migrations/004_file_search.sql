@@ -0,0 +1,37 @@
+-- Ranked filename search for /files/search. The trigram index is maintained by
+-- Postgres on every insert, rename and delete of a `files` row, so upload,
+-- edit_file and delete_file keep it in sync without extra work.
+create extension if not exists pg_trgm;
+create extension if not exists btree_gin;
+
+create index if not exists files_user_filename_trgm_idx
+    on files using gin (user_id, filename gin_trgm_ops);
+
+-- Top matches for p_query among one user's files: exact name, then name prefix,
+-- then extension, then substring / fuzzy matches ranked by trigram similarity.
+create or replace function search_files(p_user_id bigint, p_query text, p_limit integer default 20)
+returns setof files
+language sql
+stable
+as $$
+    with escaped as (
+        select lower(p_query) as term,
+               replace(replace(replace(lower(p_query), '\', '\\'), '%', '\%'), '_', '\_') as literal
+    ), q as (
+        select term, '%' || literal || '%' as pattern, literal || '%' as prefix
+        from escaped
+    )
+    select f.*
+    from files f, q
+    where f.user_id = p_user_id
+      and (f.filename ilike q.pattern
+           or f.filename % q.term
+           or f.extension = ltrim(q.term, '.'))
+    order by
+        (lower(f.filename) = q.term) desc,
+        (lower(f.filename) like q.prefix) desc,
+        (f.extension = ltrim(q.term, '.')) desc,
+        similarity(f.filename, q.term) desc,
+        f.filename
+    limit least(greatest(p_limit, 1), 100);
+$$;
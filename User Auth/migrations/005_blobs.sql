@@ -0,0 +1,73 @@
+-- Content-addressed storage for deduplicated uploads. A blob is one B2 object;
+-- every `files` row pointing at it holds one reference, and the object is only
+-- deleted from B2 when release_blob drops the last one. Rows with a null
+-- blob_id own their object outright, as every row did before this migration.
+--
+-- scope is 'user:<id>' for blobs only that user may share, or 'global' for
+-- blobs shared by every user (DEDUP_SCOPE=global).
+create table if not exists blobs (
+    id bigserial primary key,
+    scope text not null,
+    sha256 text not null,
+    filepath text not null,
+    file_id text not null,
+    content_length bigint,
+    content_type text,
+    refcount integer not null default 1,
+    created_at timestamptz not null default now(),
+    unique (scope, sha256)
+);
+
+alter table files add column if not exists blob_id bigint references blobs (id);
+
+create index if not exists files_blob_id_idx on files (blob_id);
+
+-- Take a reference to an existing blob; returns nothing if there isn't one.
+create or replace function claim_blob(p_scope text, p_sha256 text)
+returns setof blobs
+language sql
+as $$
+    update blobs set refcount = refcount + 1
+    where scope = p_scope and sha256 = p_sha256
+    returning *;
+$$;
+
+-- Record a freshly uploaded object as a blob holding one reference. If an
+-- identical blob appeared meanwhile, a reference to that one is taken instead
+-- and returned; the caller then deletes its own now-redundant object.
+create or replace function register_blob(
+    p_scope text,
+    p_sha256 text,
+    p_filepath text,
+    p_file_id text,
+    p_content_length bigint,
+    p_content_type text
+) returns setof blobs
+language sql
+as $$
+    insert into blobs as b (scope, sha256, filepath, file_id, content_length, content_type)
+    values (p_scope, p_sha256, p_filepath, p_file_id, p_content_length, p_content_type)
+    on conflict (scope, sha256) do update set refcount = b.refcount + 1
+    returning *;
+$$;
+
+-- Drop one reference. Returns the blob only when that was the last reference,
+-- in which case the row is gone and the caller deletes the B2 object.
+create or replace function release_blob(p_blob_id bigint)
+returns setof blobs
+language plpgsql
+as $$
+declare
+    released blobs;
+begin
+    update blobs set refcount = refcount - 1
+    where id = p_blob_id
+    returning * into released;
+
+    if found and released.refcount <= 0 then
+        update files set blob_id = null where blob_id = p_blob_id;
+        delete from blobs where id = p_blob_id;
+        return next released;
+    end if;
+end;
+$$;
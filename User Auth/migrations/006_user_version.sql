@@ -0,0 +1,28 @@
+-- A per-user change version. adjust_user_storage runs after every upload,
+-- delete and rename (even when the byte counts don't move), so bumping the
+-- version there means (user_id, version) names one state of a user's files.
+-- /files/list and /api/storage send it as their ETag and answer 304 when the
+-- client already holds the current one.
+alter table user_storage add column if not exists version bigint not null default 0;
+
+create or replace function adjust_user_storage(
+    p_user_id bigint,
+    p_files integer,
+    p_used_bytes bigint,
+    p_documents_bytes bigint,
+    p_images_bytes bigint,
+    p_others_bytes bigint
+) returns void
+language sql
+as $$
+    insert into user_storage as s (user_id, files, used_bytes, documents_bytes, images_bytes, others_bytes, version)
+    values (p_user_id, p_files, p_used_bytes, p_documents_bytes, p_images_bytes, p_others_bytes, 1)
+    on conflict (user_id) do update set
+        files = s.files + excluded.files,
+        used_bytes = s.used_bytes + excluded.used_bytes,
+        documents_bytes = s.documents_bytes + excluded.documents_bytes,
+        images_bytes = s.images_bytes + excluded.images_bytes,
+        others_bytes = s.others_bytes + excluded.others_bytes,
+        version = s.version + 1,
+        updated_at = now();
+$$;
@@ -0,0 +1,58 @@
+-- Optional zstd compression at rest (COMPRESS_AT_REST=1). A row's codec names
+-- how its B2 object is encoded (null: stored as uploaded). content_length stays
+-- the file's real size, stored_length is the size of the object in B2.
+alter table files add column if not exists codec text;
+alter table files add column if not exists stored_length bigint;
+
+alter table blobs add column if not exists codec text;
+alter table blobs add column if not exists stored_length bigint;
+
+-- Physical bytes next to the logical used_bytes; equal for everything stored so far.
+alter table user_storage add column if not exists stored_bytes bigint not null default 0;
+update user_storage set stored_bytes = used_bytes;
+
+drop function if exists adjust_user_storage(bigint, integer, bigint, bigint, bigint, bigint);
+
+create or replace function adjust_user_storage(
+    p_user_id bigint,
+    p_files integer,
+    p_used_bytes bigint,
+    p_documents_bytes bigint,
+    p_images_bytes bigint,
+    p_others_bytes bigint,
+    p_stored_bytes bigint
+) returns void
+language sql
+as $$
+    insert into user_storage as s (user_id, files, used_bytes, documents_bytes, images_bytes, others_bytes, stored_bytes, version)
+    values (p_user_id, p_files, p_used_bytes, p_documents_bytes, p_images_bytes, p_others_bytes, p_stored_bytes, 1)
+    on conflict (user_id) do update set
+        files = s.files + excluded.files,
+        used_bytes = s.used_bytes + excluded.used_bytes,
+        documents_bytes = s.documents_bytes + excluded.documents_bytes,
+        images_bytes = s.images_bytes + excluded.images_bytes,
+        others_bytes = s.others_bytes + excluded.others_bytes,
+        stored_bytes = s.stored_bytes + excluded.stored_bytes,
+        version = s.version + 1,
+        updated_at = now();
+$$;
+
+drop function if exists register_blob(text, text, text, text, bigint, text);
+
+create or replace function register_blob(
+    p_scope text,
+    p_sha256 text,
+    p_filepath text,
+    p_file_id text,
+    p_content_length bigint,
+    p_content_type text,
+    p_codec text,
+    p_stored_length bigint
+) returns setof blobs
+language sql
+as $$
+    insert into blobs as b (scope, sha256, filepath, file_id, content_length, content_type, codec, stored_length)
+    values (p_scope, p_sha256, p_filepath, p_file_id, p_content_length, p_content_type, p_codec, p_stored_length)
+    on conflict (scope, sha256) do update set refcount = b.refcount + 1
+    returning *;
+$$;
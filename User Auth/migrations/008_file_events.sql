@@ -0,0 +1,16 @@
+-- Change feed behind /files/events. Every upload, delete and rename appends a
+-- row; the id doubles as the feed's sequence number, so a reconnecting client
+-- asks for the events after the last id it saw. Old rows are removed with
+-- `flask --app app prune-file-events`; a client whose cursor was pruned is told
+-- to reload its listing instead.
+create table if not exists file_events (
+    id bigserial primary key,
+    user_id bigint not null references users (id) on delete cascade,
+    kind text not null,  -- upload | delete | rename
+    filename text not null,
+    data jsonb,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists file_events_user_id_idx on file_events (user_id, id);
+create index if not exists file_events_created_at_idx on file_events (created_at);
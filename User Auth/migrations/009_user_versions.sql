@@ -0,0 +1,76 @@
+-- Move the change version out of adjust_user_storage into its own table, bumped
+-- by statement triggers on `files` in the same transaction as every insert,
+-- update and delete, whichever code path made it (requests, backfill-metadata,
+-- migrate-object-keys or a hand-run query). A version bumped by a separate
+-- call after the write could be read, and cached by a client, before the
+-- change it names. adjust_user_storage still bumps it, so the usage counters
+-- never change under an unchanged version.
+--
+-- No foreign key to users: the triggers also fire while a deleted user's files
+-- are being cascade-deleted.
+create table if not exists user_versions (
+    user_id bigint primary key,
+    version bigint not null default 0
+);
+
+insert into user_versions (user_id, version)
+select user_id, version from user_storage
+on conflict (user_id) do nothing;
+
+create or replace function bump_user_versions() returns trigger
+language plpgsql
+as $$
+begin
+    insert into user_versions as v (user_id, version)
+    select user_id, 1 from changed group by user_id
+    on conflict (user_id) do update set version = v.version + 1;
+    return null;
+end;
+$$;
+
+drop trigger if exists files_insert_bump_version on files;
+create trigger files_insert_bump_version
+    after insert on files
+    referencing new table as changed
+    for each statement execute function bump_user_versions();
+
+drop trigger if exists files_update_bump_version on files;
+create trigger files_update_bump_version
+    after update on files
+    referencing new table as changed
+    for each statement execute function bump_user_versions();
+
+drop trigger if exists files_delete_bump_version on files;
+create trigger files_delete_bump_version
+    after delete on files
+    referencing old table as changed
+    for each statement execute function bump_user_versions();
+
+create or replace function adjust_user_storage(
+    p_user_id bigint,
+    p_files integer,
+    p_used_bytes bigint,
+    p_documents_bytes bigint,
+    p_images_bytes bigint,
+    p_others_bytes bigint,
+    p_stored_bytes bigint
+) returns void
+language sql
+as $$
+    insert into user_storage as s (user_id, files, used_bytes, documents_bytes, images_bytes, others_bytes, stored_bytes)
+    values (p_user_id, p_files, p_used_bytes, p_documents_bytes, p_images_bytes, p_others_bytes, p_stored_bytes)
+    on conflict (user_id) do update set
+        files = s.files + excluded.files,
+        used_bytes = s.used_bytes + excluded.used_bytes,
+        documents_bytes = s.documents_bytes + excluded.documents_bytes,
+        images_bytes = s.images_bytes + excluded.images_bytes,
+        others_bytes = s.others_bytes + excluded.others_bytes,
+        stored_bytes = s.stored_bytes + excluded.stored_bytes,
+        updated_at = now();
+
+    insert into user_versions as v (user_id, version)
+    values (p_user_id, 1)
+    on conflict (user_id) do update set version = v.version + 1;
+$$;
+
+alter table user_storage drop column if exists version;
@@ -0,0 +1,35 @@
+-- adjust_user_storage no longer creates rows. A user's first change used to
+-- leave a delta-only row that get_usage then never seeded; now the function
+-- only adds to an existing row and returns whether there was one, and the app
+-- seeds a missing row through get_usage, the same scan /api/storage and
+-- reconcile-storage use (it fills sizes missing from `files` from B2 and keeps
+-- the category rules in one place).
+drop function if exists adjust_user_storage(bigint, integer, bigint, bigint, bigint, bigint, bigint);
+
+create or replace function adjust_user_storage(
+    p_user_id bigint,
+    p_files integer,
+    p_used_bytes bigint,
+    p_documents_bytes bigint,
+    p_images_bytes bigint,
+    p_others_bytes bigint,
+    p_stored_bytes bigint
+) returns boolean
+language sql
+as $$
+    update user_storage set
+        files = files + p_files,
+        used_bytes = used_bytes + p_used_bytes,
+        documents_bytes = documents_bytes + p_documents_bytes,
+        images_bytes = images_bytes + p_images_bytes,
+        others_bytes = others_bytes + p_others_bytes,
+        stored_bytes = stored_bytes + p_stored_bytes,
+        updated_at = now()
+    where user_id = p_user_id;
+
+    insert into user_versions as v (user_id, version)
+    values (p_user_id, 1)
+    on conflict (user_id) do update set version = v.version + 1;
+
+    select exists (select 1 from user_storage where user_id = p_user_id);
+$$;
@@ -0,0 +1,12 @@
+-- Name order ignores case again, as it did before listing moved into Supabase:
+-- PostgREST can only order by columns, so the lowered name is a generated one.
+alter table files
+    add column if not exists filename_lower text
+        generated always as (lower(filename)) stored;
+
+create index if not exists files_user_filename_lower_idx on files (user_id, filename_lower, id);
+
+-- Size and date order keep rows awaiting backfill-metadata, nulls last in both
+-- directions; descending pages walk these instead of the ascending indexes.
+create index if not exists files_user_size_desc_idx on files (user_id, content_length desc nulls last, id desc);
+create index if not exists files_user_date_desc_idx on files (user_id, upload_timestamp desc nulls last, id desc);
@@ -0,0 +1,14 @@
+-- One file per name for each user: downloads, renames and deletes address files
+-- by name, and a delete that matched several rows released only one object.
+-- Existing duplicates keep the oldest row's name; the others get their id
+-- before the extension ("report.pdf" -> "report_123.pdf").
+update files f
+set filename = regexp_replace(f.filename, '(\.[^.]*)?$', '_' || f.id || '\1')
+where exists (
+    select 1 from files older
+    where older.user_id = f.user_id
+      and older.filename = f.filename
+      and older.id < f.id
+);
+
+create unique index if not exists files_user_filename_key on files (user_id, filename);
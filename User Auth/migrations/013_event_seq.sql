@@ -0,0 +1,41 @@
+-- A per-user sequence number for the change feed. A bigserial id is taken when
+-- a row is inserted, not when its transaction commits, so a reader could see
+-- event 8 before event 7 commits and then resume past 7 for good. seq is taken
+-- from the user's user_versions row instead, whose row lock is held until the
+-- inserting transaction ends: a user's events commit in seq order.
+alter table user_versions add column if not exists event_seq bigint not null default 0;
+alter table file_events add column if not exists seq bigint;
+
+update file_events e
+set seq = numbered.seq
+from (
+    select id, row_number() over (partition by user_id order by id) as seq
+    from file_events
+) numbered
+where e.id = numbered.id;
+
+insert into user_versions as v (user_id, event_seq)
+select user_id, max(seq) from file_events group by user_id
+on conflict (user_id) do update set event_seq = excluded.event_seq;
+
+alter table file_events alter column seq set not null;
+
+create or replace function assign_event_seq() returns trigger
+language plpgsql
+as $$
+begin
+    insert into user_versions as v (user_id, event_seq)
+    values (new.user_id, 1)
+    on conflict (user_id) do update set event_seq = v.event_seq + 1
+    returning event_seq into new.seq;
+    return new;
+end;
+$$;
+
+drop trigger if exists file_events_assign_seq on file_events;
+create trigger file_events_assign_seq
+    before insert on file_events
+    for each row execute function assign_event_seq();
+
+create unique index if not exists file_events_user_seq_idx on file_events (user_id, seq);
+drop index if exists file_events_user_id_idx;
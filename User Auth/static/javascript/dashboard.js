@@ -44,42 +44,37 @@ document.addEventListener("DOMContentLoaded", function () {
   /// Function to fetch storage data from backend
   async function fetchStorageData() {
     try {
-      const response = await fetch("/api/storage");
-      if (response.ok) {
-        const data = await response.json();
+      const data = await fetchRevalidated("/api/storage");
 
-        // Optionally animate counts for other stats (files, documents, etc.)
-        animateCount(
-          "#right > div:nth-child(1) > h3 > span",
-          Math.floor(data.files),
-          1000
-        );
+      // Optionally animate counts for other stats (files, documents, etc.)
+      animateCount(
+        "#right > div:nth-child(1) > h3 > span",
+        Math.floor(data.files),
+        1000
+      );
 
-        animateCount(
-          "#right > div:nth-child(2) > h3 > span",
-          data.documents,
-          1000
-        );
-        animateCount(
-          "#right > div:nth-child(3) > h3 > span",
-          data.images,
-          1000
-        );
-        animateCount(
-          "#right > div:nth-child(4) > h3 > span",
-          data.others,
-          1000
-        );
-        updateBarWidths(data);
-        updatePercentage(data.usedStorage, data.totalStorage);
+      animateCount(
+        "#right > div:nth-child(2) > h3 > span",
+        data.documents,
+        1000
+      );
+      animateCount(
+        "#right > div:nth-child(3) > h3 > span",
+        data.images,
+        1000
+      );
+      animateCount(
+        "#right > div:nth-child(4) > h3 > span",
+        data.others,
+        1000
+      );
+      updateBarWidths(data);
+      updatePercentage(data.usedStorage, data.totalStorage);
 
-        // Update the total storage span with the used storage in GB
-        document.querySelector(
-          "#total-storage"
-        ).textContent = `${data.usedStorage.toFixed(2)}`;
-      } else {
-        console.error("Failed to fetch storage data");
-      }
+      // Update the total storage span with the used storage in GB
+      document.querySelector(
+        "#total-storage"
+      ).textContent = `${data.usedStorage.toFixed(2)}`;
     } catch (error) {
       console.error("Error fetching storage data:", error);
     }
@@ -88,32 +83,11 @@ document.addEventListener("DOMContentLoaded", function () {
   // Initial fetch to populate storage data
   fetchStorageData();
 
-  async function updateTotalStorage() {
-    try {
-      // Make an API call to fetch the file list
-      const response = await fetch("/files/list");
-      const data = await response.json();
-
-      if (response.ok) {
-        // Calculate the total storage size in bytes
-        let totalSizeBytes = 0;
-        data.files.forEach((file) => {
-          totalSizeBytes += file.size;
-        });
-
-        // Convert the total size to gigabytes (GB)
-        const totalSizeGB = (totalSizeBytes / 1024 ** 3).toFixed(1);
-
-        // Update the element with the total storage size
-        const totalStorageElement = document.querySelector("#total-storage");
-        totalStorageElement.textContent = `${totalSizeGB}GB`;
-      } else {
-        console.error("Failed to load files");
-      }
-    } catch (error) {
-      console.error("Error fetching file list:", error);
-    }
-  }
+  // Refresh the numbers when the tab comes back into view; the ETag makes an
+  // unchanged summary a 304, and no event stream holds a server thread here
+  document.addEventListener("visibilitychange", () => {
+    if (document.visibilityState === "visible") fetchStorageData();
+  });
 
   // Adding search functionality
   const searchInput = document.querySelector(".fade-in-1");
@@ -146,6 +120,3 @@ function updatePercentage(usedStorage, totalStorage) {
 }
 
 updatePercentage(usedStorage, totalStorage);
-
-// Call the function when the page loads
-document.addEventListener("DOMContentLoaded", updateTotalStorage);
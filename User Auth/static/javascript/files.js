@@ -28,93 +28,332 @@ function toggleFilePrompt() {
   }
 }
 
-// Fetch files from the server and display them
-async function fetchFiles() {
+// The server sorts, filters and pages the listing; we only append pages
+const PAGE_SIZE = 100;
+const SEARCH_LIMIT = 50;
+const SORT_ORDERS = { name: "asc", size: "desc", date: "desc", type: "asc" };
+const listState = {
+  query: "",
+  cursor: null,
+  loading: false,
+  done: false,
+  generation: 0, // Bumped on every reset so stale pages are dropped
+  shown: new Set(),
+};
+
+function createActionIcons(fileName) {
+  const actionCell = document.createElement("td");
+
+  const checkbox = document.createElement("input");
+  checkbox.type = "checkbox";
+  checkbox.className = "file-select";
+  checkbox.value = fileName;
+  checkbox.onchange = updateBulkActions;
+  actionCell.appendChild(checkbox);
+
+  const downloadIcon = new Image();
+  downloadIcon.src = "/static/icons/download.png";
+  downloadIcon.alt = "Download";
+  downloadIcon.classList.add("action-icon");
+  downloadIcon.onclick = () => downloadFile(fileName);
+  actionCell.appendChild(downloadIcon);
+
+  const deleteIcon = new Image();
+  deleteIcon.src = "/static/icons/delete.png";
+  deleteIcon.alt = "Delete";
+  deleteIcon.classList.add("action-icon");
+  deleteIcon.onclick = () => deleteFile(fileName);
+  actionCell.appendChild(deleteIcon);
+
+  return actionCell;
+}
+
+function createFileRow(file) {
+  const row = document.createElement("tr");
+  row.dataset.name = file.name;
+  row.innerHTML = `
+    <td>${file.name}</td>
+    <td>${formatFileSize(file.size)}</td>
+    <td>${file.type}</td>
+    <td>${file.last_modified}</td>
+  `;
+  row.appendChild(createActionIcons(file.name));
+  return row;
+}
+
+// Fetch a page of files from the server and display it.
+// reset starts again from the first page; otherwise the next page is appended.
+async function fetchFiles(reset = true) {
+  if (reset) {
+    listState.generation += 1;
+    listState.cursor = null;
+    listState.done = false;
+    listState.shown = new Set();
+  } else if (listState.loading || listState.done) {
+    return;
+  }
+
+  const generation = listState.generation;
+  listState.loading = true;
   try {
-    const response = await fetch("/files/list");
-    if (!response.ok) throw new Error("Failed to load files.");
-    const data = await response.json();
+    const sortBy = document.getElementById("sort-options").value;
+    const params = new URLSearchParams({
+      sort: sortBy,
+      order: SORT_ORDERS[sortBy],
+      limit: PAGE_SIZE,
+    });
+    if (listState.cursor) params.set("cursor", listState.cursor);
+
+    const data = await fetchRevalidated(`/files/list?${params}`);
+    if (generation !== listState.generation) return; // A newer listing replaced this one
 
     const fileTableBody = document.querySelector("#file-list tbody");
-    const sortBy = document.getElementById("sort-options").value;
     const fragment = document.createDocumentFragment();
-    const displayedFiles = new Set();
 
-    const createActionIcons = (fileName) => {
-      const actionCell = document.createElement("td");
+    for (const file of data.files) {
+      if (listState.shown.has(file.name)) continue;
+      listState.shown.add(file.name);
+      fragment.appendChild(createFileRow(file));
+    }
+
+    if (reset) fileTableBody.innerHTML = "";
+    fileTableBody.appendChild(fragment);
+
+    listState.cursor = data.next_cursor;
+    listState.done = !data.next_cursor;
+    toggleFilePrompt();
+    updateBulkActions();
+  } catch (error) {
+    showToast("Error fetching files: " + error.message);
+  } finally {
+    if (generation === listState.generation) listState.loading = false;
+  }
+}
 
-      const downloadIcon = new Image();
-      downloadIcon.src = "/static/icons/download.png";
-      downloadIcon.alt = "Download";
-      downloadIcon.classList.add("action-icon");
-      downloadIcon.onclick = () => downloadFile(fileName);
-      actionCell.appendChild(downloadIcon);
+// Show the server's best matches for a search; an empty query goes back
+// to the paged listing
+async function searchFiles(query) {
+  listState.query = query;
+  if (!query) return fetchFiles();
 
-      const deleteIcon = new Image();
-      deleteIcon.src = "/static/icons/delete.png";
-      deleteIcon.alt = "Delete";
-      deleteIcon.classList.add("action-icon");
-      deleteIcon.onclick = () => deleteFile(fileName);
-      actionCell.appendChild(deleteIcon);
+  listState.generation += 1;
+  listState.cursor = null;
+  listState.done = true; // Search results aren't paged
+  listState.shown = new Set();
+  const generation = listState.generation;
 
-      return actionCell;
-    };
+  try {
+    const params = new URLSearchParams({ q: query, limit: SEARCH_LIMIT });
+    const response = await fetch(`/files/search?${params}`);
+    if (!response.ok) throw new Error("Search failed.");
+    const data = await response.json();
+    if (generation !== listState.generation) return; // A newer search replaced this one
 
+    const fileTableBody = document.querySelector("#file-list tbody");
+    const fragment = document.createDocumentFragment();
     for (const file of data.files) {
-      if (displayedFiles.has(file.name)) continue;
-      displayedFiles.add(file.name);
-
-      const row = document.createElement("tr");
-      row.innerHTML = `
-        <td>${file.name}</td>
-        <td>${formatFileSize(file.size)}</td>
-        <td>${file.type}</td>
-        <td>${file.last_modified}</td>
-      `;
-      row.appendChild(createActionIcons(file.name));
-      fragment.appendChild(row);
+      listState.shown.add(file.name);
+      fragment.appendChild(createFileRow(file));
     }
-
     fileTableBody.innerHTML = "";
     fileTableBody.appendChild(fragment);
 
-    sortFiles(sortBy);
     toggleFilePrompt();
+    updateBulkActions();
   } catch (error) {
-    showToast("Error fetching files: " + error.message);
+    showToast("Error searching files: " + error.message);
+  }
+}
+
+// Reload whatever is on screen: search results or the listing
+function refreshFiles() {
+  return listState.query ? searchFiles(listState.query) : fetchFiles();
+}
+
+// Load the next page when the table is scrolled near its end
+document.querySelector(".table-container").addEventListener("scroll", (event) => {
+  const container = event.target;
+  if (container.scrollTop + container.clientHeight >= container.scrollHeight - 200) {
+    fetchFiles(false);
   }
+});
+
+// Drop a file's row without reloading the listing
+function removeFileRow(fileName) {
+  document.querySelectorAll("#file-list tbody tr").forEach((row) => {
+    if (row.dataset.name === fileName) row.remove();
+  });
+  listState.shown.delete(fileName);
+  toggleFilePrompt();
+  updateBulkActions();
+}
+
+// Live updates from the server's change feed. Uploads, deletes and renames
+// made anywhere (another tab, another device) are applied to the rows on
+// screen instead of reloading the listing.
+const feedState = { seq: null };
+
+function findFileRow(fileName) {
+  return Array.from(document.querySelectorAll("#file-list tbody tr")).find(
+    (row) => row.dataset.name === fileName
+  );
+}
+
+function applyFileEvent(event) {
+  feedState.seq = event.seq;
+  if (event.type === "delete") {
+    removeFileRow(event.name);
+  } else if (event.type === "rename") {
+    const row = findFileRow(event.name);
+    if (!row) return;
+    row.dataset.name = event.new_name;
+    row.cells[0].textContent = event.new_name;
+    row.cells[2].textContent = event.new_name.split(".").pop();
+    row.replaceChild(createActionIcons(event.new_name), row.lastElementChild);
+    listState.shown.delete(event.name);
+    listState.shown.add(event.new_name);
+  } else if (event.type === "upload") {
+    const existing = findFileRow(event.name);
+    if (existing) {
+      existing.replaceWith(createFileRow(event.file));
+    } else if (!listState.query) {
+      // New files go on top; search results are left to the next search
+      const fileTableBody = document.querySelector("#file-list tbody");
+      fileTableBody.prepend(createFileRow(event.file));
+      listState.shown.add(event.name);
+    }
+    toggleFilePrompt();
+  }
+}
+
+function watchFileEvents() {
+  if (!window.EventSource) return;
+  // The browser resumes with Last-Event-ID on its own; after we reopen a
+  // closed stream, since= picks up from the last event we applied
+  const url =
+    feedState.seq === null ? "/files/events" : `/files/events?since=${feedState.seq}`;
+  const source = new EventSource(url);
+
+  source.addEventListener("ready", (e) => {
+    feedState.seq = JSON.parse(e.data).seq;
+  });
+  source.addEventListener("change", (e) => applyFileEvent(JSON.parse(e.data)));
+  source.addEventListener("resync", (e) => {
+    // Missed too much while away: reload what's on screen
+    feedState.seq = JSON.parse(e.data).seq;
+    refreshFiles();
+  });
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) {
+      setTimeout(watchFileEvents, 10000); // Server busy; try again later
+    }
+  };
 }
 
 // Function to download a file
-async function downloadFile(fileName) {
-  try {
-    showToast("Preparing download...", "info");
+function downloadFile(fileName) {
+  // Let the browser stream the response straight to disk instead of
+  // holding the whole file in memory as a Blob
+  const link = document.createElement("a");
+  link.href = `/files/download/${encodeURIComponent(fileName)}`;
+  link.download = fileName;
+  document.body.appendChild(link);
+  link.click();
+  document.body.removeChild(link);
+
+  showToast("Download started!", "success");
+}
 
-    const response = await fetch(
-      `/files/download/${encodeURIComponent(fileName)}`,
-      { credentials: "include" }
-    );
+// Names of the files whose checkboxes are ticked
+function getSelectedFiles() {
+  return Array.from(document.querySelectorAll(".file-select:checked")).map(
+    (checkbox) => checkbox.value
+  );
+}
 
-    if (!response.ok) throw new Error("Failed to download file");
+// Enable the bulk action buttons only when something is selected
+function updateBulkActions() {
+  const noneSelected = getSelectedFiles().length === 0;
+  document.getElementById("download-selected").disabled = noneSelected;
+  document.getElementById("delete-selected").disabled = noneSelected;
+}
 
-    const blob = await response.blob();
+// Download several files as a single ZIP streamed by the server
+function downloadSelectedFiles() {
+  const fileNames = getSelectedFiles();
+  if (fileNames.length === 0) return;
+
+  // A form submit lets the browser save the archive as it streams in
+  const form = document.createElement("form");
+  form.method = "POST";
+  form.action = "/files/download";
+  fileNames.forEach((fileName) => {
+    const input = document.createElement("input");
+    input.type = "hidden";
+    input.name = "filenames";
+    input.value = fileName;
+    form.appendChild(input);
+  });
+  document.body.appendChild(form);
+  form.submit();
+  document.body.removeChild(form);
 
-    const link = document.createElement("a");
-    link.href = URL.createObjectURL(blob);
-    link.download = `${fileName}.zip`;
-    document.body.appendChild(link);
-    link.click();
+  showToast(`Downloading ${fileNames.length} files...`, "success");
+}
 
-    URL.revokeObjectURL(link.href);
-    document.body.removeChild(link);
+document
+  .getElementById("download-selected")
+  .addEventListener("click", downloadSelectedFiles);
+
+// Delete every selected file with one request
+async function deleteSelectedFiles() {
+  const fileNames = getSelectedFiles();
+  if (fileNames.length === 0) return;
+  const confirmed = confirm(
+    `Are you sure you want to delete ${fileNames.length} files?`
+  );
+  if (!confirmed) return;
 
-    showToast("Download started!", "success");
+  try {
+    const response = await fetch("/files/delete", {
+      method: "POST",
+      credentials: "include",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ filenames: fileNames }),
+    });
+    const data = await response.json();
+
+    if (!data.results) {
+      console.error("Delete error:", data);
+      showToast("Failed to delete the files.", "error");
+      return;
+    }
+
+    // Only drop the rows the server actually deleted
+    const failed = [];
+    Object.entries(data.results).forEach(([fileName, result]) => {
+      if (result.status === "ok") removeFileRow(fileName);
+      else failed.push(fileName);
+    });
+
+    if (failed.length === 0) {
+      showToast(`${fileNames.length} files deleted successfully!`, "success");
+    } else {
+      console.error("Delete error:", data.results);
+      showToast(`Failed to delete ${failed.length} files.`, "error");
+    }
   } catch (error) {
-    console.error("Download error:", error);
-    showToast(`Download failed: ${error.message}`, "error");
+    console.error("Delete error:", error);
+    showToast("Error deleting files: " + error, "error");
   }
 }
 
+document
+  .getElementById("delete-selected")
+  .addEventListener("click", deleteSelectedFiles);
+
 // Function to delete a file
 async function deleteFile(fileName) {
   const confirmed = confirm("Are you sure you want to delete this file?");
@@ -131,7 +370,7 @@ async function deleteFile(fileName) {
 
     if (response.ok) {
       showToast("File deleted successfully!", "success");
-      fetchFiles();
+      removeFileRow(fileName);
     } else {
       const errorData = await response.json();
       console.error("Delete error:", errorData);
@@ -143,64 +382,6 @@ async function deleteFile(fileName) {
   }
 }
 
-// Helper function to parse file size for sorting
-function parseFileSize(sizeStr) {
-  const units = {
-    Bytes: 1,
-    KB: 1024,
-    MB: 1024 ** 2,
-    GB: 1024 ** 3,
-    TB: 1024 ** 4,
-  };
-
-  const match = sizeStr.match(/^([\d.]+)\s*(Bytes|KB|MB|GB|TB)$/i);
-  if (!match) return 0;
-  const [_, value, unit] = match;
-  return parseFloat(value) * units[unit.toUpperCase()];
-}
-
-// Function to sort files based on selected option
-function sortFiles(sortBy) {
-  const fileTableBody = document.querySelector("#file-list tbody");
-  const rows = Array.from(fileTableBody.querySelectorAll("tr"));
-
-  rows.sort((a, b) => {
-    let valueA, valueB;
-
-    switch (sortBy) {
-      case "name":
-        valueA = a.children[0].textContent.toLowerCase();
-        valueB = b.children[0].textContent.toLowerCase();
-        return valueA.localeCompare(valueB);
-
-      case "size":
-        valueA = parseFileSize(a.children[1].textContent);
-        valueB = parseFileSize(b.children[1].textContent);
-        return valueB - valueA;
-
-      case "type":
-        valueA = a.children[2].textContent.toLowerCase();
-        valueB = b.children[2].textContent.toLowerCase();
-        return valueA.localeCompare(valueB);
-
-      case "date":
-        const dateA = a.children[3].textContent.trim();
-        const dateB = b.children[3].textContent.trim();
-        valueA = new Date(dateA.replace(" ", "T"));
-        valueB = new Date(dateB.replace(" ", "T"));
-        if (isNaN(valueA.getTime())) valueA = new Date(0);
-        if (isNaN(valueB.getTime())) valueB = new Date(0);
-        return valueB - valueA;
-
-      default:
-        return 0;
-    }
-  });
-
-  fileTableBody.innerHTML = "";
-  rows.forEach((row) => fileTableBody.appendChild(row));
-}
-
 // Utility function to format file size
 function formatFileSize(bytes) {
   const sizes = ["Bytes", "KB", "MB", "GB", "TB"];
@@ -209,25 +390,10 @@ function formatFileSize(bytes) {
   return parseFloat((bytes / Math.pow(1024, i)).toFixed(2)) + " " + sizes[i];
 }
 
-// Add event listener for sorting files
+// Re-sort on the server when the sort option changes (search results keep
+// their relevance order)
 const sortSelect = document.getElementById("sort-options");
-sortSelect.addEventListener("change", function () {
-  const selectedSort = sortSelect.value;
-  sortFiles(selectedSort);
-});
-
-// Function to filter files based on search query
-function filterFileList(query) {
-  const tableBody = document.querySelector("#file-list tbody");
-  const rows = Array.from(tableBody.querySelectorAll("tr"));
-
-  rows.forEach((row) => {
-    const fileNameCell = row.querySelector("td:first-child");
-    if (!fileNameCell) return;
-    const fileName = fileNameCell.textContent.trim().toLowerCase();
-    row.style.display = fileName.includes(query) ? "" : "none";
-  });
-}
+sortSelect.addEventListener("change", () => refreshFiles());
 
 // On page load
 document.addEventListener("DOMContentLoaded", () => {
@@ -236,22 +402,22 @@ document.addEventListener("DOMContentLoaded", () => {
   // Apply search from query string if available
   const urlParams = new URLSearchParams(window.location.search);
   const query = urlParams.get("q");
-  if (query) {
-    if (searchInput) searchInput.value = query;
-  }
-
-  fetchFiles().then(() => {
-    if (query) {
-      filterFileList(query.toLowerCase());
-    }
-  });
+  if (query && searchInput) searchInput.value = query;
+  watchFileEvents(); // Opened first so no change slips in between
+  searchFiles(query ? query.trim() : "");
 
   if (searchInput) {
+    // Search as the user types, once they pause
+    let searchTimer;
+    searchInput.addEventListener("input", () => {
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(() => searchFiles(searchInput.value.trim()), 200);
+    });
     searchInput.addEventListener("keypress", (event) => {
       if (event.key === "Enter") {
         event.preventDefault();
-        const searchQuery = searchInput.value.trim().toLowerCase();
-        filterFileList(searchQuery);
+        clearTimeout(searchTimer);
+        searchFiles(searchInput.value.trim());
       }
     });
   }
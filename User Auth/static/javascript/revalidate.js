@@ -0,0 +1,31 @@
+// Shared by the dashboard and files pages (load it before the page script).
+// Keep the last response for each URL and revalidate it with its ETag, so an
+// unchanged listing or storage summary comes back as an empty 304 instead of
+// being rebuilt.
+async function fetchRevalidated(url) {
+  const key = `etag:${url}`;
+  let cached = null;
+  try {
+    cached = JSON.parse(sessionStorage.getItem(key));
+  } catch (error) {
+    cached = null;
+  }
+
+  const response = await fetch(url, {
+    headers: cached ? { "If-None-Match": cached.etag } : {},
+    cache: "no-store", // We handle revalidation ourselves
+  });
+  if (response.status === 304 && cached) return cached.data;
+  if (!response.ok) throw new Error(`Request failed with ${response.status}`);
+
+  const data = await response.json();
+  const etag = response.headers.get("ETag");
+  if (etag) {
+    try {
+      sessionStorage.setItem(key, JSON.stringify({ etag, data }));
+    } catch (error) {
+      // Storage full or disabled; the next load just fetches again
+    }
+  }
+  return data;
+}
@@ -22,8 +22,10 @@ const fileList = document.getElementById("file-list");
 const uploadButton = document.getElementById("upload-button");
 let files = []; // To store the files
 const fileHashes = new Set(); // To track unique file hashes
+const sha256Of = new WeakMap(); // File -> SHA-256, lets the server skip files it already has
 const MAX_TOTAL_STORAGE = 100 * 1024 * 1024 * 1024; // 100GB total storage limit
 let totalUploadedSize = 0; // Tracks total uploaded size
+const UPLOAD_CONCURRENCY = 3; // Files uploaded in parallel
 
 // Prevent default drag behaviors
 ["dragenter", "dragover", "dragleave", "drop"].forEach((eventName) => {
@@ -96,6 +98,7 @@ async function handleFiles(newFiles) {
       showToast(`Duplicate detected: ${file.name} ignored`, "warning");
     } else {
       fileHashes.add(hash); // Add unique file hash
+      sha256Of.set(file, hash);
       files.push(file); // Add file to the list
     }
   }
@@ -125,6 +128,164 @@ function renderFileList() {
   });
 }
 
+// Stream one file as the raw request body so the server can pipe it to storage
+async function uploadFile(file) {
+  const response = await fetch(
+    `/upload/stream?filename=${encodeURIComponent(file.name)}`,
+    {
+      method: "PUT",
+      headers: { "Content-Type": file.type || "application/octet-stream" },
+      body: file,
+    }
+  );
+  if (!response.ok) throw new Error(await response.text());
+  return response.json();
+}
+
+// Upload files through the server a few at a time, returning the ones that failed
+async function uploadThroughServer(pending) {
+  const queue = [...pending];
+  const failed = [];
+  const worker = async () => {
+    while (queue.length > 0) {
+      const file = queue.shift();
+      try {
+        await uploadFile(file);
+      } catch (error) {
+        console.error(`Upload error for ${file.name}:`, error);
+        failed.push(file);
+      }
+    }
+  };
+  await Promise.all(Array.from({ length: UPLOAD_CONCURRENCY }, worker));
+  return failed;
+}
+
+// Hex SHA-1 of a Blob, which B2 checks each upload against
+async function sha1Hex(blob) {
+  const hashBuffer = await crypto.subtle.digest("SHA-1", await blob.arrayBuffer());
+  return Array.from(new Uint8Array(hashBuffer))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+// Send a whole file straight to B2
+async function uploadSimple(file, target) {
+  const response = await fetch(target.upload_url, {
+    method: "POST",
+    headers: {
+      Authorization: target.authorization_token,
+      "X-Bz-File-Name": encodeURIComponent(target.key),
+      "Content-Type": target.content_type,
+      "X-Bz-Content-Sha1": await sha1Hex(file),
+    },
+    body: file,
+  });
+  if (!response.ok) throw new Error(await response.text());
+  const result = await response.json();
+  return { name: target.name, file_id: result.fileId };
+}
+
+// Send a big file straight to B2 as parts, one upload stream per part URL
+async function uploadLarge(file, target) {
+  const partCount = Math.ceil(file.size / target.part_size);
+  const partSha1s = new Array(partCount);
+  let nextPart = 0;
+
+  const worker = async (partUrl) => {
+    while (nextPart < partCount) {
+      const index = nextPart++;
+      const part = file.slice(index * target.part_size, (index + 1) * target.part_size);
+      const sha1 = await sha1Hex(part);
+      const response = await fetch(partUrl.upload_url, {
+        method: "POST",
+        headers: {
+          Authorization: partUrl.authorization_token,
+          "X-Bz-Part-Number": String(index + 1),
+          "X-Bz-Content-Sha1": sha1,
+        },
+        body: part,
+      });
+      if (!response.ok) throw new Error(await response.text());
+      partSha1s[index] = sha1;
+    }
+  };
+  await Promise.all(target.part_urls.map(worker));
+  return { name: target.name, file_id: target.file_id, part_sha1s: partSha1s };
+}
+
+// Upload files straight to B2 using targets handed out by the server, then
+// record them; falls back to uploading through the server if that's unavailable.
+// Returns the files that failed.
+async function uploadAll(pending) {
+  const authorizeResponse = await fetch("/upload/authorize", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      files: pending.map((file) => ({
+        name: file.name,
+        size: file.size,
+        content_type: file.type,
+        sha256: sha256Of.get(file),
+      })),
+    }),
+  });
+  if (authorizeResponse.status === 413) {
+    throw new Error("Storage quota exceeded");
+  }
+  if (authorizeResponse.status === 409) {
+    const { files: taken = [] } = await authorizeResponse.json();
+    throw new Error(`Already uploaded: ${taken.join(", ")}`);
+  }
+  if (!authorizeResponse.ok) {
+    console.warn("Direct upload unavailable:", await authorizeResponse.text());
+    return uploadThroughServer(pending);
+  }
+
+  const { uploads } = await authorizeResponse.json();
+  const queue = [...uploads];
+  const uploaded = [];
+  const failed = [];
+  const worker = async () => {
+    while (queue.length > 0) {
+      const target = queue.shift();
+      const file = pending[target.index];
+      try {
+        if (target.type === "existing") {
+          // Already stored on the server, so only the record is needed
+          uploaded.push({
+            file,
+            result: { name: target.name, sha256: sha256Of.get(file) },
+          });
+          continue;
+        }
+        const upload = target.type === "large" ? uploadLarge : uploadSimple;
+        const result = await upload(file, target);
+        uploaded.push({ file, result: { ...result, sha256: sha256Of.get(file) } });
+      } catch (error) {
+        console.error(`Upload error for ${file.name}:`, error);
+        failed.push(file);
+      }
+    }
+  };
+  await Promise.all(Array.from({ length: UPLOAD_CONCURRENCY }, worker));
+
+  if (uploaded.length > 0) {
+    const finalizeResponse = await fetch("/upload/finalize", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ files: uploaded.map(({ result }) => result) }),
+    });
+    const { results = {} } = await finalizeResponse.json();
+    uploaded.forEach(({ file, result }) => {
+      if (!results[result.name] || results[result.name].status !== "ok") {
+        failed.push(file);
+      }
+    });
+  }
+  return failed;
+}
+
 // Upload files to the backend
 uploadButton.addEventListener("click", async () => {
   if (files.length === 0) {
@@ -145,19 +306,12 @@ uploadButton.addEventListener("click", async () => {
   // Disable upload button to prevent duplicate uploads
   uploadButton.disabled = true;
 
-  const formData = new FormData();
-  files.forEach((file) => formData.append("files", file)); // Use "files" as the field name
   showToast("Uploading Files .....");
   try {
-    const response = await fetch("/upload", {
-      method: "POST",
-      body: formData,
-    });
+    const failed = await uploadAll(files);
 
-    if (response.ok) {
-      const result = await response.json();
+    if (failed.length === 0) {
       showToast("Files uploaded successfully!");
-      console.log("Upload response:", result);
 
       // Update total uploaded size after a successful upload
       totalUploadedSize += currentUploadSize;
@@ -168,7 +322,11 @@ uploadButton.addEventListener("click", async () => {
       renderFileList(); // Update UI
     } else {
       showToast("Failed to upload files.");
-      console.error("Upload error:", await response.text());
+      console.error("Upload errors:", failed);
+
+      // Keep only the files that still need uploading
+      files = failed;
+      renderFileList();
     }
   } catch (error) {
     showToast("An error occurred while uploading files.");
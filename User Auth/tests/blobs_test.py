@@ -0,0 +1,86 @@
+from unittest import mock
+
+from tests.support import AppTestCase, app_module, bucket, db
+
+
+class BlobRefcountTest(AppTestCase):
+    def blobs(self):
+        return db.rows('blobs')
+
+    def test_identical_uploads_share_one_object(self):
+        data = b'same bytes' * 100
+        self.upload(self.client, ('a.txt', data))
+        self.upload(self.client, ('b.txt', data))
+        rows = db.rows('files', self.user_id)
+        self.assertEqual(len({row['file_id'] for row in rows}), 1)
+        self.assertEqual(len(bucket.objects), 1)
+        self.assertEqual([blob['refcount'] for blob in self.blobs()], [2])
+
+    def test_object_deleted_with_last_reference(self):
+        data = b'same bytes' * 100
+        self.upload(self.client, ('a.txt', data), ('b.txt', data))
+        self.upload(self.client, ('c.txt', data))
+        self.assertEqual(self.blobs()[0]['refcount'], 3)
+
+        self.client.delete('/files/delete/a.txt')
+        self.client.post('/files/delete', json={'filenames': ['b.txt']})
+        self.assertEqual(self.blobs()[0]['refcount'], 1)
+        self.assertEqual(len(bucket.objects), 1)
+        self.assertEqual(self.client.get('/files/download/c.txt').data, data)
+
+        self.client.delete('/files/delete/c.txt')
+        self.assertEqual(self.blobs(), [])
+        self.assertEqual(bucket.objects, {})
+
+    def test_scope_is_per_user_by_default(self):
+        data = b'same bytes' * 100
+        self.upload(self.client, ('a.txt', data))
+        self.upload(self.login(2), ('a.txt', data))
+        self.assertEqual(len(bucket.objects), 2)
+        self.assertEqual(sorted(blob['scope'] for blob in self.blobs()), ['user:1', 'user:2'])
+
+    def test_claim_and_release(self):
+        row = self.store(self.user_id, 'a.txt', b'data')
+        record = app_module.share_blob('user:1', 'f' * 64, {**row, 'blob_id': None})
+        self.assertIsNotNone(record['blob_id'])
+        claimed = app_module.claim_blob('user:1', 'f' * 64)
+        self.assertEqual(claimed['refcount'], 2)
+        self.assertIsNone(app_module.claim_blob('user:2', 'f' * 64))
+
+        app_module.delete_stored_object(record)
+        self.assertIn(row['filepath'], bucket.objects)
+        app_module.delete_stored_object(record)
+        self.assertNotIn(row['filepath'], bucket.objects)
+
+
+class SharedBlobDownloadTest(AppTestCase):
+    data = b'shared content' * 100
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(app_module, 'DEDUP_SCOPE', 'global')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.upload(self.client, ('a.txt', self.data))
+        self.other = self.login(2)
+        self.upload(self.other, ('b.txt', self.data))
+        self.filepath = db.rows('files', 2)[0]['filepath']
+
+    def test_shared_blob_stays_in_first_uploaders_prefix(self):
+        self.assertTrue(self.filepath.startswith('user_1/'))
+        self.assertEqual(self.other.get('/files/download/b.txt').data, self.data)
+
+    def test_newer_version_under_the_same_name_is_refused(self):
+        # The first uploader's scoped key can upload over the shared object's name
+        bucket.store(self.filepath, b'replaced')
+        response = self.other.get('/files/download/b.txt')
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn(b'replaced', response.data)
+        archive = self.other.post('/files/download', json={'filenames': ['b.txt']}).data
+        self.assertNotIn(b'replaced', archive)
+
+    def test_redirects_only_into_own_prefix(self):
+        own = self.client.get('/files/download/a.txt?mode=redirect')
+        self.assertEqual(own.status_code, 302)
+        shared = self.other.get('/files/download/b.txt?mode=redirect')
+        self.assertEqual((shared.status_code, shared.data), (200, self.data))
@@ -0,0 +1,49 @@
+from unittest import mock
+
+from tests.support import AppTestCase, app_module, bucket, db
+
+
+class BulkDeleteTest(AppTestCase):
+    def delete(self, *filenames):
+        return self.client.post('/files/delete', json={'filenames': list(filenames)})
+
+    def test_deletes_and_reports_per_name(self):
+        self.upload(self.client, ('a.txt', b'first'), ('b.txt', b'second'), ('c.txt', b'third'))
+        response = self.delete('a.txt', 'b.txt', 'missing.txt')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json['results'], {
+            'a.txt': {'status': 'ok'},
+            'b.txt': {'status': 'ok'},
+            'missing.txt': {'status': 'error', 'error': 'File not found'}
+        })
+        self.assertEqual([row['filename'] for row in db.rows('files')], ['c.txt'])
+        self.assertEqual(len(bucket.objects), 1)
+
+    def test_every_row_of_a_shared_name(self):
+        # Rows sharing a name from before the unique index
+        self.store(self.user_id, 'a.txt', b'first')
+        self.store(self.user_id, 'a.txt', b'second')
+        response = self.delete('a.txt')
+        self.assertEqual(response.json['results'], {'a.txt': {'status': 'ok'}})
+        self.assertEqual((db.rows('files'), bucket.objects), ([], {}))
+
+    def test_failed_object_keeps_its_row(self):
+        first = self.store(self.user_id, 'a.txt', b'first')
+        self.store(self.user_id, 'a.txt', b'second')
+        self.store(self.user_id, 'b.txt', b'third')
+        delete_stored_object = app_module.delete_stored_object
+
+        def fail_first(row):
+            if row['id'] == first['id']:
+                raise RuntimeError('B2 unavailable')
+            delete_stored_object(row)
+
+        with mock.patch.object(app_module, 'delete_stored_object', fail_first):
+            response = self.delete('a.txt', 'b.txt')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json['results']['a.txt'], {'status': 'error', 'error': 'B2 unavailable'})
+        self.assertEqual(response.json['results']['b.txt'], {'status': 'ok'})
+        self.assertEqual([row['id'] for row in db.rows('files')], [first['id']])
+
+    def test_needs_filenames(self):
+        self.assertEqual(self.delete().status_code, 400)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tests.support import AppTestCase, app_module
+
+
+class BackendTests:
+    """Run against both metadata cache backends; make_backend is per subclass."""
+
+    def test_get_and_set(self):
+        backend = self.make_backend(max_entries=10, ttl=60)
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.set('a', {'size': 1}), 0)
+        self.assertEqual(backend.get('a'), {'size': 1})
+        backend.delete('a')
+        self.assertIsNone(backend.get('a'))
+
+    def test_evicts_least_recently_used(self):
+        backend = self.make_backend(max_entries=2, ttl=60)
+        with mock.patch('time.time', return_value=1000):
+            backend.set('a', 1)
+        with mock.patch('time.time', return_value=1001):
+            backend.set('b', 2)
+        with mock.patch('time.time', return_value=1002):
+            backend.get('a')  # a is now more recent than b
+        with mock.patch('time.time', return_value=1003):
+            self.assertEqual(backend.set('c', 3), 1)
+        with mock.patch('time.time', return_value=1004):
+            self.assertIsNone(backend.get('b'))
+            self.assertEqual(backend.get('a'), 1)
+            self.assertEqual(backend.get('c'), 3)
+
+    def test_entries_expire(self):
+        backend = self.make_backend(max_entries=10, ttl=90)
+        with mock.patch('time.time', return_value=1000):
+            backend.set('a', 1)
+        with mock.patch('time.time', return_value=1089):
+            self.assertEqual(backend.get('a'), 1)
+        with mock.patch('time.time', return_value=1091):
+            self.assertIsNone(backend.get('a'))
+
+
+class MemoryCacheBackendTest(BackendTests, unittest.TestCase):
+    def make_backend(self, max_entries, ttl):
+        return app_module.MemoryCacheBackend(max_entries, ttl)
+
+
+class SqliteCacheBackendTest(BackendTests, unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+
+    def make_backend(self, max_entries, ttl):
+        return app_module.SqliteCacheBackend(self.path, max_entries, ttl)
+
+    def test_shared_between_instances(self):
+        # Two workers on one host open the same file
+        first = self.make_backend(max_entries=10, ttl=60)
+        second = self.make_backend(max_entries=10, ttl=60)
+        first.set('a', {'size': 1})
+        self.assertEqual(second.get('a'), {'size': 1})
+        second.delete('a')
+        self.assertIsNone(first.get('a'))
+
+
+class MetadataCacheTest(unittest.TestCase):
+    def test_loads_once_and_counts(self):
+        cache = app_module.MetadataCache(app_module.MemoryCacheBackend(10, 60))
+        loader = mock.Mock(return_value={'size': 1})
+        self.assertEqual(cache.get_or_load('a', loader), {'size': 1})
+        self.assertEqual(cache.get_or_load('a', loader), {'size': 1})
+        loader.assert_called_once_with('a')
+        self.assertEqual((cache.stats['hits'], cache.stats['misses']), (1, 1))
+
+    def test_invalidate(self):
+        cache = app_module.MetadataCache(app_module.MemoryCacheBackend(10, 60))
+        cache.get_or_load('a', lambda key: 1)
+        cache.invalidate('a')
+        self.assertEqual(cache.get_or_load('a', lambda key: 2), 2)
+
+
+class CacheStatsTest(AppTestCase):
+    def test_needs_metrics_token(self):
+        with mock.patch.object(app_module, 'METRICS_TOKEN', 'secret'):
+            self.assertEqual(self.client.get('/api/cache/stats').status_code, 401)
+            response = self.client.get('/api/cache/stats', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hits', response.json)
@@ -0,0 +1,94 @@
+import io
+import os
+from unittest import mock
+
+import zstandard
+
+from tests.support import AppTestCase, app_module, bucket, db
+
+
+class OneByteAtATime(io.BytesIO):
+    """A stream that returns less than asked for, like a socket."""
+    def read(self, size=-1):
+        return super().read(1 if size is None or size < 0 else min(size, 1))
+
+
+class PrefixedReaderTest(AppTestCase):
+    def test_reads_prefix_then_stream(self):
+        reader = app_module.PrefixedReader(b'abc', io.BytesIO(b'defgh'))
+        self.assertEqual([reader.read(2), reader.read(2), reader.read(3), reader.read(3)],
+                         [b'ab', b'cd', b'efg', b'h'])
+        self.assertEqual(reader.read(1), b'')
+
+    def test_read_all(self):
+        reader = app_module.PrefixedReader(b'abc', io.BytesIO(b'def'))
+        self.assertEqual(reader.read(1), b'a')
+        self.assertEqual(reader.read(), b'bcdef')
+
+    def test_empty_prefix(self):
+        reader = app_module.PrefixedReader(b'', OneByteAtATime(b'xyz'))
+        self.assertEqual(reader.read(10), b'x')
+
+
+class StoreUploadTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(app_module, 'COMPRESS_AT_REST', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored(self, record):
+        return bucket.objects[record['filepath']][0]
+
+    def test_compressible_round_trip(self):
+        data = b'line of a log file\n' * 20000
+        record = app_module.store_upload(io.BytesIO(data), app_module.object_key(1), 'server.log', 'text/plain')
+        self.assertEqual(record['codec'], 'zstd')
+        self.assertEqual(record['content_length'], len(data))
+        self.assertEqual(record['content_type'], 'text/plain')
+        self.assertEqual(record['stored_length'], len(self.stored(record)))
+        self.assertLess(record['stored_length'], len(data))
+        self.assertEqual(zstandard.ZstdDecompressor().decompressobj().decompress(self.stored(record)), data)
+
+    def test_incompressible_stored_as_is(self):
+        data = os.urandom(100 * 1024)
+        record = app_module.store_upload(io.BytesIO(data), app_module.object_key(1), 'noise.bin')
+        self.assertIsNone(record.get('codec'))
+        self.assertEqual(self.stored(record), data)
+
+    def test_precompressed_extension_skipped(self):
+        data = b'\0' * 100 * 1024
+        record = app_module.store_upload(io.BytesIO(data), app_module.object_key(1), 'photo.jpg')
+        self.assertIsNone(record.get('codec'))
+        self.assertEqual(self.stored(record), data)
+
+    def test_short_reads_kept_whole(self):
+        data = b'0123456789' * 10000
+        record = app_module.store_upload(OneByteAtATime(data), app_module.object_key(1), 'digits.txt')
+        stored = b''.join(app_module.decompressed_chunks([self.stored(record)], record.get('codec')))
+        self.assertEqual(stored, data)
+        self.assertEqual(record['content_length'], len(data))
+
+    def test_download_decompresses(self):
+        data = b'line of a log file\n' * 20000
+        self.upload(self.client, ('server.log', data))
+        row = db.rows('files', self.user_id)[0]
+        self.assertEqual(row['codec'], 'zstd')
+        response = self.client.get('/files/download/server.log')
+        self.assertEqual(response.data, data)
+        self.assertEqual(response.headers['Content-Length'], str(len(data)))
+
+    def test_compressed_files_ignore_ranges(self):
+        data = b'line of a log file\n' * 20000
+        self.upload(self.client, ('server.log', data))
+        response = self.client.get('/files/download/server.log', headers={'Range': 'bytes=0-9'})
+        self.assertEqual((response.status_code, response.headers['Accept-Ranges']), (200, 'none'))
+        self.assertEqual(response.data, data)
+
+    def test_usage_counts_both_sizes(self):
+        data = b'line of a log file\n' * 20000
+        self.upload(self.client, ('server.log', data))
+        usage = app_module.get_usage(self.user_id)
+        self.assertEqual(usage['used_bytes'], len(data))
+        self.assertEqual(usage['stored_bytes'], db.rows('files', self.user_id)[0]['stored_length'])
+        self.assertLess(usage['stored_bytes'], usage['used_bytes'])
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tests.support import AppTestCase, app_module
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting")
+        time.sleep(0.01)
+
+
+def fill_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'download-cache-fill']
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def entries(self):
+        return [name for name in os.listdir(self.directory) if not name.startswith('.fill-')]
+
+    def settled(self, cache):
+        wait_for(lambda: not cache.filling and not fill_threads())
+
+    def test_fill_then_hit(self):
+        cache = app_module.DiskCache(self.directory, 1024 ** 2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(b''.join(cache.fill('a', lambda: iter([b'abc', b'def']))), b'abcdef')
+        self.settled(cache)
+        with open(cache.get('a'), 'rb') as f:
+            self.assertEqual(f.read(), b'abcdef')
+
+    def test_sends_bytes_before_the_fill_ends(self):
+        cache = app_module.DiskCache(self.directory, 1024 ** 2)
+        release = threading.Event()
+
+        def content():
+            yield b'first'
+            release.wait(5)
+            yield b'second'
+
+        chunks = cache.fill('a', content)
+        self.assertEqual(next(chunks), b'first')
+        self.assertIsNone(cache.get('a'))
+        release.set()
+        self.assertEqual(b''.join(chunks), b'second')
+
+    def test_single_flight(self):
+        cache = app_module.DiskCache(self.directory, 1024 ** 2)
+        release = threading.Event()
+        starts = []
+
+        def start():
+            starts.append(1)
+
+            def content():
+                yield b'x' * 1000
+                release.wait(5)
+                yield b'y' * 1000
+            return content()
+
+        readers = [cache.fill('a', start) for _ in range(4)]
+        results = []
+        threads = [threading.Thread(target=lambda r=r: results.append(b''.join(r))) for r in readers]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(starts), 1)
+        self.assertEqual(results, [b'x' * 1000 + b'y' * 1000] * 4)
+
+    def test_failed_fill_leaves_nothing(self):
+        cache = app_module.DiskCache(self.directory, 1024 ** 2)
+
+        def broken():
+            yield b'partial'
+            raise IOError("connection reset")
+
+        with self.assertRaises(IOError):
+            b''.join(cache.fill('a', broken))
+        self.settled(cache)
+        self.assertEqual(os.listdir(self.directory), [])
+
+        with self.assertRaises(IOError):
+            cache.fill('b', mock.Mock(side_effect=IOError("B2 down")))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_evicts_least_recently_used(self):
+        cache = app_module.DiskCache(self.directory, 3500)
+        for i, key in enumerate(['a', 'b', 'c']):
+            b''.join(cache.fill(key, lambda: iter([b'x' * 1000])))
+            self.settled(cache)
+            os.utime(cache.path(key), (1000 + i, 1000 + i))
+        cache.get('a')  # Now the most recent
+        b''.join(cache.fill('d', lambda: iter([b'x' * 1000])))
+        self.settled(cache)
+        self.assertEqual(len(self.entries()), 3)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+
+    def test_bound_holds_across_workers(self):
+        # Two processes' caches sharing a directory still stay under max_bytes
+        workers = [app_module.DiskCache(self.directory, 3000) for _ in range(2)]
+        for i in range(6):
+            cache = workers[i % 2]
+            b''.join(cache.fill(f"key-{i}", lambda: iter([b'x' * 1000])))
+            self.settled(cache)
+            self.assertLessEqual(sum(os.path.getsize(os.path.join(self.directory, name)) for name in self.entries()), 3000)
+
+    def test_invalidate(self):
+        cache = app_module.DiskCache(self.directory, 1024 ** 2)
+        b''.join(cache.fill('a', lambda: iter([b'abc'])))
+        self.settled(cache)
+        cache.invalidate('a')
+        self.assertIsNone(cache.get('a'))
+
+
+class CachedDownloadTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = app_module.DiskCache(directory.name, 1024 ** 2)
+        patcher = mock.patch.object(app_module, 'download_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_miss_then_hit(self):
+        data = os.urandom(100 * 1024)
+        self.upload(self.client, ('a.bin', data))
+
+        first = self.client.get('/files/download/a.bin')
+        self.assertEqual(first.data, data)
+        self.assertEqual(first.headers['Content-Length'], str(len(data)))
+        wait_for(lambda: not fill_threads())
+
+        with self.client.get('/files/download/a.bin', headers={'Range': 'bytes=0-9'}) as ranged:
+            self.assertEqual(ranged.status_code, 206)
+            self.assertEqual(ranged.data, data[:10])
+
+    def test_delete_invalidates(self):
+        self.upload(self.client, ('a.bin', b'data'))
+        file_id = app_module.supabase.table('files').select('file_id').eq('user_id', self.user_id).execute().data[0]['file_id']
+        self.client.get('/files/download/a.bin').get_data()
+        wait_for(lambda: not fill_threads())
+        self.assertIsNotNone(self.cache.get(file_id))
+        self.client.delete('/files/delete/a.bin')
+        self.assertIsNone(self.cache.get(file_id))
@@ -0,0 +1,66 @@
+import io
+import os
+import zipfile
+
+from tests.support import AppTestCase, app_module
+
+
+class StreamZipTest(AppTestCase):
+    def archive(self, entries):
+        return zipfile.ZipFile(io.BytesIO(b''.join(app_module.stream_zip(entries))))
+
+    def test_entries_in_order(self):
+        text = b'hello ' * 1000
+        noise = os.urandom(300 * 1024)
+        archive = self.archive([
+            ('a.txt', iter([text[:10], text[10:]])),
+            ('b.bin', (noise[i:i + 65536] for i in range(0, len(noise), 65536))),
+            ('empty.txt', iter([])),
+        ])
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['a.txt', 'b.bin', 'empty.txt'])
+        self.assertEqual(archive.read('a.txt'), text)
+        self.assertEqual(archive.read('b.bin'), noise)
+        self.assertEqual(archive.read('empty.txt'), b'')
+
+    def test_compression_by_type(self):
+        archive = self.archive([('a.txt', iter([b'x' * 1000])), ('b.jpg', iter([b'x' * 1000]))])
+        self.assertEqual(archive.getinfo('a.txt').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.getinfo('b.jpg').compress_type, zipfile.ZIP_STORED)
+
+    def test_streams_while_building(self):
+        chunks = app_module.stream_zip([('a.bin', (os.urandom(65536) for _ in range(8)))])
+        self.assertTrue(any(next(chunks) for _ in range(4)))  # Bytes before the input is exhausted
+
+
+class DownloadTest(AppTestCase):
+    def test_stream(self):
+        self.store(self.user_id, 'a.txt', b'contents')
+        response = self.client.get('/files/download/a.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'contents')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+
+    def test_single_file_as_zip(self):
+        self.store(self.user_id, 'a.txt', b'contents')
+        response = self.client.get('/files/download/a.txt?mode=zip')
+        self.assertEqual(response.mimetype, 'application/zip')
+        self.assertEqual(zipfile.ZipFile(io.BytesIO(response.data)).read('a.txt'), b'contents')
+
+    def test_range(self):
+        self.store(self.user_id, 'a.bin', bytes(range(256)))
+        response = self.client.get('/files/download/a.bin', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, bytes(range(10, 20)))
+
+    def test_stale_if_range_gets_whole_file(self):
+        self.store(self.user_id, 'a.bin', bytes(range(256)))
+        response = self.client.get('/files/download/a.bin', headers={'Range': 'bytes=10-19', 'If-Range': '"old"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, bytes(range(256)))
+
+    def test_unknown_mode(self):
+        self.assertEqual(self.client.get('/files/download/a.txt?mode=pdf').status_code, 400)
+
+    def test_missing_file(self):
+        self.assertEqual(self.client.get('/files/download/a.txt').status_code, 404)
@@ -0,0 +1,58 @@
+import json
+from unittest import mock
+
+from tests.support import AppTestCase, app_module, db
+
+
+class EventSeqTest(AppTestCase):
+    def test_numbered_per_user(self):
+        app_module.publish_events(1, [('upload', 'a.txt', None), ('upload', 'b.txt', None)])
+        app_module.publish_events(2, [('upload', 'c.txt', None)])
+        app_module.publish_events(1, [('delete', 'a.txt', None)])
+        self.assertEqual([row['seq'] for row in db.rows('file_events', 1)], [1, 2, 3])
+        self.assertEqual([row['seq'] for row in db.rows('file_events', 2)], [1])
+        self.assertEqual(app_module.local_event_heads[1], 3)
+        self.assertEqual(app_module.latest_event_seq(1), 3)
+
+
+class EventStreamTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        for setting, value in (('EVENTS_POLL', 0.01), ('EVENTS_STREAM_SECONDS', 5)):
+            patcher = mock.patch.object(app_module, setting, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def events(self, since):
+        """The events a stream sends before its first keep-alive."""
+        self.assertTrue(app_module.open_stream_slot(self.user_id))
+        stream = app_module.event_stream(self.user_id, since)
+        events = []
+        try:
+            for chunk in stream:
+                if chunk.startswith(': keep-alive'):
+                    return events
+                if chunk.startswith('event:'):
+                    kind, event_id, data = chunk.strip().split('\n')
+                    events.append((kind[len('event: '):], int(event_id[len('id: '):]), json.loads(data[len('data: '):])))
+        finally:
+            stream.close()
+
+    def test_resumes_after_seq(self):
+        self.upload(self.client, ('a.txt', b'first'))
+        self.client.post('/files/edit/a.txt', data={'new_filename': 'b.txt'})
+        self.client.delete('/files/delete/b.txt')
+        events = self.events(since=1)
+        self.assertEqual([(kind, seq, data['type']) for kind, seq, data in events],
+                         [('change', 2, 'rename'), ('change', 3, 'delete')])
+
+    def test_new_stream_starts_at_head(self):
+        self.upload(self.client, ('a.txt', b'first'))
+        self.assertEqual(self.events(since=None), [('ready', 1, {'seq': 1})])
+
+    def test_unknown_cursor_resyncs(self):
+        self.upload(self.client, ('a.txt', b'first'))
+        self.assertEqual(self.events(since=7), [('resync', 1, {'seq': 1})])
+
+    def test_invalid_event_id(self):
+        self.assertEqual(self.client.get('/files/events?since=abc').status_code, 400)
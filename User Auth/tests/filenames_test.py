@@ -0,0 +1,74 @@
+from unittest import mock
+
+from tests.support import AppTestCase, app_module, bucket, db
+
+
+class UniqueFilenameTest(AppTestCase):
+    def test_upload_refuses_taken_name(self):
+        self.store(self.user_id, 'a.txt', b'first')
+        response = self.upload(self.client, ('a.txt', b'second'), ('b.txt', b'third'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json['files'], ['a.txt'])
+        self.assertEqual(len(bucket.objects), 1)
+
+    def test_upload_refuses_name_given_twice(self):
+        response = self.upload(self.client, ('a.txt', b'first'), ('a.txt', b'second'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((db.rows('files'), bucket.objects), ([], {}))
+
+    def test_same_name_for_another_user(self):
+        self.store(2, 'a.txt', b'theirs')
+        self.assertEqual(self.upload(self.client, ('a.txt', b'mine')).status_code, 200)
+
+    def test_stream_and_authorize_refuse_taken_name(self):
+        self.store(self.user_id, 'a.txt', b'first')
+        response = self.client.put('/upload/stream?filename=a.txt', data=b'second')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post('/upload/authorize', json={'files': [{'name': 'a.txt', 'size': 6}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(bucket.objects), 1)
+
+    def test_finalize_refuses_taken_name(self):
+        self.store(self.user_id, 'a.txt', b'first')
+        version = bucket.store(app_module.object_key(self.user_id), b'second')
+        response = self.client.post('/upload/finalize', json={'files': [{'name': 'a.txt', 'file_id': version.id_}]})
+        self.assertEqual(response.json['results']['a.txt'], {'status': 'error', 'error': app_module.NAME_TAKEN})
+        self.assertNotIn(version.file_name, bucket.objects)  # Not left behind unreferenced
+        self.assertEqual(len(db.rows('files')), 1)
+
+    def test_lost_race_is_undone(self):
+        # Another request takes the name between the check and the insert
+        self.store(self.user_id, 'a.txt', b'first')
+        with mock.patch.object(app_module, 'filename_conflicts', return_value=[]):
+            response = self.upload(self.client, ('a.txt', b'second'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(db.rows('files')), 1)
+        self.assertEqual(len(bucket.objects), 1)
+
+    def test_rename_keeps_object_and_refuses_taken_name(self):
+        row = self.store(self.user_id, 'a.txt', b'first')
+        self.store(self.user_id, 'b.txt', b'second')
+        response = self.client.post('/files/edit/a.txt', data={'new_filename': 'b.txt'})
+        self.assertEqual(response.status_code, 409)
+
+        self.assertEqual(self.client.post('/files/edit/a.txt', data={'new_filename': 'c.txt'}).status_code, 200)
+        renamed = [r for r in db.rows('files') if r['filename'] == 'c.txt']
+        self.assertEqual([r['filepath'] for r in renamed], [row['filepath']])
+
+
+class DeleteByNameTest(AppTestCase):
+    def test_releases_every_matching_row(self):
+        # Rows sharing a name from before the unique index, one holding a blob
+        data = b'shared' * 100
+        self.upload(self.client, ('a.txt', data), ('b.txt', data))
+        next(row for row in db.rows('files') if row['filename'] == 'b.txt')['filename'] = 'a.txt'
+        self.store(self.user_id, 'a.txt', b'plain')
+        counted = app_module.get_usage(self.user_id)['files']
+
+        response = self.client.delete('/files/delete/a.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((db.rows('files'), db.rows('blobs'), bucket.objects), ([], [], {}))
+        self.assertEqual(counted - app_module.get_usage(self.user_id)['files'], 3)
+
+    def test_missing(self):
+        self.assertEqual(self.client.delete('/files/delete/a.txt').status_code, 404)
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from tests.support import AppTestCase, app_module, bucket, db
+
+
+class FinalizeTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.scoped_api = mock.Mock()
+        patcher = mock.patch.object(app_module, 'scoped_upload_api', return_value=self.scoped_api)
+        self.scoped_upload_api = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def direct_upload(self, user_id, data=b'uploaded'):
+        """An object the browser put in B2 itself, not yet recorded."""
+        return bucket.store(app_module.object_key(user_id), data)
+
+    def finalize(self, client, *files):
+        return client.post('/upload/finalize', json={'files': list(files)})
+
+    def test_records_own_upload_once(self):
+        version = self.direct_upload(self.user_id)
+        entry = {'name': 'a.txt', 'file_id': version.id_}
+        response = self.finalize(self.client, entry)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['results']['a.txt'], {'status': 'ok'})
+
+        # A retried finalize is fine and adds nothing
+        self.assertEqual(self.finalize(self.client, entry).status_code, 200)
+        rows = db.rows('files', self.user_id)
+        self.assertEqual([(row['filename'], row['file_id']) for row in rows], [('a.txt', version.id_)])
+
+    def test_rejects_other_users_prefix(self):
+        version = self.direct_upload(2)
+        response = self.finalize(self.client, {'name': 'a.txt', 'file_id': version.id_})
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json['results']['a.txt']['status'], 'error')
+        self.assertEqual(db.rows('files'), [])
+
+    def test_rejects_object_in_another_users_row(self):
+        version = self.direct_upload(self.user_id)
+        db.add('files', {'filename': 'theirs.txt', 'filepath': version.file_name, 'file_id': version.id_,
+                         'user_id': 2, **app_module.file_metadata(version)})
+        response = self.finalize(self.client, {'name': 'a.txt', 'file_id': version.id_})
+        self.assertEqual(response.json['results']['a.txt']['status'], 'error')
+        self.assertEqual(db.rows('files', self.user_id), [])
+
+    def test_large_file_finished_with_scoped_key(self):
+        version = self.direct_upload(self.user_id)
+        self.finalize(self.client, {'name': 'big.bin', 'file_id': version.id_, 'part_sha1s': ['a', 'b']})
+        self.scoped_upload_api.assert_called_with(self.user_id)
+        self.scoped_api.session.finish_large_file.assert_called_once_with(version.id_, ['a', 'b'])
+
+    def test_refuses_missing_fields(self):
+        response = self.finalize(self.client, {'name': 'a.txt'})
+        self.assertEqual(response.json['results']['a.txt']['status'], 'error')
+        self.assertEqual(self.client.post('/upload/finalize', json={}).status_code, 400)
+
+    def test_rejects_object_held_by_a_blob(self):
+        # The user's own row for a shared blob is gone; re-finalizing the object
+        # would give it a second owner that could delete it from under the blob
+        data = b'shared content' * 100
+        with mock.patch.object(app_module, 'DEDUP_SCOPE', 'global'):
+            self.upload(self.client, ('a.txt', data))
+            self.upload(self.login(2), ('b.txt', data))
+            file_id = db.rows('files', self.user_id)[0]['file_id']
+            self.client.delete('/files/delete/a.txt')
+
+            response = self.finalize(self.client, {'name': 'again.txt', 'file_id': file_id})
+        self.assertEqual(response.json['results']['again.txt']['status'], 'error')
+        self.assertEqual(db.rows('files', self.user_id), [])
+        self.assertEqual(len(bucket.objects), 1)
+
+    def test_existing_blob_reference(self):
+        data = b'known content' * 100
+        self.upload(self.client, ('a.txt', data))
+        sha256 = db.rows('blobs')[0]['sha256']
+        response = self.finalize(self.client, {'name': 'copy.txt', 'sha256': sha256})
+        self.assertEqual(response.json['results']['copy.txt'], {'status': 'ok'})
+        self.assertEqual(db.rows('blobs')[0]['refcount'], 2)
+
+    def test_declared_sha256_only_matches_own_uploads(self):
+        data = b'known content' * 100
+        with mock.patch.object(app_module, 'DEDUP_SCOPE', 'global'):
+            self.upload(self.login(2), ('theirs.txt', data))
+            sha256 = db.rows('blobs')[0]['sha256']
+            response = self.finalize(self.client, {'name': 'copy.txt', 'sha256': sha256})
+        self.assertEqual(response.json['results']['copy.txt']['status'], 'error')
+        self.assertEqual(db.rows('files', self.user_id), [])
@@ -0,0 +1,65 @@
+import hashlib
+import threading
+from unittest import mock
+
+from tests.support import AppTestCase, app_module, bucket, db
+
+
+class IOPoolTest(AppTestCase):
+    def test_call_and_submit(self):
+        pool = app_module.IOPool('test', limit=2, queue_size=2)
+        self.assertEqual(pool.call(lambda x: x * 2, 21), 42)
+        self.assertEqual(pool.submit(lambda: 'done').result(), 'done')
+
+    def test_sheds_when_saturated(self):
+        pool = app_module.IOPool('test', limit=1, queue_size=0)
+        release = threading.Event()
+        running = pool.submit(release.wait, 5)
+        with self.assertRaises(app_module.ServiceBusy):
+            pool.call(lambda: None)
+        release.set()
+        running.result()
+        self.assertEqual(pool.snapshot()['rejected'], 1)
+
+
+class UploadLoadSheddingTest(AppTestCase):
+    def test_busy_backend_answers_503_and_undoes_the_rest(self):
+        busy_sha256 = hashlib.sha256(b'second file').hexdigest()
+        claim_blob = app_module.claim_blob
+
+        def claim(scope, sha256):
+            if sha256 == busy_sha256:
+                raise app_module.ServiceBusy('supabase')
+            return claim_blob(scope, sha256)
+
+        with mock.patch.object(app_module, 'claim_blob', claim):
+            response = self.upload(self.client, ('a.txt', b'first file'), ('b.txt', b'second file'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(db.rows('files'), [])
+        self.assertEqual(bucket.objects, {})
+
+    def test_full_pool_while_submitting_undoes_submitted_files(self):
+        pool = app_module.io_pools['b2_data']
+        submit = pool.submit
+        calls = []
+
+        def submit_once(fn, *args):
+            calls.append(1)
+            if len(calls) > 1:
+                raise app_module.ServiceBusy('b2_data')
+            return submit(fn, *args)
+
+        with mock.patch.object(pool, 'submit', submit_once):
+            response = self.upload(self.client, ('a.txt', b'first file'), ('b.txt', b'second file'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(bucket.objects, {})
+        self.assertEqual(db.rows('blobs'), [])
+
+
+class IOStatsTest(AppTestCase):
+    def test_needs_metrics_token(self):
+        with mock.patch.object(app_module, 'METRICS_TOKEN', 'secret'):
+            self.assertEqual(self.client.get('/api/io/stats').status_code, 401)
+            response = self.client.get('/api/io/stats', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(set(response.json), set(app_module.io_pools))
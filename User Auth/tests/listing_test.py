@@ -0,0 +1,95 @@
+from tests.support import AppTestCase, app_module
+
+
+class CursorTest(AppTestCase):
+    def test_round_trip(self):
+        for sort, value in (('name', 'report.pdf'), ('name', 'quote"and\\slash'), ('size', 1024), ('date', None)):
+            cursor = app_module.encode_cursor({'value': value, 'id': 42}, 'value')
+            self.assertEqual(app_module.decode_cursor(cursor, sort), (value, 42))
+
+    def test_cursor_is_url_safe(self):
+        cursor = app_module.encode_cursor({'filename': '???>>>~~~', 'id': 1}, 'filename')
+        self.assertRegex(cursor, r'^[A-Za-z0-9_=-]+$')
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/files/list?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+    def test_value_must_fit_the_sort(self):
+        for sort, value in (('name', 5), ('name', None), ('size', 'big'), ('size', True), ('date', 1.5)):
+            cursor = app_module.encode_cursor({'value': value, 'id': 1}, 'value')
+            response = self.client.get(f'/files/list?sort={sort}&cursor={cursor}')
+            self.assertEqual(response.status_code, 400, (sort, value))
+
+
+class KeysetPagingTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        # Repeated sizes make the id tie-breaker matter
+        for i, size in enumerate([30, 10, 20, 10, 30, 20, 10]):
+            self.store(self.user_id, f"file_{i}.txt", b'x' * size)
+        self.store(2, 'someone_else.txt', b'x')
+
+    def pages(self, query, limit=3):
+        names, cursor = [], None
+        while True:
+            url = f"/files/list?{query}&limit={limit}" + (f"&cursor={cursor}" if cursor else '')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            names.append([file['name'] for file in response.json['files']])
+            cursor = response.json['next_cursor']
+            if not cursor:
+                return names
+
+    def test_pages_by_name(self):
+        pages = self.pages('sort=name&order=asc')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), [f"file_{i}.txt" for i in range(7)])
+
+    def test_pages_by_size_descending(self):
+        names = sum(self.pages('sort=size&order=desc', limit=2), [])
+        rows = {row['filename']: row for row in app_module.supabase.table('files').select('*').eq('user_id', self.user_id).execute().data}
+        keys = [(rows[name]['content_length'], rows[name]['id']) for name in names]
+        self.assertEqual(len(names), 7)
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_filter_pages(self):
+        self.store(self.user_id, 'other.bin', b'x')
+        self.assertEqual(sum(self.pages('sort=name&q=file_'), []), [f"file_{i}.txt" for i in range(7)])
+
+    def test_query_files_page(self):
+        rows, cursor = app_module.query_files_page(self.user_id, 'size', 'asc', limit=4)
+        self.assertEqual([row['content_length'] for row in rows], [10, 10, 10, 20])
+        rest, cursor = app_module.query_files_page(self.user_id, 'size', 'asc', limit=4,
+                                                   after=app_module.decode_cursor(cursor, 'size'))
+        self.assertEqual([row['content_length'] for row in rest], [20, 30, 30])
+        self.assertIsNone(cursor)
+
+
+class ListingOrderTest(AppTestCase):
+    pages = KeysetPagingTest.pages
+
+    def setUp(self):
+        super().setUp()
+        for i, size in enumerate([30, 10, 20, 10, 30, 20, 10]):
+            self.store(self.user_id, f"file_{i}.txt", b'x' * size)
+
+    def test_name_ignores_case(self):
+        self.store(self.user_id, 'B.txt', b'x')
+        self.store(self.user_id, 'a.txt', b'x')
+        names = sum(self.pages('sort=name&q=.txt', limit=4), [])
+        self.assertEqual(names[:2], ['a.txt', 'B.txt'])
+
+    def test_rows_without_size_sort_last(self):
+        # Saved before the metadata columns existed; listed once B2 fills them in
+        missing = [self.store(self.user_id, f"old_{i}.txt", b'x' * 5, content_length=None, upload_timestamp=None)
+                   for i in range(3)]
+        for order in ('asc', 'desc'):
+            names = sum(self.pages(f'sort=size&order={order}', limit=2), [])
+            self.assertEqual(len(names), 10)
+            self.assertEqual(names[-3:], [row['filename'] for row in missing][::1 if order == 'asc' else -1])
+
+    def test_rows_without_date_sort_last(self):
+        self.store(self.user_id, 'old.txt', b'x', content_length=None, upload_timestamp=None)
+        names = sum(self.pages('sort=date&order=desc', limit=3), [])
+        self.assertEqual((len(names), names[-1]), (8, 'old.txt'))
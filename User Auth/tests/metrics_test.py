@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from tests.support import AppTestCase, app_module
+
+
+class MetricsEndpointTest(AppTestCase):
+    def scrape(self, token='secret'):
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        return self.client.get('/metrics', headers=headers)
+
+    def test_closed_without_a_token(self):
+        with mock.patch.object(app_module, 'METRICS_TOKEN', None):
+            self.assertEqual(self.scrape().status_code, 401)
+            self.assertEqual(self.scrape(token=None).status_code, 401)
+
+    def test_needs_the_configured_token(self):
+        with mock.patch.object(app_module, 'METRICS_TOKEN', 'secret'):
+            self.assertEqual(self.scrape(token='wrong').status_code, 401)
+            response = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE tenacity_io_running gauge', response.get_data(as_text=True))
+
+
+class HostMetricsTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = mock.patch.object(app_module, 'METRICS_DIR', self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def other_worker(self, name, pid, counter, running):
+        other = app_module.Metrics()
+        other.inc('tenacity_test_total', {'kind': 'a'}, counter, help='Test counter.')
+        other.observe('tenacity_test_seconds', {}, 0.2, help='Test histogram.')
+        state = {'pid': pid, **other.state(), 'samples': [
+            ['tenacity_io_running', 'gauge', {'pool': 'b2_data'}, running],
+            ['tenacity_io_rejected_total', 'counter', {'pool': 'b2_data'}, 2]
+        ]}
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump(state, f)
+
+    def value(self, text, series):
+        line = next(line for line in text.splitlines() if line.startswith(series + ' '))
+        return float(line.split()[-1])
+
+    def test_sums_every_worker(self):
+        app_module.metrics.inc('tenacity_test_total', {'kind': 'a'}, 1, help='Test counter.')
+        self.other_worker('live.json', os.getpid(), 10, running=3)
+        self.other_worker('exited.json', 2 ** 22 + 12345, 100, running=5)  # No such pid
+
+        merged, samples = app_module.host_metrics()
+        text = merged.render(samples)
+        own = app_module.metrics.counters[('tenacity_test_total', (('kind', 'a'),))]
+        self.assertEqual(self.value(text, 'tenacity_test_total{kind="a"}'), own + 110)
+        self.assertEqual(self.value(text, 'tenacity_test_seconds_count'),
+                         2 + app_module.metrics.histograms.get(('tenacity_test_seconds', ()), [0, 0])[1])
+        # Exited workers keep their counters but not their gauges
+        self.assertEqual(self.value(text, 'tenacity_io_rejected_total{pool="b2_data"}'),
+                         4 + app_module.io_pools['b2_data'].snapshot()['rejected'])
+        self.assertEqual(self.value(text, 'tenacity_io_running{pool="b2_data"}'),
+                         3 + app_module.io_pools['b2_data'].snapshot()['running'])
+        self.assertIn(app_module.METRICS_FILE, os.listdir(self.directory))
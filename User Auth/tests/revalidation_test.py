@@ -0,0 +1,40 @@
+from unittest import mock
+
+from tests.support import AppTestCase, app_module
+
+
+class RevalidationTest(AppTestCase):
+    headers = {'Accept-Encoding': 'br'}
+
+    def setUp(self):
+        super().setUp()
+        for i in range(20):  # Large enough for Flask-Compress to encode
+            self.store(self.user_id, f'file-{i:02}.txt', b'contents')
+
+    def fetch(self, url, etag=None):
+        headers = dict(self.headers, **({'If-None-Match': etag} if etag else {}))
+        return self.client.get(url, headers=headers)
+
+    def test_compressed_listing_revalidates_without_a_query(self):
+        first = self.fetch('/files/list')
+        self.assertEqual(first.headers['Content-Encoding'], 'br')
+        self.assertTrue(first.headers['ETag'].startswith('W/'))
+        with mock.patch.object(app_module, 'query_files_page') as query:
+            second = self.fetch('/files/list', first.headers['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+        query.assert_not_called()
+
+    def test_compressed_storage_revalidates_without_a_query(self):
+        first = self.fetch('/api/storage')
+        with mock.patch.object(app_module, 'get_usage') as get_usage:
+            second = self.fetch('/api/storage', first.headers['ETag'])
+        self.assertEqual(second.status_code, 304)
+        get_usage.assert_not_called()
+
+    def test_change_invalidates(self):
+        first = self.fetch('/files/list')
+        self.client.delete('/files/delete/file-00.txt')
+        second = self.fetch('/files/list', first.headers['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second.headers['ETag'], first.headers['ETag'])
@@ -0,0 +1,50 @@
+"""Shared setup for the test suite: app.py running against the fakes in bench/.
+
+    cd "User Auth"
+    python -m unittest discover -s . -p "*test.py"
+"""
+import io
+import unittest
+
+from bench import fakes
+from bench.run import load_app
+
+app_module, db = load_app(fakes.Latency())
+bucket = fakes.FakeB2Api.bucket
+
+
+class AppTestCase(unittest.TestCase):
+    """Starts every test with empty tables and bucket and a logged-in client."""
+    user_id = 1
+
+    def setUp(self):
+        with db.lock:
+            db.tables.clear()
+        with bucket.lock:
+            bucket.objects.clear()
+        self.client = self.login(self.user_id)
+
+    def login(self, user_id):
+        client = app_module.app.test_client()
+        client.environ_base['HTTP_X_FORWARDED_PROTO'] = 'https'  # Talisman redirects plain http
+        with client.session_transaction(base_url='https://localhost') as session:
+            session['user_id'] = user_id
+        return client
+
+    def store(self, user_id, filename, data, **columns):
+        """Add a stored file and its row directly, as if uploaded earlier."""
+        version = bucket.store(app_module.object_key(user_id), data)
+        return db.add('files', {
+            'filename': filename,
+            'filepath': version.file_name,
+            'file_id': version.id_,
+            'user_id': user_id,
+            **app_module.file_metadata(version),
+            **columns
+        })
+
+    def upload(self, client, *files):
+        """POST (filename, bytes) pairs to /upload."""
+        return client.post('/upload', data={
+            'files': [(io.BytesIO(data), filename) for filename, data in files]
+        }, content_type='multipart/form-data')
@@ -0,0 +1,82 @@
+from unittest import mock
+
+from tests.support import AppTestCase, app_module, db
+
+
+class UsageDeltaTest(AppTestCase):
+    def test_categories_and_sign(self):
+        rows = [
+            {'filename': 'a.PDF', 'content_length': 100},
+            {'filename': 'b.jpg', 'content_length': 20},
+            {'filename': 'c.zip', 'content_length': 3, 'stored_length': 2},
+        ]
+        self.assertEqual(app_module.usage_delta(rows), {
+            'files': 3, 'used_bytes': 123, 'documents_bytes': 100,
+            'images_bytes': 20, 'others_bytes': 3, 'stored_bytes': 122
+        })
+        self.assertEqual(app_module.usage_delta(rows[:1], sign=-1)['used_bytes'], -100)
+
+    def test_rename_across_categories_nets_out(self):
+        removed = app_module.usage_delta([{'filename': 'a.txt', 'content_length': 5}], sign=-1)
+        added = app_module.usage_delta([{'filename': 'a.png', 'content_length': 5}])
+        net = {column: removed[column] + added[column] for column in app_module.USAGE_COLUMNS}
+        self.assertEqual(net['files'], 0)
+        self.assertEqual((net['documents_bytes'], net['images_bytes']), (-5, 5))
+
+
+class AdjustUsageTest(AppTestCase):
+    def usage(self):
+        return self.client.get('/api/storage').json
+
+    def test_upload_and_delete_move_counters(self):
+        self.upload(self.client, ('a.txt', b'x' * 100), ('b.png', b'y' * 50))
+        self.assertEqual(self.usage()['files'], 2)
+        self.client.delete('/files/delete/a.txt')
+        row = db.rows('user_storage', self.user_id)[0]
+        self.assertEqual((row['files'], row['used_bytes'], row['documents_bytes']), (1, 50, 0))
+
+    def test_zero_delta_skips_the_rpc(self):
+        with mock.patch.object(app_module.supabase, 'rpc') as rpc:
+            app_module.adjust_usage(self.user_id, dict.fromkeys(app_module.USAGE_COLUMNS, 0))
+        rpc.assert_not_called()
+
+    def test_first_change_seeds_from_files(self):
+        # Files stored before counters existed, then a delete before any read
+        self.store(self.user_id, 'a.txt', b'x' * 100)
+        self.store(self.user_id, 'b.txt', b'x' * 10)
+        self.client.delete('/files/delete/a.txt')
+        usage = app_module.get_usage(self.user_id)
+        self.assertEqual((usage['files'], usage['used_bytes']), (1, 10))
+
+    def test_first_change_seeds_sizes_missing_from_rows(self):
+        # A row saved before content_length existed is sized from B2, as in scan_usage
+        self.store(self.user_id, 'a.pdf', b'x' * 100, content_length=None)
+        self.store(self.user_id, 'b.txt', b'x' * 10)
+        self.client.delete('/files/delete/b.txt')
+        row = db.rows('user_storage', self.user_id)[0]
+        self.assertEqual((row['files'], row['used_bytes'], row['documents_bytes']), (1, 100, 100))
+
+    def test_seeding_keeps_deltas_applied_during_the_scan(self):
+        self.store(self.user_id, 'a.txt', b'x' * 100)
+        scan_usage = app_module.scan_usage
+
+        def scan_then_upload(user_id):
+            usage = scan_usage(user_id)
+            if not db.rows('files', user_id)[1:]:
+                # Another request adds a file mid-scan; finding no counters,
+                # it seeds them itself, with its own scan
+                row = self.store(user_id, 'b.txt', b'x' * 10)
+                app_module.adjust_usage(user_id, app_module.usage_delta([row]))
+            return usage
+
+        with mock.patch.object(app_module, 'scan_usage', scan_then_upload):
+            usage = app_module.get_usage(self.user_id)
+        self.assertEqual((usage['files'], usage['used_bytes']), (2, 110))
+
+    def test_storage_etag_follows_changes(self):
+        first = self.client.get('/api/storage')
+        self.assertEqual(self.client.get('/api/storage', headers={'If-None-Match': first.headers['ETag']}).status_code, 304)
+        self.upload(self.client, ('a.txt', b'x'))
+        second = self.client.get('/api/storage', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json['files'], 1)
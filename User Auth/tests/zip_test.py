@@ -0,0 +1,28 @@
+import io
+import zipfile
+
+from tests.support import AppTestCase
+
+
+class BulkDownloadTest(AppTestCase):
+    def test_keeps_requested_order(self):
+        self.store(self.user_id, 'a.txt', b'first')
+        self.store(self.user_id, 'b.txt', b'second')
+        response = self.client.post('/files/download', json={'filenames': ['b.txt', 'a.txt', 'missing.txt']})
+        archive = zipfile.ZipFile(io.BytesIO(response.data))
+        self.assertEqual(archive.namelist(), ['b.txt', 'a.txt'])
+        self.assertEqual(archive.read('a.txt'), b'first')
+        self.assertEqual(archive.read('b.txt'), b'second')
+
+    def test_form_fields(self):
+        self.store(self.user_id, 'a.txt', b'first')
+        response = self.client.post('/files/download', data={'filenames': ['a.txt', 'a.txt']})
+        self.assertEqual(zipfile.ZipFile(io.BytesIO(response.data)).namelist(), ['a.txt'])
+
+    def test_only_own_files(self):
+        self.store(2, 'a.txt', b'someone else')
+        response = self.client.post('/files/download', json={'filenames': ['a.txt']})
+        self.assertEqual(response.status_code, 404)
+
+    def test_needs_filenames(self):
+        self.assertEqual(self.client.post('/files/download', json={'filenames': []}).status_code, 400)